@@ -9,10 +9,13 @@ sudo -u postgres psql -c "ALTER USER $CHESSDB_USER CREATEDB;"
 
 python3 service/manage.py makemigrations core
 python3 service/manage.py migrate
+python3 service/manage.py compact_board_states
 
 cd service
 
-celery -A config worker --loglevel=info --queues=chess.user_registered,chess.user_deleted,chess.username_changed,chess.friend_added,chess.friend_removed,events.user_disconnected &
+celery -A config worker --loglevel=info --queues=chess.user_registered,chess.user_deleted,chess.username_changed,chess.friend_added,chess.friend_removed,events.user_disconnected,chess.archive_games &
+
+celery -A config beat --loglevel=info &
 
 celery -A config flower --port=5555 &
 exec python manage.py runserver 0.0.0.0:5053
\ No newline at end of file
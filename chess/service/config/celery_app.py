@@ -25,7 +25,8 @@ app.conf.task_queues = (
     Queue('chess.username_changed', Exchange('auth'), routing_key='auth.username_changed'),
     Queue('chess.friend_added', Exchange('social'), routing_key='social.friend_added'),
     Queue('chess.friend_removed', Exchange('social'), routing_key='social.friend_removed'),
-    Queue('consistency.subscribe_now.chess', Exchange('consistency'), routing_key='consistency.subscribe_now.chess')
+    Queue('consistency.subscribe_now.chess', Exchange('consistency'), routing_key='consistency.subscribe_now.chess'),
+    Queue('chess.archive_games', Exchange('chess'), routing_key='chess.archive_games')
 )
 
 app.conf.task_routes = {
@@ -35,7 +36,16 @@ app.conf.task_routes = {
 	'events.user_disconnected': {'queue': 'chess.user_disconnected'},
     'social.friend_added': {'queue': 'chess.friend_added'},
     'social.friend_removed': {'queue': 'chess.friend_removed'},
-    'consistency.subscribe_now.chess': {'queue': 'consistency.subscribe_now.chess'}
+    'consistency.subscribe_now.chess': {'queue': 'consistency.subscribe_now.chess'},
+    'chess.archive_games': {'queue': 'chess.archive_games'}
+}
+
+# Moves old finished games to the compressed archive (core/tasks.py)
+app.conf.beat_schedule = {
+    'archive-finished-games': {
+        'task': 'chess.archive_games',
+        'schedule': float(os.getenv('CHESS_ARCHIVE_INTERVAL', 3600)),
+    },
 }
 
 app.autodiscover_tasks(lambda: [n for n in os.listdir('.') if os.path.isdir(n) and not n.startswith('.')])
\ No newline at end of file
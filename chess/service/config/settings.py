@@ -16,6 +16,21 @@ ALLOWED_HOSTS = ['*']
 
 SECRET_KEY = os.getenv('DJANGO_SECRET_KEY')
 CONSISTENCY_TOKEN = os.getenv('CONSISTENCY_TOKEN')
+ENGINE_METRICS_TOKEN = os.getenv('ENGINE_METRICS_TOKEN')
+# Time control of matchmaking games as (base seconds, increment seconds); a base of 0 leaves them untimed
+CHESS_DEFAULT_TIME_CONTROL = (int(os.getenv('CHESS_DEFAULT_TIME_BASE', 600)), int(os.getenv('CHESS_DEFAULT_TIME_INCREMENT', 0)))
+# Seconds a player may stay disconnected from a game in progress before losing it
+CHESS_ABANDON_TIMEOUT = int(os.getenv('CHESS_ABANDON_TIMEOUT', 60))
+# Seconds between clock sync frames of timed games
+CHESS_CLOCK_SYNC_INTERVAL = float(os.getenv('CHESS_CLOCK_SYNC_INTERVAL', 5))
+# Largest PGN import, in games, and how long a request may wait for the engine to check them
+CHESS_PGN_IMPORT_MAX_GAMES = int(os.getenv('CHESS_PGN_IMPORT_MAX_GAMES', 1000))
+CHESS_PGN_IMPORT_TIMEOUT = float(os.getenv('CHESS_PGN_IMPORT_TIMEOUT', 60))
+# Days after which finished games move to the compressed archive, and games moved per transaction
+CHESS_ARCHIVE_AFTER_DAYS = int(os.getenv('CHESS_ARCHIVE_AFTER_DAYS', 30))
+CHESS_ARCHIVE_BATCH_SIZE = int(os.getenv('CHESS_ARCHIVE_BATCH_SIZE', 500))
+# Most positions one batch positions request may ask about
+CHESS_POSITIONS_MAX_BATCH = int(os.getenv('CHESS_POSITIONS_MAX_BATCH', 200))
 FRONTEND_URL = os.getenv('FRONTEND_URL')
 APPEND_SLASH = True
 DEBUG = False
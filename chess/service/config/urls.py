@@ -4,4 +4,5 @@ urlpatterns = [
     path('', include('matches.urls')),
     path('matchmaking/', include('matchmaking.urls')),
     path('', include('stats.urls')),
+    path('', include('game.urls')),
 ]
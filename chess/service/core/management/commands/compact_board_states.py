@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from core.models import ChessGame
+from game.logic import ChessLogic
+from game.logic.bitboard import COLOR_INDEX
+from game.logic.fen import encode_position
+
+
+def _mover(previous, current):
+    """Colour of the side that played between two legacy board dicts, or None if nothing changed"""
+    for square, piece in current.items():
+        before = previous.get(square)
+        if piece and (not before or (before.get('type'), before.get('color')) != (piece.get('type'), piece.get('color'))):
+            return piece.get('color')
+    return None
+
+
+class Command(BaseCommand):
+    help = "Rewrites legacy square-dict board states of existing games as encoded positions"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        converted = 0
+        games = ChessGame.objects.only('id', 'game_mode', 'board_states').order_by('id')
+        for game in games.iterator(chunk_size=options['batch_size']):
+            if not any(isinstance(state, dict) for state in game.board_states):
+                continue
+            logic = ChessLogic(game_mode=game.game_mode)
+            states = []
+            turn = 'white'
+            previous = None
+            for ply, state in enumerate(game.board_states):
+                if not isinstance(state, dict):
+                    states.append(state)
+                    previous = None
+                    continue
+                # Legacy dicts carry no side to move: it is the opponent of
+                # whoever changed the board since the previous state
+                if previous is not None:
+                    mover = _mover(previous, state)
+                    if mover:
+                        turn = 'black' if mover == 'white' else 'white'
+                logic.set_current_player(turn)
+                board = logic.load_board_from_serialized(state)
+                board.set_turn(COLOR_INDEX[turn])
+                states.append(encode_position(board, ply // 2 + 1))
+                previous = state
+            ChessGame.objects.filter(pk=game.pk).update(board_states=states)
+            converted += 1
+        self.stdout.write(self.style.SUCCESS(f"Compacted board states of {converted} games"))
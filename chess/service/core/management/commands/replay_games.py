@@ -0,0 +1,69 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+from django.core.management.base import BaseCommand
+from core.models import ChessGame
+from game.logic.replay import replay_game
+
+
+def _records(queryset, chunk_size, limit=None):
+    rows = queryset.values(
+        'id', 'game_mode', 'start_position', 'move_history', 'pending_history', 'board_states',
+        'winner_id', 'player_white_id', 'player_black_id'
+    ).order_by('id')
+    # Sliced only after ordering: a sliced queryset cannot be reordered
+    if limit:
+        rows = rows[:limit]
+    chunk = []
+    for row in rows.iterator(chunk_size=chunk_size):
+        winner = None
+        if row['winner_id'] is not None:
+            winner = 'white' if row['winner_id'] == row['player_white_id'] else 'black'
+        chunk.append({
+            'id': row['id'],
+            'game_mode': row['game_mode'],
+            'start_position': row['start_position'],
+            'move_history': row['move_history'] + row['pending_history'],
+            'board_states': row['board_states'],
+            'winner': winner,
+        })
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = "Replays stored games through the current engine and reports those that no longer match"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--status', default='finished', help="Game status to replay (default: finished)")
+        parser.add_argument('--mode', help="Only replay games of this mode")
+        parser.add_argument('--chunk-size', type=int, default=200, help="Games fetched from the database at a time")
+        parser.add_argument('--workers', type=int, default=None, help="Replay processes (default: CPU count)")
+        parser.add_argument('--limit', type=int, default=None)
+
+    def handle(self, *args, **options):
+        games = ChessGame.objects.filter(status=options['status'])
+        if options['mode']:
+            games = games.filter(game_mode=options['mode'])
+
+        replayed = moves = failed = 0
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            for chunk in _records(games, options['chunk_size'], options['limit']):
+                for report in pool.map(replay_game, chunk, chunksize=max(1, len(chunk) // 16)):
+                    replayed += 1
+                    moves += report['moves']
+                    if report['problems']:
+                        failed += 1
+                        for problem in report['problems']:
+                            self.stdout.write(self.style.ERROR(
+                                f"game {report['id']} ({report['game_mode']}): {problem['kind']}: {problem['detail']}"
+                            ))
+                elapsed = time.perf_counter() - start
+                self.stdout.write(f"{replayed} games, {moves} moves, {replayed / elapsed:.1f} games/s, {moves / elapsed:.0f} moves/s")
+
+        elapsed = time.perf_counter() - start
+        summary = f"Replayed {replayed} games ({moves} moves) in {elapsed:.1f}s: {failed} mismatched"
+        self.stdout.write(self.style.SUCCESS(summary) if not failed else self.style.WARNING(summary))
@@ -1,11 +1,15 @@
 from django.db import models
 import uuid
+import random
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
 import datetime
+from django.db.models import F, Func
+from django.db.models.functions import Cast
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+import zlib
 
 # import logging
 # logger = logging.getLogger(__name__)
@@ -37,6 +41,9 @@ def create_user_statistics(sender, instance, created, **kwargs):
         instance.chess_statistics = stats
         instance.save(update_fields=['chess_statistics'])
 
+# Plies between two position snapshots; resuming replays at most this many moves
+SNAPSHOT_INTERVAL = 16
+
 class ChessGame(models.Model):
     GAME_MODES = [
         ('classic', 'Classic'),
@@ -49,16 +56,28 @@ class ChessGame(models.Model):
     player_black = models.ForeignKey(User, on_delete=models.CASCADE, related_name='games_as_black')
     winner = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='won_chess_games')
     status = models.CharField(max_length=20, choices=[('pending', 'Pending'), ('in_progress', 'In Progress'), ('finished', 'Finished')], default='pending')
+    end_reason = models.CharField(max_length=32, blank=True, default='')  # Motivo del final: checkmate, timeout, endgame_table...
     available = models.BooleanField(default=False)
     game_key = models.UUIDField(default=uuid.uuid4, unique=True)
     game_mode = models.CharField(max_length=20, choices=GAME_MODES, default='classic')
     is_ranked = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    board_states = models.JSONField(default=list)
+    start_position = models.PositiveSmallIntegerField(null=True, blank=True)  # SP-ID (0-959) de las partidas 960
+    board_states = models.JSONField(default=list)  # Posiciones codificadas (game/logic/fen.py)
+    snapshot = models.TextField(blank=True, default='')  # Última posición guardada
+    snapshot_ply = models.IntegerField(default=0)
+    pending_moves = models.JSONField(default=list)  # Jugadas UCI desde el snapshot
+    pending_history = models.JSONField(default=list)  # Jugadas detalladas aún no volcadas a move_history
+    last_move = models.JSONField(null=True, blank=True)
     move_history = models.JSONField(default=list)  # Historial detallado de movimientos
     current_player = models.CharField(max_length=10, choices=[('white', 'White'), ('black', 'Black')], default='white')
     last_activity = models.DateTimeField(auto_now=True)  # Para rastrear la última actividad
+    time_base = models.PositiveIntegerField(null=True, blank=True)  # Segundos por jugador; null = sin reloj
+    time_increment = models.PositiveIntegerField(default=0)  # Segundos añadidos tras cada jugada
+    white_time_ms = models.BigIntegerField(null=True, blank=True)  # Tiempo restante al guardar la última jugada
+    black_time_ms = models.BigIntegerField(null=True, blank=True)
+    imported_by = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='imported_chess_games')  # Importada por PGN; solo la ve quien la importó
 
     def __str__(self):
         return f"ChessGame {self.id}: {self.player_white} vs {self.player_black} (Key: {self.game_key})"
@@ -77,13 +96,13 @@ class ChessGame(models.Model):
     
 
     def save(self, *args, **kwargs):
+        if self.game_mode == '960' and self.start_position is None:
+            self.start_position = random.randrange(960)
         is_finishing = False
         if self.pk:
-            try:
-                old_instance = ChessGame.objects.get(pk=self.pk)
-                is_finishing = old_instance.status != 'finished' and self.status == 'finished'
-            except ChessGame.DoesNotExist:
-                pass
+            # Only the status is needed, not the whole row with its history
+            old_status = ChessGame.objects.filter(pk=self.pk).values_list('status', flat=True).first()
+            is_finishing = old_status is not None and old_status != 'finished' and self.status == 'finished'
         super().save(*args, **kwargs)
         if is_finishing:
             # logger.info(f"Game {self.id} is finishing. is_ranked={self.is_ranked}")
@@ -110,21 +129,61 @@ class ChessGame(models.Model):
             return self.board_states[-1]
         return None
 
+    def set_snapshot(self, position):
+        # board_states is no longer grown; the snapshot and the moves since it describe the game
+        self.snapshot_ply += len(self.pending_moves)
+        self.snapshot = position
+        self.pending_moves = []
+        self.flush_history()
+
+    def flush_history(self):
+        """
+        Appends the moves held in pending_history to move_history. A saved
+        game is extended in the database without reading the list, so the
+        cost of a move does not grow with the game; this runs at snapshots
+        and when the game ends.
+        """
+        if not self.pending_history:
+            return
+        if self.pk is not None:
+            ChessGame.objects.filter(pk=self.pk).update(move_history=Func(
+                F('move_history'), Cast(models.Value(self.pending_history, models.JSONField()), models.JSONField()),
+                template='%(expressions)s', arg_joiner=' || '
+            ))
+        if self.pk is None or 'move_history' not in self.get_deferred_fields():
+            self.move_history = self.move_history + self.pending_history
+        self.pending_history = []
+
+    def add_delta(self, uci_move, position):
+        """Records a move after the snapshot, taking a new snapshot every SNAPSHOT_INTERVAL plies"""
+        self.pending_moves.append(uci_move)
+        # Games started before snapshots existed get their first one here
+        if not self.snapshot or len(self.pending_moves) >= SNAPSHOT_INTERVAL:
+            self.set_snapshot(position)
+
+    def get_resume_state(self):
+        """
+        (position, moves since it, last move) needed to rebuild the game.
+        Reads only the snapshot fields, except for games stored before them.
+        """
+        if self.snapshot:
+            return self.snapshot, list(self.pending_moves), self.last_move
+        last_move = self.move_history[-1] if self.move_history else None
+        return self.get_last_board_state(), [], last_move
+
     def get_current_player(self):
         return self.current_player
 
     def get_move_history(self):
-        return self.move_history
+        return self.move_history + self.pending_history
 
     def add_move(self, move_data):
-
-        if not hasattr(self, 'move_history') or self.move_history is None:
-            self.move_history = []
-        
         # Añadir timestamp al movimiento
         move_data['timestamp'] = timezone.now().isoformat()
         
-        self.move_history.append(move_data)
+        # Se vuelca a move_history en el siguiente snapshot (flush_history)
+        self.pending_history.append(move_data)
+        self.last_move = {key: move_data[key] for key in ('from', 'to', 'player')}
         
         # Actualizar el jugador actual (cambiar el turno)
         if move_data['player'] == 'white':
@@ -133,9 +192,10 @@ class ChessGame(models.Model):
             self.current_player = 'white'
 
     def get_game_duration(self):
-        if self.status == 'finished' and hasattr(self, 'move_history') and self.move_history:
-            first_move = self.move_history[0]['timestamp']
-            last_move = self.move_history[-1]['timestamp']
+        history = self.get_move_history()
+        if self.status == 'finished' and history:
+            first_move = history[0]['timestamp']
+            last_move = history[-1]['timestamp']
             first_time = datetime.fromisoformat(first_move)
             last_time = datetime.fromisoformat(last_move)
             return (last_time - first_time).total_seconds()
@@ -144,11 +204,89 @@ class ChessGame(models.Model):
     def reset_game(self):
         self.board_states = []
         self.move_history = []
+        self.snapshot = ''
+        self.snapshot_ply = 0
+        self.pending_moves = []
+        self.pending_history = []
+        self.last_move = None
+        self.white_time_ms = None
+        self.black_time_ms = None
         self.current_player = 'white'
         self.status = 'pending'
         self.winner = None
         self.save()
 
+class ArchivedChessGame(models.Model):
+    """
+    Finished game moved out of ChessGame by the archiver (core/tasks.py).
+    Only the moves are kept, as zlib-compressed UCI; positions are rebuilt
+    by replaying them. The id is the one the game had in ChessGame.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    player_white = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_games_as_white')
+    player_black = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_games_as_black')
+    winner = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='won_archived_chess_games')
+    game_key = models.UUIDField(unique=True)
+    game_mode = models.CharField(max_length=20, choices=ChessGame.GAME_MODES, default='classic')
+    is_ranked = models.BooleanField(default=False)
+    start_position = models.PositiveSmallIntegerField(null=True, blank=True)
+    time_base = models.PositiveIntegerField(null=True, blank=True)
+    time_increment = models.PositiveIntegerField(default=0)
+    imported_by = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='imported_archived_chess_games')
+    moves = models.BinaryField()  # Jugadas UCI separadas por espacios, comprimidas con zlib
+    move_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()  # Fin de la partida
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    # Archived games are always finished
+    status = 'finished'
+
+    def __str__(self):
+        return f"ArchivedChessGame {self.id}: {self.player_white} vs {self.player_black} (Key: {self.game_key})"
+
+    @classmethod
+    def from_game(cls, game):
+        """Unsaved archive row of a finished ChessGame"""
+        from game.logic.fen import move_to_uci
+        uci_moves = [
+            move_to_uci(move['from'], move['to'], move.get('promotion'))
+            for move in game.get_move_history()
+        ]
+        return cls(
+            id=game.id,
+            player_white_id=game.player_white_id,
+            player_black_id=game.player_black_id,
+            winner_id=game.winner_id,
+            game_key=game.game_key,
+            game_mode=game.game_mode,
+            is_ranked=game.is_ranked,
+            start_position=game.start_position,
+            time_base=game.time_base,
+            time_increment=game.time_increment,
+            imported_by_id=game.imported_by_id,
+            moves=zlib.compress(" ".join(uci_moves).encode(), 9),
+            move_count=len(uci_moves),
+            created_at=game.created_at,
+            updated_at=game.updated_at,
+        )
+
+    def get_uci_moves(self):
+        text = zlib.decompress(bytes(self.moves)).decode()
+        return text.split() if text else []
+
+    def get_move_history(self):
+        """Moves in ChessGame.move_history form, without their timestamps"""
+        from game.logic.fen import parse_uci
+        history = []
+        for ply, uci_move in enumerate(self.get_uci_moves()):
+            from_pos, to_pos, promotion = parse_uci(uci_move)
+            move = {'from': from_pos, 'to': to_pos, 'player': 'white' if ply % 2 == 0 else 'black'}
+            if promotion:
+                move['promotion'] = promotion
+            history.append(move)
+        return history
+
 class ChessStatistics(models.Model):
     user = models.ForeignKey(
         User,
@@ -0,0 +1,44 @@
+from datetime import timedelta
+from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from core.models import ChessGame, ArchivedChessGame
+
+
+def archive_finished_games(days=None, batch_size=None):
+    """
+    Moves games finished more than ``days`` days ago from ChessGame to
+    ArchivedChessGame, batch_size at a time, each batch in its own
+    transaction. Rows locked by someone else are left for the next run.
+
+    Returns:
+        Number of games archived
+    """
+    days = settings.CHESS_ARCHIVE_AFTER_DAYS if days is None else days
+    batch_size = batch_size or settings.CHESS_ARCHIVE_BATCH_SIZE
+    cutoff = timezone.now() - timedelta(days=days)
+    archived = 0
+    while True:
+        with transaction.atomic():
+            # The positions are not archived, so they are not read either
+            games = list(
+                ChessGame.objects.select_for_update(skip_locked=True)
+                .filter(status='finished', updated_at__lt=cutoff)
+                .defer('board_states', 'snapshot', 'pending_moves')
+                .order_by('id')[:batch_size]
+            )
+            if not games:
+                break
+            ArchivedChessGame.objects.bulk_create(
+                [ArchivedChessGame.from_game(game) for game in games], ignore_conflicts=True
+            )
+            ChessGame.objects.filter(id__in=[game.id for game in games]).delete()
+        archived += len(games)
+    return archived
+
+
+@shared_task(name="chess.archive_games")
+def archive_games():
+    archived = archive_finished_games()
+    return f"Archived {archived} finished games."
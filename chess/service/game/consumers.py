@@ -1,29 +1,57 @@
+import asyncio
 import json
+import time
+from django.conf import settings
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
 from core.models import ChessGame
 from core.utils.event_domain import publish_event
 from asgiref.sync import sync_to_async
 from .logic import ChessLogic
+from .logic.executor import EngineBusy, submit_search
+from .logic.search import analyse, PROMOTION_CHOICES
+from .logic import instrumentation
+from .logic.fen import encode_position, full_move_number, move_to_uci
+from .logic.bitboard import SQUARES, SQUARE_INDEX, COLOR_INDEX
+from .logic.clock import ChessClock
+from .logic.timers import wheel
 
 
 chess_games = {}
 
 
-def serialize_board(board):
-	serialized_board = {}
-	for position, piece in board.items():
-		if piece is not None:
-			serialized_board[position] = piece.to_dict()
-		else:
-			serialized_board[position] = None
+def serialize_board(board, game_mode=None):
+	with instrumentation.timed(game_mode, "serialization"):
+		serialized_board = {}
+		for index, piece in enumerate(board.squares):
+			position = SQUARES[index]
+			if piece is not None:
+				serialized_board[position] = piece.to_dict(position, board.has_moved(index))
+			else:
+				serialized_board[position] = None
 	return serialized_board
 
 
+def legal_moves_for(game):
+	# Side-to-move move map, cached per position by ChessLogic
+	if not game["board"] or game["status"] == "finished" or game.get("promotion_pending"):
+		return {}
+	return game["game_logic"].get_all_possible_moves(game["current_player"])
+
+
+async def board_view(game, game_mode):
+	# Read under the game's lock: a move running in the pool pushes onto the same
+	# Board, and a half-made position must not be sent or enter the position cache
+	async with game["game_logic"].lock:
+		return serialize_board(game["board"], game_mode), legal_moves_for(game)
+
+
 @database_sync_to_async
 def get_game_and_role(game_key, user):
 	try:
-		game_obj = ChessGame.objects.get(game_key=game_key)
+		# The full histories are only read by games stored before snapshots
+		game_obj = ChessGame.objects.defer('board_states', 'move_history').get(game_key=game_key)
 	except ChessGame.DoesNotExist:
 		return None, None
 	
@@ -37,20 +65,48 @@ def get_game_and_role(game_key, user):
 
 @database_sync_to_async
 def get_current_game_state(game_obj):
+	board_state, pending_moves, last_move = game_obj.get_resume_state()
 	return {
-		'board_state': game_obj.get_last_board_state(),
+		'board_state': board_state,
+		'pending_moves': pending_moves,
 		'status': game_obj.status,
 		'winner': game_obj.winner.username if game_obj.winner else None,
 		'current_player': game_obj.get_current_player(),
-		'history': game_obj.get_move_history()
+		'history': [last_move] if last_move else []
 	}
 
 
+def encode_for_db(game_obj, board, plies):
+	# ``plies`` played up to ``board``, which gives its full-move number
+	with instrumentation.timed(game_obj.game_mode, "serialization"):
+		return encode_position(board, full_move_number(plies))
+
+
+# Columns a move or a game result may change. move_history and board_states
+# are deferred and never rewritten here; flush_history extends move_history in place
+MOVE_FIELDS = [
+	'snapshot', 'snapshot_ply', 'pending_moves', 'pending_history', 'last_move', 'current_player',
+	'white_time_ms', 'black_time_ms', 'updated_at', 'last_activity'
+]
+
+
+def store_clock(game_obj, clock):
+	if clock is not None:
+		game_obj.white_time_ms = clock.left("white")
+		game_obj.black_time_ms = clock.left("black")
+
+
 @database_sync_to_async
-def update_game_in_db(game_obj, board_state, status=None, winner=None):
-	game_obj.add_board_state(serialize_board(board_state))
+def update_game_in_db(game_obj, board_state=None, status=None, winner=None, clock=None, reason=None):
+	if board_state is not None:
+		game_obj.set_snapshot(encode_for_db(game_obj, board_state, game_obj.snapshot_ply + len(game_obj.pending_moves)))
+	store_clock(game_obj, clock)
 	if status:
 		game_obj.status = status
+		if status == "finished":
+			game_obj.flush_history()
+	if reason:
+		game_obj.end_reason = reason
 	if winner:
 		game_obj.winner = winner
 		publish_event("chess", "chess.match_finished", {
@@ -58,18 +114,225 @@ def update_game_in_db(game_obj, board_state, status=None, winner=None):
 			"winner": winner.username,
 			"loser": game_obj.player_white.username if winner == game_obj.player_black else game_obj.player_black.username
 		})
-	game_obj.save()
+	game_obj.save(update_fields=MOVE_FIELDS + ['status', 'end_reason', 'winner'])
 
 
 @database_sync_to_async
-def save_move_to_db(game_obj, from_pos, to_pos, player_color, piece_info=None):
-	game_obj.add_move({
+def save_move_to_db(game_obj, from_pos, to_pos, player_color, board_state, piece_info=None, promotion=None, clock=None):
+	move = {
 		'from': from_pos,
 		'to': to_pos,
 		'player': player_color,
 		'piece_info': piece_info
+	}
+	if promotion:
+		move['promotion'] = promotion
+	game_obj.add_move(move)
+	# The move is not among pending_moves until add_delta, so it is counted here
+	plies = game_obj.snapshot_ply + len(game_obj.pending_moves) + 1
+	game_obj.add_delta(move_to_uci(from_pos, to_pos, promotion), encode_for_db(game_obj, board_state, plies))
+	store_clock(game_obj, clock)
+	game_obj.save(update_fields=MOVE_FIELDS)
+
+
+def make_clock(game_obj):
+	"""Clock of a timed game, resumed from the times saved with the last move"""
+	if not game_obj.time_base:
+		return None
+	return ChessClock(
+		game_obj.time_base * 1000,
+		game_obj.time_increment * 1000,
+		game_obj.white_time_ms,
+		game_obj.black_time_ms
+	)
+
+
+def clock_state(game):
+	return game["clock"].to_dict() if game["clock"] else None
+
+
+# Timers of every game in this worker run on the shared timer wheel; their
+# callbacks look the game up again by key, since it may be gone by then
+
+def arm_clock(game_key):
+	"""Starts the side to move's clock timers: flag-fall, and the periodic sync frame"""
+	game = chess_games[game_key]
+	clock = game["clock"]
+	if game["flag_timer"]:
+		game["flag_timer"].cancel()
+	if clock is None or clock.running is None:
+		return
+	game["flag_timer"] = wheel.schedule(clock.left(clock.running) / 1000, flag_fall, game_key)
+	if game["sync_timer"] is None:
+		game["sync_timer"] = wheel.schedule(settings.CHESS_CLOCK_SYNC_INTERVAL, sync_clock, game_key)
+
+
+def stop_timers(game):
+	for key in ("flag_timer", "sync_timer"):
+		if game[key]:
+			game[key].cancel()
+			game[key] = None
+	for timer in game["abandon_timers"].values():
+		timer.cancel()
+	game["abandon_timers"].clear()
+	if game["clock"]:
+		game["clock"].stop()
+
+
+def watch_presence(game_key):
+	"""Gives every absent player of a game in progress CHESS_ABANDON_TIMEOUT seconds to come back"""
+	game = chess_games[game_key]
+	timers = game["abandon_timers"]
+	for color in ("white", "black"):
+		present = game["players"].get(color, {}).get("connected", False)
+		if present or game["status"] != "in_progress":
+			if color in timers:
+				timers.pop(color).cancel()
+		elif color not in timers:
+			timers[color] = wheel.schedule(settings.CHESS_ABANDON_TIMEOUT, abandon, game_key, color)
+
+
+def forget_if_idle(game_key):
+	"""Drops a finished game from memory once nobody is connected to it"""
+	game = chess_games.get(game_key)
+	if game and game["status"] == "finished" and not any(
+		player["connected"] for player in game["players"].values()
+	):
+		stop_timers(game)
+		del chess_games[game_key]
+
+
+async def finish_game(game_key, winner_color, reason):
+	"""Ends a game for a reason found outside a move (time, abandonment) and tells both players"""
+	game = chess_games.get(game_key)
+	if not game or game["status"] == "finished":
+		return
+	game["status"] = "finished"
+	stop_timers(game)
+	game_obj = game["game_obj"]
+	winner_user = None
+	if winner_color:
+		winner_user = await sync_to_async(lambda: game_obj.player_white if winner_color == "white" else game_obj.player_black)()
+	await update_game_in_db(game_obj, status="finished", winner=winner_user, clock=game["clock"], reason=reason)
+	await get_channel_layer().group_send(
+		f"chess_{game_key}",
+		{
+			"type": "game.over",
+			"winner": winner_color,
+			"reason": reason,
+			"clock": clock_state(game)
+		}
+	)
+	forget_if_idle(game_key)
+
+
+async def flag_fall(game_key):
+	game = chess_games.get(game_key)
+	if not game or game["status"] != "in_progress" or not game["clock"]:
+		return
+	game["flag_timer"] = None
+	loser = game["clock"].flagged()
+	if loser is None:
+		# Woken before the time was really up (the clock was pressed meanwhile)
+		arm_clock(game_key)
+		return
+	winner = "black" if loser == "white" else "white"
+	# A lone king cannot win on time
+	if game["board"] is not None and not game["board"].material[COLOR_INDEX[winner]]:
+		winner = None
+	await finish_game(game_key, winner, "timeout")
+
+
+async def abandon(game_key, color):
+	game = chess_games.get(game_key)
+	if not game or game["abandon_timers"].pop(color, None) is None:
+		return
+	if game["status"] == "in_progress" and not game["players"].get(color, {}).get("connected", False):
+		await finish_game(game_key, "black" if color == "white" else "white", "abandonment")
+
+
+async def sync_clock(game_key):
+	game = chess_games.get(game_key)
+	if not game or game["status"] != "in_progress" or not game["clock"]:
+		return
+	game["sync_timer"] = wheel.schedule(settings.CHESS_CLOCK_SYNC_INTERVAL, sync_clock, game_key)
+	await get_channel_layer().group_send(
+		f"chess_{game_key}",
+		{
+			"type": "clock.sync",
+			"clock": clock_state(game)
+		}
+	)
+
+
+async def play_move(game_key, color, from_pos, to_pos, moved_at, promotion=None):
+	"""
+	Plays a move of ``color`` in a game held in memory: presses the clock,
+	stores the move and finishes the game if it ended it. Premoves name
+	their ``promotion`` piece up front; otherwise a promotion is left
+	pending until the player chooses.
+
+	Returns:
+		(success, message, result, move): the engine's result, and the ply
+		as sent in update frames
+
+	Raises:
+		EngineBusy: if the validation pool is saturated
+	"""
+	game = chess_games[game_key]
+	game_obj = game["game_obj"]
+	async with game["game_logic"].lock:
+		piece = game["board"].get(from_pos) if from_pos in SQUARE_INDEX else None
+		piece_info = piece.to_dict(from_pos, game["board"].has_moved(SQUARE_INDEX[from_pos])) if piece else None
+
+	success, message, updated_board, result = await game["game_logic"].make_move_async(from_pos, to_pos, color, promotion)
+	if not success:
+		return False, message, result, None
+
+	game["board"] = updated_board
+	game["move_history"].append({
+		"from": from_pos,
+		"to": to_pos,
+		"player": color,
+		"piece": piece_info
 	})
-	game_obj.save()
+	move = {
+		"from": from_pos,
+		"to": to_pos,
+		"player": color
+	}
+
+	if result.get('promotion_pending') == True:
+		game["promotion_pending"] = True
+		game["promotion_color"] = color
+	else:
+		promotion = result.get('info', {}).get('promotion')
+		if promotion:
+			move["promotion"] = promotion
+		game["current_player"] = "black" if color == "white" else "white"
+		if game["clock"]:
+			game["clock"].press(color, moved_at)
+			arm_clock(game_key)
+		await save_move_to_db(game_obj, from_pos, to_pos, color, updated_board, piece_info, promotion, game["clock"])
+
+	if result.get('game_over'):
+		winner_color = result.get('winner')
+		game["status"] = "finished"
+		stop_timers(game)
+		# Draws, adjudicated ones included, have no winner
+		winner_user = None
+		if winner_color:
+			winner_user = await sync_to_async(lambda: game_obj.player_white if winner_color == "white" else game_obj.player_black)()
+
+		await update_game_in_db(
+			game_obj,
+			updated_board,
+			status="finished",
+			winner=winner_user,
+			clock=game["clock"],
+			reason=result.get('game_state')
+		)
+	return True, message, result, move
 
 
 class ChessConsumer(AsyncWebsocketConsumer):
@@ -93,28 +356,44 @@ class ChessConsumer(AsyncWebsocketConsumer):
 		
 		if self.game_key not in chess_games:
 			db_state = await get_current_game_state(self.game_obj)
-			chess_logic = ChessLogic(game_mode=self.game_obj.game_mode)
+			chess_logic = ChessLogic(game_mode=self.game_obj.game_mode, start_position=self.game_obj.start_position)
+			chess_logic.set_current_player(db_state['current_player'] or "white")
 			
 			if db_state['board_state']:
-				chess_logic.load_board_from_serialized(db_state['board_state'])
+				chess_logic.resume(db_state['board_state'], db_state['pending_moves'])
 				board = chess_logic.get_board()
 			else:
 				board = None
 			
 			chess_games[self.game_key] = {
+				# One model instance per game, shared by both players' consumers
+				"game_obj": self.game_obj,
 				"players": {},
 				"ready": {},
 				"game_logic": chess_logic,
 				"board": board,
 				"status": db_state['status'],
 				"current_player": db_state['current_player'] or "white",
-				"move_history": db_state['history'] or []
+				"move_history": db_state['history'] or [],
+				"clock": make_clock(self.game_obj),
+				"flag_timer": None,
+				"sync_timer": None,
+				"abandon_timers": {},
+				# One queued move per colour, played as soon as its turn comes
+				"premoves": {}
 			}
 			
 			if db_state['status'] == 'in_progress' or db_state['status'] == 'finished':
 				chess_games[self.game_key]["ready"] = {"white": True, "black": True}
+			
+			wheel.ensure_running()
+			if board and db_state['status'] == 'in_progress' and chess_games[self.game_key]["clock"]:
+				# Time spent while no worker held the game is not charged
+				chess_games[self.game_key]["clock"].start(chess_games[self.game_key]["current_player"])
+				arm_clock(self.game_key)
 		
 		game = chess_games[self.game_key]
+		self.game_obj = game["game_obj"]
 		
 		if self.color not in game["players"]:
 			game["players"][self.color] = {
@@ -123,6 +402,7 @@ class ChessConsumer(AsyncWebsocketConsumer):
 			}
 		else:
 			game["players"][self.color]["connected"] = True
+		watch_presence(self.game_key)
 		
 		await self.channel_layer.group_send(
 			self.group_name,
@@ -135,20 +415,26 @@ class ChessConsumer(AsyncWebsocketConsumer):
 		)
 		
 		if game["board"]:
-			serialized_board = serialize_board(game["board"])
+			serialized_board, legal_moves = await board_view(game, self.game_obj.game_mode)
 			await self.send(text_data=json.dumps({
 				"status": "sync_state",
 				"board": serialized_board,
 				"current_player": game["current_player"],
-				"game_status": game["status"]
+				"game_status": game["status"],
+				"legal_moves": legal_moves,
+				"clock": clock_state(game)
 			}))
 			
 			if game["status"] == "finished":
-				winner = self.game_obj.winner
-				winner_color = "white" if winner == self.game_obj.player_white else "black"
+				# The shared instance holds the result, however the game ended; a draw has no winner
+				game_obj = game["game_obj"]
+				winner_color = None
+				if game_obj.winner_id is not None:
+					winner_color = "white" if game_obj.winner_id == game_obj.player_white_id else "black"
 				last_move = game["move_history"][-1] if game["move_history"] else None
 				reason = {
-					"status": "checkmate"
+					"status": game_obj.end_reason or None,
+					"winner": winner_color
 				}
 				await self.send(text_data=json.dumps({
 					"status": "game_over",
@@ -180,6 +466,7 @@ class ChessConsumer(AsyncWebsocketConsumer):
 		game = chess_games.get(self.game_key)
 		if game and self.color in game["players"]:
 			game["players"][self.color]["connected"] = False
+			watch_presence(self.game_key)
 			await self.channel_layer.group_send(
 				self.group_name,
 				{
@@ -189,7 +476,9 @@ class ChessConsumer(AsyncWebsocketConsumer):
 					"status": "disconnected"
 				}
 			)
-		await self.channel_layer.group_discard(self.group_name, self.channel_name)
+			forget_if_idle(self.game_key)
+		if hasattr(self, "group_name"):
+			await self.channel_layer.group_discard(self.group_name, self.channel_name)
 
 	async def receive(self, text_data):
 		try:
@@ -221,24 +510,41 @@ class ChessConsumer(AsyncWebsocketConsumer):
 					game["board"] = board
 					game["status"] = "in_progress"
 					game["current_player"] = "white"
+					if game["clock"]:
+						game["clock"].start("white")
+						arm_clock(self.game_key)
+					watch_presence(self.game_key)
 					await update_game_in_db(self.game_obj, board, status="in_progress")
-					serialized_board = serialize_board(board)
+					serialized_board, legal_moves = await board_view(game, self.game_obj.game_mode)
 					await self.channel_layer.group_send(
 						self.group_name,
 						{
 							"type": "game.start",
 							"board": serialized_board,
-							"current_player": "white"
+							"current_player": "white",
+							"legal_moves": legal_moves,
+							"clock": clock_state(game)
 						}
 					)
 				else:
-					serialized_board = serialize_board(game["board"])
+					serialized_board, legal_moves = await board_view(game, self.game_obj.game_mode)
 					await self.send(text_data=json.dumps({
 						"status": "game_starting",
 						"board": serialized_board,
-						"current_player": game["current_player"]
+						"current_player": game["current_player"],
+						"legal_moves": legal_moves,
+						"clock": clock_state(game)
 					}))
-		elif action == "move":
+		elif action in ("move", "premove"):
+			from_pos = data.get("from")
+			to_pos = data.get("to")
+			promotion = data.get("promotion") if action == "premove" else None
+			
+			if action == "premove" and game["current_player"] != self.color:
+				if await self.queue_premove(game, from_pos, to_pos, promotion):
+					return
+			
+			# A premove that arrives once its turn has come is played as a move
 			if game["current_player"] != self.color:
 				await self.send(text_data=json.dumps({
 					"status": "error",
@@ -249,22 +555,22 @@ class ChessConsumer(AsyncWebsocketConsumer):
 			if not game["board"]:
 				return
 			
-			from_pos = data.get("from")
-			to_pos = data.get("to")
-			piece = game["board"].get(from_pos)
-			piece_info = piece.to_dict() if piece else None
+			# Time is charged when the move arrives, not after validation
+			moved_at = time.monotonic()
+			if game["clock"] and game["clock"].flagged(moved_at):
+				await flag_fall(self.game_key)
+				return
 			
-			success, message, updated_board, result = game["game_logic"].make_move(from_pos, to_pos, self.color)
+			try:
+				success, message, result, move = await play_move(self.game_key, self.color, from_pos, to_pos, moved_at, promotion)
+			except EngineBusy as e:
+				await self.send(text_data=json.dumps({
+					"status": "error",
+					"message": str(e)
+				}))
+				return
 			
 			if success:
-				game["board"] = updated_board
-				game["move_history"].append({
-					"from": from_pos,
-					"to": to_pos,
-					"player": self.color,
-					"piece": piece_info
-				})
-				
 				# Check for promotion in the result
 				promotion_data = None
 				if result.get('promotion_pending') == True:
@@ -273,29 +579,12 @@ class ChessConsumer(AsyncWebsocketConsumer):
 						"piece_type": None,
 						"color": self.color
 					}
-					game["promotion_pending"] = True
-					game["promotion_color"] = self.color
-				else:
-					game["current_player"] = "black" if self.color == "white" else "white"
-					await update_game_in_db(self.game_obj, updated_board)
-					await save_move_to_db(self.game_obj, from_pos, to_pos, self.color, piece_info)
 				
 				if result.get('game_over'):
-					winner_color = result.get('winner')
-					game["status"] = "finished"
-					winner_user = await sync_to_async(lambda: self.game_obj.player_white if winner_color == "white" else self.game_obj.player_black)()
-					
-					await update_game_in_db(
-						self.game_obj, 
-						updated_board, 
-						status="finished", 
-						winner=winner_user
-					)
-					
 					# Include promotion data in game over event if available
 					game_over_event = {
 						"type": "game.over",
-						"winner": winner_color,
+						"winner": result.get('winner'),
 						"reason": result.get('game_over')
 					}
 					
@@ -307,40 +596,30 @@ class ChessConsumer(AsyncWebsocketConsumer):
 						game_over_event
 					)
 				else:
-					# Include promotion data in game update event if available
-					game_update_event = {
-						"type": "game.update",
-						"board": serialize_board(updated_board),
-						"last_move": {
-							"from": from_pos,
-							"to": to_pos,
-							"player": self.color
-						},
-						"current_player": game["current_player"]
-					}
-					
-					if promotion_data and promotion_data.get('piece_type') != None:
-						game_update_event["promotion"] = promotion_data
-					
-					await self.channel_layer.group_send(
-						self.group_name,
-						game_update_event
-					)
+					await self.broadcast_update(move, last_move=move)
 			else:
 				await self.send(text_data=json.dumps({
 					"status": "error",
 					"message": message
 				}))
+		elif action == "cancel_premove":
+			game["premoves"].pop(self.color, None)
+			await self.send(text_data=json.dumps({
+				"status": "premove_cancelled"
+			}))
 		elif action == "resign":
 			winner_color = "black" if self.color == "white" else "white"
 			winner_user = await sync_to_async(lambda: self.game_obj.player_white if winner_color == "white" else self.game_obj.player_black)()
 			game["status"] = "finished"
+			stop_timers(game)
 			
 			await update_game_in_db(
 				self.game_obj, 
 				game["board"], 
 				status="finished", 
-				winner=winner_user
+				winner=winner_user,
+				clock=game["clock"],
+				reason="resignation"
 			)
 			
 			await self.channel_layer.group_send(
@@ -353,36 +632,94 @@ class ChessConsumer(AsyncWebsocketConsumer):
 			)
 		elif action == "sync_request":
 			if game["board"]:
-				serialized_board = serialize_board(game["board"])
+				serialized_board, legal_moves = await board_view(game, self.game_obj.game_mode)
 				await self.send(text_data=json.dumps({
 					"status": "sync_state",
 					"game_mode": self.game_obj.game_mode,
 					"board": serialized_board,
 					"current_player": game["current_player"],
 					"game_status": game["status"],
-					"your_color": self.color
+					"your_color": self.color,
+					"legal_moves": legal_moves
+				}))
+		elif action == "analysis":
+			# Post-game only, so the engine cannot be consulted during this game;
+			# EngineAnalysisView likewise refuses players with a game in progress
+			if game["status"] != "finished" or not game["board"]:
+				await self.send(text_data=json.dumps({
+					"status": "error",
+					"message": "Analysis is only available once the game is over"
+				}))
+				return
+			try:
+				future = submit_search(
+					analyse,
+					data.get("position") or encode_position(game["board"]),
+					self.game_obj.game_mode,
+					float(data.get("time_limit", 1)),
+					data.get("depth"),
+					self.game_obj.start_position
+				)
+				result = await asyncio.wrap_future(future)
+			except EngineBusy as e:
+				await self.send(text_data=json.dumps({
+					"status": "error",
+					"message": str(e)
 				}))
+				return
+			except (TypeError, ValueError) as e:
+				await self.send(text_data=json.dumps({
+					"status": "error",
+					"message": f"Invalid analysis request: {e}"
+				}))
+				return
+			await self.send(text_data=json.dumps({
+				"status": "analysis",
+				"analysis": result
+			}))
 		elif action == "promotion_choice":
 			if game.get("promotion_pending") and game.get("promotion_color") == self.color:
 				promotion_choice = data.get("piece_type")
+				# The pawn's clock keeps running until the piece is chosen
+				chosen_at = time.monotonic()
+				if game["clock"] and game["clock"].flagged(chosen_at):
+					await flag_fall(self.game_key)
+					return
 		
-				success, message, updated_board, result = game["game_logic"].handle_promotion(promotion_choice)
+				try:
+					success, message, updated_board, result = await game["game_logic"].handle_promotion_async(promotion_choice)
+				except EngineBusy as e:
+					await self.send(text_data=json.dumps({
+						"status": "error",
+						"message": str(e)
+					}))
+					return
 		
 				if success:
 					game["board"] = updated_board
 					game["promotion_pending"] = False
-					await update_game_in_db(self.game_obj, updated_board)
+					# The pawn move was held back until the piece was chosen
+					pawn_move = game["move_history"][-1]
+					if game["clock"] and not result.get('game_over'):
+						game["clock"].press(self.color, chosen_at)
+						arm_clock(self.game_key)
+					await save_move_to_db(self.game_obj, pawn_move["from"], pawn_move["to"], self.color, updated_board, pawn_move["piece"], promotion_choice, game["clock"])
 		
 					if result.get('game_over'):
 						winner_color = result.get('winner')
 						game["status"] = "finished"
-						winner_user = await sync_to_async(lambda: self.game_obj.player_white if winner_color == "white" else self.game_obj.player_black)()
+						stop_timers(game)
+						winner_user = None
+						if winner_color:
+							winner_user = await sync_to_async(lambda: self.game_obj.player_white if winner_color == "white" else self.game_obj.player_black)()
 		
 						await update_game_in_db(
 							self.game_obj, 
 							updated_board, 
 							status="finished", 
-							winner=winner_user
+							winner=winner_user,
+							clock=game["clock"],
+							reason=result.get('game_state')
 						)
 		
 						await self.channel_layer.group_send(
@@ -396,17 +733,17 @@ class ChessConsumer(AsyncWebsocketConsumer):
 						)
 					else:
 						game["current_player"] = "black" if self.color == "white" else "white"
-						await self.channel_layer.group_send(
-							self.group_name,
+						await self.broadcast_update(
 							{
-								"type": "game.update",
-								"board": serialize_board(updated_board),
-								"promotion": {
-									"square": game["move_history"][-1]["to"],
-									"piece_type": promotion_choice,
-									"color": self.color
-								},
-								"current_player": game["current_player"]
+								"from": pawn_move["from"],
+								"to": pawn_move["to"],
+								"player": self.color,
+								"promotion": promotion_choice
+							},
+							promotion={
+								"square": pawn_move["to"],
+								"piece_type": promotion_choice,
+								"color": self.color
 							}
 						)
 				else:
@@ -420,6 +757,85 @@ class ChessConsumer(AsyncWebsocketConsumer):
 					"message": "Not your turn"
 				}))
 
+	async def queue_premove(self, game, from_pos, to_pos, promotion):
+		"""
+		Keeps one move to play as soon as it is this player's turn, replacing
+		any queued before. Returns False, queuing nothing, if the turn came
+		while waiting for the lock; the caller then plays it as a move.
+		"""
+		# Checked and queued under the game's lock, so a move running in the pool is never seen half-made
+		async with game["game_logic"].lock:
+			if game["current_player"] == self.color:
+				return False
+			piece = game["board"].get(from_pos) if game["board"] and from_pos in SQUARE_INDEX else None
+			premove = None
+			if game["status"] != "in_progress" or to_pos not in SQUARE_INDEX:
+				message = "Invalid premove"
+			elif piece is None or piece.color != self.color:
+				message = "No piece of yours on that square"
+			elif promotion is not None and promotion not in PROMOTION_CHOICES:
+				message = "Invalid promotion choice. Choose queen, rook, bishop, or knight"
+			else:
+				premove = {"from": from_pos, "to": to_pos, "promotion": promotion}
+				game["premoves"][self.color] = premove
+		if premove:
+			await self.send(text_data=json.dumps({
+				"status": "premove_queued",
+				"premove": premove
+			}))
+			return True
+		await self.send(text_data=json.dumps({
+			"status": "error",
+			"message": message
+		}))
+		return True
+
+	async def broadcast_update(self, move, **fields):
+		"""
+		Broadcasts the game after ``move``. If the side now to move queued a
+		premove it is played first, and the frame carries both plies in
+		``moves``; an illegal premove is dropped and reported instead.
+		"""
+		game = chess_games[self.game_key]
+		color = game["current_player"]
+		premove = None
+		if game["status"] == "in_progress" and not game.get("promotion_pending"):
+			premove = game["premoves"].pop(color, None)
+		game_over_event = None
+		if premove:
+			try:
+				success, message, result, second = await play_move(
+					self.game_key, color, premove["from"], premove["to"], time.monotonic(), premove["promotion"]
+				)
+			except EngineBusy as e:
+				success, message = False, str(e)
+			if success:
+				fields["last_move"] = second
+				fields["moves"] = [move, second]
+				if result.get('game_over'):
+					game_over_event = {
+						"type": "game.over",
+						"winner": result.get('winner'),
+						"reason": result.get('game_over')
+					}
+			else:
+				fields["premove_rejected"] = {"color": color, "message": message}
+		
+		serialized_board, legal_moves = await board_view(game, self.game_obj.game_mode)
+		await self.channel_layer.group_send(
+			self.group_name,
+			{
+				"type": "game.update",
+				"board": serialized_board,
+				"current_player": game["current_player"],
+				"legal_moves": legal_moves,
+				"clock": clock_state(game),
+				**fields
+			}
+		)
+		if game_over_event:
+			await self.channel_layer.group_send(self.group_name, game_over_event)
+
 	async def player_status(self, event):
 		await self.send(text_data=json.dumps({
 			"status": "player_status",
@@ -439,14 +855,24 @@ class ChessConsumer(AsyncWebsocketConsumer):
 		await self.send(text_data=json.dumps({
 			"status": "game_starting",
 			"board": event["board"],
-			"current_player": event["current_player"]
+			"current_player": event["current_player"],
+			"legal_moves": event.get("legal_moves", {}),
+			"clock": event.get("clock")
+		}))
+
+	async def clock_sync(self, event):
+		await self.send(text_data=json.dumps({
+			"status": "clock_sync",
+			"clock": event["clock"]
 		}))
 
 	async def game_update(self, event):
 		update_data = {
 			"status": "game_update",
 			"board": event["board"],
-			"current_player": event["current_player"]
+			"current_player": event["current_player"],
+			"legal_moves": event.get("legal_moves", {}),
+			"clock": event.get("clock")
 		}
 		
 		if "last_move" in event:
@@ -454,6 +880,11 @@ class ChessConsumer(AsyncWebsocketConsumer):
 			
 		if "promotion" in event:
 			update_data["promotion"] = event["promotion"]
+		
+		# Both plies when a queued premove was played right after the move
+		for key in ("moves", "premove_rejected"):
+			if key in event:
+				update_data[key] = event[key]
 			
 		await self.send(text_data=json.dumps(update_data))
 
@@ -481,7 +912,8 @@ class ChessConsumer(AsyncWebsocketConsumer):
 			"last_move": {
 				"from": last_move["from"],
 				"to": last_move["to"]
-			} if last_move else None
+			} if last_move else None,
+			"clock": event.get("clock")
 		}
 	
 		# Send the constructed data to the client
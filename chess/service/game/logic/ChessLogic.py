@@ -1,24 +1,32 @@
+import asyncio
 from .modes import ClassicChess, HordeChess, Chess960, KirbyChess, BombChess
+from .bitboard import Board, SQUARE_INDEX, COLORS, COLOR_INDEX
+from .fen import decode_position, parse_uci
+from .cache import position_cache
+from .executor import run_in_pool
+from . import instrumentation
 
 import logging
 logger = logging.getLogger('chess_game')
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 
 class ChessLogic:
-    def __init__(self, game_mode: str = 'classic'):
+    def __init__(self, game_mode: str = 'classic', start_position: int = None):
         self.mode_handlers = {
             'classic': ClassicChess(),
             'horde': HordeChess(),
-            '960': Chess960(),
+            '960': Chess960(start_position),
             'kirby': KirbyChess(),
             'bomb': BombChess()
         }
         self.game_mode = self.mode_handlers.get(game_mode, ClassicChess())
+        self.mode_name = game_mode if game_mode in self.mode_handlers else 'classic'
         self.board = None
         self.current_player = 'white'
         self.move_history = []
         self.state = 'PLAYING'
         self.promotion_position = None
+        # Serializes the async facade so one game's moves never overlap in the pool
+        self.lock = asyncio.Lock()
 
     def initialize_game(self):
         self.board = self.game_mode.initialize_board()
@@ -41,10 +49,11 @@ class ChessLogic:
         if player_color != self.current_player:
             return False, "Not your turn", self.board, {}
     
-        success, message, new_board, info = self.game_mode.validate_move(
-            self.board, from_pos, to_pos, player_color, promotion_choice
-        )
-        logger.debug(f"on make_move, info {info}")
+        with self.timed('validation'):
+            success, message, new_board, info = self.game_mode.validate_move(
+                self.board, from_pos, to_pos, player_color, promotion_choice
+            )
+        logger.debug("on make_move, info %s", info)
         if not success:
             return False, message, self.board, {}
     
@@ -71,6 +80,28 @@ class ChessLogic:
         }
         return True, message, self.board, result
 
+    async def make_move_async(self, from_pos: str, to_pos: str, player_color: str, promotion_choice: str = None):
+        """
+        make_move run in the validation pool, so the event loop stays free.
+        The next side's legal moves are generated in the same job.
+
+        Raises:
+            EngineBusy: if the pool is saturated
+        """
+        async with self.lock:
+            return await run_in_pool(self._with_prefetch, self.make_move, from_pos, to_pos, player_color, promotion_choice)
+
+    async def handle_promotion_async(self, promotion_choice: str):
+        """handle_promotion run in the validation pool, see make_move_async"""
+        async with self.lock:
+            return await run_in_pool(self._with_prefetch, self.handle_promotion, promotion_choice)
+
+    def _with_prefetch(self, func, *args):
+        result = func(*args)
+        if self.state == 'PLAYING':
+            self.get_all_possible_moves(self.current_player)
+        return result
+
     def handle_promotion(self, promotion_choice: str):
 
         if self.state != 'PROMOTION_PENDING' or not self.promotion_position:
@@ -83,17 +114,15 @@ class ChessLogic:
                 'promotion_pending': True,
                 'promotion_position': self.promotion_position
             }
-        logger.debug(f"handle_promotion 1")
-        success, message, new_board, info = self.game_mode.complete_promotion(
-            self.board, self.promotion_position, promotion_choice
-        )
-        logger.debug(f"handle_promotion 2")
+        with self.timed('validation'):
+            success, message, new_board, info = self.game_mode.complete_promotion(
+                self.board, self.promotion_position, promotion_choice
+            )
         if 'error' in info:
             return False, info['error'], self.board, {
                 'promotion_pending': True,
                 'promotion_position': self.promotion_position
             }
-        logger.debug(f"handle_promotion 3")
 
         from_pos = next(
             (move['from'] for move in reversed(self.move_history) if move['to'] == self.promotion_position),
@@ -117,6 +146,7 @@ class ChessLogic:
         return True, result['message'], self.board, result
 
     def _complete_move(self, from_pos: str, to_pos: str, player_color: str, info: dict):
+        self.board.commit()
         self.move_history.append({
             'from': from_pos,
             'to': to_pos,
@@ -128,7 +158,8 @@ class ChessLogic:
         self.promotion_position = None
 
     def _check_game_status(self):
-        game_state, winner = self.game_mode.check_game_over(self.board, self.current_player)
+        with self.timed('game_over'):
+            game_state, winner = self.game_mode.check_game_over(self.board, self.current_player)
         if game_state is not None:
             self.state = 'GAME_OVER'
         return game_state, winner
@@ -136,24 +167,29 @@ class ChessLogic:
     def get_possible_moves(self, position: str):
         if position not in self.board or self.board[position] is None:
             return []
-        return self.board[position].get_possible_moves(self.board)
-        #return self.board[position].get_legal_moves(self.board)
-
+        return self.get_all_possible_moves(self.board[position].color).get(position, [])
 
     def get_all_possible_moves(self, player_color: str):
-        moves = {
-            pos: self.get_possible_moves(pos)
-            for pos, piece in self.board.items()
-            if piece is not None and piece.color == player_color and self.get_possible_moves(pos)
-        }
-        return moves
+        """
+        Legal moves of player_color as {from_square: [to_square, ...]}.
+        The map comes from the process-wide position cache and is shared
+        with other games, so callers must not modify it.
+        """
+        return position_cache.lookup(self.game_mode, self.board, COLOR_INDEX[player_color]).moves
 
-    def load_board_from_serialized(self, serialized_board: dict):
+    def load_board_from_serialized(self, serialized_board):
         if not serialized_board:
             self.initialize_game()
             return self.board
 
-        reconstructed_board = {}
+        # Stored positions are encoded strings; older rows hold square dicts
+        if isinstance(serialized_board, str):
+            reconstructed_board = decode_position(serialized_board, self.game_mode.create_piece)
+            self.game_mode.start_position_history(reconstructed_board)
+            self.board = reconstructed_board
+            return self.board
+
+        reconstructed_board = Board()
         for position, piece_data in serialized_board.items():
             if piece_data is None:
                 reconstructed_board[position] = None
@@ -163,24 +199,48 @@ class ChessLogic:
             color = piece_data.get('color')
             piece = self.game_mode.create_piece(piece_type, color)
 
-            if piece and hasattr(piece, 'has_moved'):
-                piece.has_moved = piece_data.get('has_moved', False)
-            if piece_type == 'pawn':
-                piece.en_passant_vulnerable = piece_data.get('en_passant_vulnerable', False)
-            if piece_type == 'king':
-                piece.castling_rights = piece_data.get('castling_rights', None)
-
             reconstructed_board[position] = piece
+            if piece and piece_data.get('has_moved', False):
+                reconstructed_board.set_moved(SQUARE_INDEX[position])
 
+        reconstructed_board.update_castling_rights()
+        reconstructed_board.set_turn(COLOR_INDEX[self.current_player])
+        self.game_mode.start_position_history(reconstructed_board)
         self.board = reconstructed_board
         return self.board
 
+    def resume(self, position, moves: list):
+        """
+        Rebuilds a game from a stored position and the UCI moves played since,
+        so the cost depends on the moves since the snapshot, not the game length.
+        """
+        self.load_board_from_serialized(position)
+        if isinstance(position, str):
+            self.current_player = COLORS[self.board.turn]
+        for uci_move in moves:
+            from_pos, to_pos, promotion = parse_uci(uci_move)
+            success, message, _, _ = self.make_move(from_pos, to_pos, self.current_player, promotion)
+            if not success:
+                logger.warning("resume: stored move %s rejected: %s", uci_move, message)
+                break
+        return self.board
+
     def get_board(self):
         return self.board
 
+    def timed(self, phase: str):
+        """Times a phase (validation, game_over, serialization) under this game's mode when instrumentation is on"""
+        return instrumentation.timed(self.mode_name, phase)
+
+    def get_start_position(self):
+        """SP-ID of the setup for Chess960 games, None for other modes"""
+        return getattr(self.game_mode, 'start_position', None)
+
     def set_current_player(self, player_color: str):
         if player_color in ['white', 'black']:
             self.current_player = player_color
+            if self.board is not None:
+                self.board.set_turn(COLOR_INDEX[player_color])
 
     def load_move_history(self, history: list):
         self.initialize_game()
@@ -190,7 +250,7 @@ class ChessLogic:
             to_pos = move.get('to')
             player_color = move.get('player')
             if from_pos and to_pos and player_color:
-                success, _, _, _ = self.make_move(from_pos, to_pos, player_color)
+                success, _, _, _ = self.make_move(from_pos, to_pos, player_color, move.get('promotion'))
                 if not success:
                     break
         return self.board
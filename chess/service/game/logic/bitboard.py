@@ -0,0 +1,541 @@
+import random
+from collections.abc import MutableMapping
+
+# Constant for board files
+FILES = "abcdefgh"
+
+# Square index = (rank - 1) * 8 + file_idx, so a1 = 0, h1 = 7, a8 = 56, h8 = 63
+SQUARES = [f"{file}{rank}" for rank in range(1, 9) for file in FILES]
+SQUARE_INDEX = {name: idx for idx, name in enumerate(SQUARES)}
+
+WHITE, BLACK = 0, 1
+COLORS = ('white', 'black')
+COLOR_INDEX = {'white': WHITE, 'black': BLACK}
+
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+PIECE_TYPES = ('pawn', 'knight', 'bishop', 'rook', 'queen', 'king')
+PIECE_INDEX = {name: idx for idx, name in enumerate(PIECE_TYPES)}
+PIECE_VALUES = (1, 3, 3, 5, 9, 0)
+
+# Square colour of each index: 0 for light squares, 1 for dark ones (a1 is dark)
+SQUARE_SHADES = [1 - (index % 8 + index // 8) % 2 for index in range(64)]
+
+# Ray directions as (file delta, rank delta). The first four increase the
+# square index, the last four decrease it.
+ROOK_DIRECTIONS = [(0, 1), (1, 0), (0, -1), (-1, 0)]
+BISHOP_DIRECTIONS = [(1, 1), (-1, 1), (1, -1), (-1, -1)]
+_POSITIVE_DIRECTIONS = {(0, 1), (1, 0), (1, 1), (-1, 1)}
+
+
+def bit(index):
+    return 1 << index
+
+
+def lsb(bb):
+    return (bb & -bb).bit_length() - 1
+
+
+def msb(bb):
+    return bb.bit_length() - 1
+
+
+def iter_bits(bb):
+    while bb:
+        low = bb & -bb
+        yield low.bit_length() - 1
+        bb ^= low
+
+
+def popcount(bb):
+    return bin(bb).count("1")
+
+
+def squares_of(bb):
+    return [SQUARES[idx] for idx in iter_bits(bb)]
+
+
+def _step_mask(index, deltas):
+    file_idx, rank_idx = index % 8, index // 8
+    mask = 0
+    for dx, dy in deltas:
+        f, r = file_idx + dx, rank_idx + dy
+        if 0 <= f < 8 and 0 <= r < 8:
+            mask |= bit(r * 8 + f)
+    return mask
+
+
+def _ray(index, direction):
+    dx, dy = direction
+    f, r = index % 8 + dx, index // 8 + dy
+    mask = 0
+    while 0 <= f < 8 and 0 <= r < 8:
+        mask |= bit(r * 8 + f)
+        f += dx
+        r += dy
+    return mask
+
+
+KNIGHT_ATTACKS = [
+    _step_mask(idx, [(2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2)])
+    for idx in range(64)
+]
+KING_ATTACKS = [
+    _step_mask(idx, [(0, 1), (1, 1), (1, 0), (1, -1), (0, -1), (-1, -1), (-1, 0), (-1, 1)])
+    for idx in range(64)
+]
+# Squares a pawn of the given colour on a square attacks
+PAWN_ATTACKS = [
+    [_step_mask(idx, [(-1, 1), (1, 1)]) for idx in range(64)],
+    [_step_mask(idx, [(-1, -1), (1, -1)]) for idx in range(64)],
+]
+RAYS = {
+    direction: [_ray(idx, direction) for idx in range(64)]
+    for direction in ROOK_DIRECTIONS + BISHOP_DIRECTIONS
+}
+
+
+def _sliding_attacks(index, occupied, directions):
+    attacks = 0
+    for direction in directions:
+        ray = RAYS[direction][index]
+        blockers = ray & occupied
+        if blockers:
+            blocker = lsb(blockers) if direction in _POSITIVE_DIRECTIONS else msb(blockers)
+            ray ^= RAYS[direction][blocker]
+        attacks |= ray
+    return attacks
+
+
+
+def _between(a, b):
+    for direction in ROOK_DIRECTIONS + BISHOP_DIRECTIONS:
+        ray = RAYS[direction][a]
+        if ray & bit(b):
+            return ray & ~RAYS[direction][b] & ~bit(b)
+    return 0
+
+
+# Squares strictly between two squares on a shared rank, file or diagonal (0 otherwise)
+BETWEEN = [[_between(a, b) for b in range(64)] for a in range(64)]
+
+
+def rook_attacks(index, occupied):
+    return _sliding_attacks(index, occupied, ROOK_DIRECTIONS)
+
+
+def bishop_attacks(index, occupied):
+    return _sliding_attacks(index, occupied, BISHOP_DIRECTIONS)
+
+
+def queen_attacks(index, occupied):
+    return rook_attacks(index, occupied) | bishop_attacks(index, occupied)
+
+
+# Castling rights bits
+WHITE_KING_SIDE, WHITE_QUEEN_SIDE, BLACK_KING_SIDE, BLACK_QUEEN_SIDE = 1, 2, 4, 8
+# (king square, rook square, right) for each castling, from each side's home squares
+CASTLING_HOMES = [
+    (SQUARE_INDEX["e1"], SQUARE_INDEX["h1"], WHITE_KING_SIDE),
+    (SQUARE_INDEX["e1"], SQUARE_INDEX["a1"], WHITE_QUEEN_SIDE),
+    (SQUARE_INDEX["e8"], SQUARE_INDEX["h8"], BLACK_KING_SIDE),
+    (SQUARE_INDEX["e8"], SQUARE_INDEX["a8"], BLACK_QUEEN_SIDE),
+]
+# Rights lost when a piece leaves or lands on each square
+CASTLING_MASKS = [0] * 64
+for _king, _rook, _right in CASTLING_HOMES:
+    CASTLING_MASKS[_king] |= _right
+    CASTLING_MASKS[_rook] |= _right
+
+
+# Zobrist keys, from a fixed seed so hashes are stable across processes
+_zobrist_random = random.Random(0x5EED)
+ZOBRIST_PIECES = [
+    [[_zobrist_random.getrandbits(64) for _ in range(64)] for _ in range(6)]
+    for _ in range(2)
+]
+ZOBRIST_CASTLING = [_zobrist_random.getrandbits(64) for _ in range(16)]
+ZOBRIST_EN_PASSANT = [_zobrist_random.getrandbits(64) for _ in range(8)]
+ZOBRIST_BLACK_TO_MOVE = _zobrist_random.getrandbits(64)
+
+
+def piece_kind(piece):
+    return PIECE_INDEX[piece.__class__.__name__.lower()]
+
+
+class Undo:
+    """Everything needed to take a move back with ``Board.pop``"""
+
+    __slots__ = ('from_index', 'to_index', 'captured', 'changes', 'moved',
+                 'castling_rights', 'en_passant_target', 'half_move_clock',
+                 'piece_attacks', 'attack_maps', 'zobrist')
+
+    def __init__(self, board, from_index, to_index):
+        self.from_index = from_index
+        self.to_index = to_index
+        self.captured = None
+        # (square index, piece that was there) in the order they were changed
+        self.changes = []
+        # Moved-pieces bitboard before the move
+        self.moved = board.moved
+        self.castling_rights = board.castling_rights
+        self.en_passant_target = board.en_passant_target
+        self.half_move_clock = board.half_move_clock
+        # Attack tables before the move, restored as-is on pop
+        self.piece_attacks = board.piece_attacks[:]
+        self.attack_maps = board.attack_maps[:]
+        self.zobrist = board.zobrist
+
+
+class Board(MutableMapping):
+    """
+    Bitboard backed chess board.
+
+    Holds one 64-bit integer per colour and piece type plus a square table
+    with the piece objects, and behaves like the old ``{square: piece}`` dict
+    so modes, the consumer and the serializers keep working on square names.
+
+    The squares attacked by every piece are kept in ``piece_attacks`` and
+    updated incrementally: a change only recomputes the changed squares and
+    the sliders whose attack set crosses them. Per-colour attack maps are
+    built from those on demand and cached until the next change.
+
+    ``zobrist`` is the 64-bit hash of the position (pieces, side to move,
+    castling rights and a capturable en-passant file), updated with each change.
+
+    ``piece_counts[color][kind]``, ``material[color]`` (pawn = 1 ... queen = 9)
+    and ``bishop_shades[color][shade]`` are kept up to date the same way.
+
+    Pieces are shared flyweights, so the square-dependent state lives here:
+    ``moved`` has a bit set for every occupied square whose piece has moved.
+    """
+
+    def __init__(self):
+        self.bitboards = [[0] * 6, [0] * 6]
+        self.occupancy = [0, 0]
+        self.squares = [None] * 64
+        self.moved = 0
+        self.piece_counts = [[0] * 6, [0] * 6]
+        self.material = [0, 0]
+        self.bishop_shades = [[0, 0], [0, 0]]
+        self.piece_attacks = [0] * 64
+        self.attack_maps = [None, None]
+        self.castling_rights = 0
+        self.en_passant_target = None
+        self.half_move_clock = 0
+        self.turn = WHITE
+        self.zobrist = ZOBRIST_CASTLING[0]
+        self.undo_stack = []
+
+    # Mapping interface over square names ("a1" ... "h8")
+    def __getitem__(self, square):
+        return self.squares[SQUARE_INDEX[square]]
+
+    def __setitem__(self, square, piece):
+        index = SQUARE_INDEX[square]
+        self.moved &= ~bit(index)
+        self._clear(index)
+        if piece is not None:
+            self._place(index, piece)
+        self._update_attacks(bit(index))
+
+    def __delitem__(self, square):
+        self.remove(SQUARE_INDEX[square])
+
+    def __contains__(self, square):
+        return square in SQUARE_INDEX
+
+    def __iter__(self):
+        return iter(SQUARES)
+
+    def __len__(self):
+        return 64
+
+    def get(self, square, default=None):
+        index = SQUARE_INDEX.get(square)
+        if index is None:
+            return default
+        return self.squares[index]
+
+    # Square index level primitives
+    def _place(self, index, piece):
+        color = COLOR_INDEX[piece.color]
+        mask = bit(index)
+        kind = piece_kind(piece)
+        self.bitboards[color][kind] |= mask
+        self.occupancy[color] |= mask
+        self.squares[index] = piece
+        self.zobrist ^= ZOBRIST_PIECES[color][kind][index]
+        self.piece_counts[color][kind] += 1
+        self.material[color] += PIECE_VALUES[kind]
+        if kind == BISHOP:
+            self.bishop_shades[color][SQUARE_SHADES[index]] += 1
+
+    def _clear(self, index):
+        piece = self.squares[index]
+        if piece is None:
+            return None
+        color = COLOR_INDEX[piece.color]
+        mask = ~bit(index)
+        kind = piece_kind(piece)
+        self.bitboards[color][kind] &= mask
+        self.occupancy[color] &= mask
+        self.squares[index] = None
+        self.zobrist ^= ZOBRIST_PIECES[color][kind][index]
+        self.piece_counts[color][kind] -= 1
+        self.material[color] -= PIECE_VALUES[kind]
+        if kind == BISHOP:
+            self.bishop_shades[color][SQUARE_SHADES[index]] -= 1
+        return piece
+
+    def put(self, index, piece):
+        self.moved &= ~bit(index)
+        self._clear(index)
+        self._place(index, piece)
+        self._update_attacks(bit(index))
+
+    def remove(self, index):
+        self.moved &= ~bit(index)
+        piece = self._clear(index)
+        if piece is not None:
+            self._update_attacks(bit(index))
+        return piece
+
+    def has_moved(self, index):
+        return (self.moved >> index) & 1 == 1
+
+    def set_moved(self, index, moved=True):
+        if moved:
+            self.moved |= bit(index)
+        else:
+            self.moved &= ~bit(index)
+
+    @property
+    def occupied(self):
+        return self.occupancy[WHITE] | self.occupancy[BLACK]
+
+    def pieces_of(self, color, kind):
+        return self.bitboards[color][kind]
+
+    def king_square(self, color):
+        kings = self.bitboards[color][KING]
+        return lsb(kings) if kings else None
+
+    # Attacks
+    def _update_attacks(self, changed):
+        """Refreshes piece_attacks after the squares in the ``changed`` mask were set"""
+        occupied = self.occupied
+        piece_attacks = self.piece_attacks
+        for index in iter_bits(changed):
+            piece_attacks[index] = self.attacks_from(index, occupied)
+        white, black = self.bitboards
+        sliders = (white[BISHOP] | white[ROOK] | white[QUEEN]
+                   | black[BISHOP] | black[ROOK] | black[QUEEN]) & ~changed
+        for index in iter_bits(sliders):
+            if piece_attacks[index] & changed:
+                piece_attacks[index] = self.attacks_from(index, occupied)
+        self.attack_maps = [None, None]
+
+    def attack_map(self, color):
+        """Bitboard of every square attacked by ``color``"""
+        attacks = self.attack_maps[color]
+        if attacks is None:
+            attacks = 0
+            piece_attacks = self.piece_attacks
+            for index in iter_bits(self.occupancy[color]):
+                attacks |= piece_attacks[index]
+            self.attack_maps[color] = attacks
+        return attacks
+
+    def attackers_to(self, index, color, occupied=None):
+        """Bitboard of the pieces of ``color`` attacking the square ``index``"""
+        if occupied is None:
+            occupied = self.occupied
+        pieces = self.bitboards[color]
+        rooks = pieces[ROOK] | pieces[QUEEN]
+        bishops = pieces[BISHOP] | pieces[QUEEN]
+        return (
+            (PAWN_ATTACKS[color ^ 1][index] & pieces[PAWN])
+            | (KNIGHT_ATTACKS[index] & pieces[KNIGHT])
+            | (KING_ATTACKS[index] & pieces[KING])
+            | (rook_attacks(index, occupied) & rooks if rooks else 0)
+            | (bishop_attacks(index, occupied) & bishops if bishops else 0)
+        )
+
+    def is_attacked(self, index, color, occupied=None):
+        """
+        Whether ``color`` attacks ``index``. Uses the cached attack map unless
+        a different occupancy is given (e.g. with the king lifted off).
+        """
+        if occupied is None:
+            return (self.attack_map(color) >> index) & 1 == 1
+        return self.attackers_to(index, color, occupied) != 0
+
+    def attacks_from(self, index, occupied=None):
+        """Squares attacked by the piece on ``index``, own pieces included"""
+        piece = self.squares[index]
+        if piece is None:
+            return 0
+        if occupied is None:
+            occupied = self.occupied
+        kind = piece_kind(piece)
+        if kind == PAWN:
+            return PAWN_ATTACKS[COLOR_INDEX[piece.color]][index]
+        if kind == KNIGHT:
+            return KNIGHT_ATTACKS[index]
+        if kind == BISHOP:
+            return bishop_attacks(index, occupied)
+        if kind == ROOK:
+            return rook_attacks(index, occupied)
+        if kind == QUEEN:
+            return queen_attacks(index, occupied)
+        return KING_ATTACKS[index]
+
+    # Hashing
+    def _en_passant_key(self):
+        """Zobrist key of the en-passant file, only while the side to move can capture there"""
+        if self.en_passant_target is None:
+            return 0
+        index = SQUARE_INDEX[self.en_passant_target]
+        if PAWN_ATTACKS[self.turn ^ 1][index] & self.bitboards[self.turn][PAWN]:
+            return ZOBRIST_EN_PASSANT[index % 8]
+        return 0
+
+    def set_turn(self, color):
+        if color != self.turn:
+            self.zobrist ^= self._en_passant_key()
+            self.turn = color
+            self.zobrist ^= ZOBRIST_BLACK_TO_MOVE ^ self._en_passant_key()
+
+    def compute_zobrist(self):
+        """Hash of the position computed from scratch"""
+        key = ZOBRIST_CASTLING[self.castling_rights] ^ self._en_passant_key()
+        if self.turn == BLACK:
+            key ^= ZOBRIST_BLACK_TO_MOVE
+        for color in (WHITE, BLACK):
+            for kind in range(6):
+                for index in iter_bits(self.bitboards[color][kind]):
+                    key ^= ZOBRIST_PIECES[color][kind][index]
+        return key
+
+    def update_castling_rights(self):
+        """Derives castling rights from unmoved kings and rooks on their home squares"""
+        self.zobrist ^= ZOBRIST_CASTLING[self.castling_rights]
+        self.castling_rights = 0
+        for king_index, rook_index, right in CASTLING_HOMES:
+            king, rook = self.squares[king_index], self.squares[rook_index]
+            color = WHITE if king_index < 8 else BLACK
+            if (king is not None and not self.has_moved(king_index) and piece_kind(king) == KING
+                    and COLOR_INDEX[king.color] == color
+                    and rook is not None and not self.has_moved(rook_index) and piece_kind(rook) == ROOK
+                    and COLOR_INDEX[rook.color] == color):
+                self.castling_rights |= right
+        self.zobrist ^= ZOBRIST_CASTLING[self.castling_rights]
+
+    # Make / unmake
+    def replace(self, index, piece):
+        """
+        Sets a square as part of the last pushed move so ``pop`` restores it.
+        A piece put on an occupied square inherits its moved flag.
+        """
+        if self.undo_stack:
+            self.undo_stack[-1].changes.append((index, self.squares[index]))
+        # Whatever lands on a king or rook home square has lost its right to castle
+        if self.castling_rights & CASTLING_MASKS[index]:
+            self.zobrist ^= ZOBRIST_CASTLING[self.castling_rights]
+            self.castling_rights &= ~CASTLING_MASKS[index]
+            self.zobrist ^= ZOBRIST_CASTLING[self.castling_rights]
+        self._clear(index)
+        if piece is not None:
+            self._place(index, piece)
+        else:
+            self.moved &= ~bit(index)
+        self._update_attacks(bit(index))
+
+    def _record(self, undo, index, piece):
+        undo.changes.append((index, self.squares[index]))
+        self._clear(index)
+        if piece is not None:
+            self._place(index, piece)
+
+    def _move_piece(self, undo, from_index, to_index):
+        piece = self.squares[from_index]
+        self._record(undo, from_index, None)
+        self._record(undo, to_index, piece)
+        self.moved = (self.moved & ~bit(from_index)) | bit(to_index)
+        return bit(from_index) | bit(to_index)
+
+    def push(self, from_square, to_square, promotion=None):
+        """
+        Plays a move in place and records how to undo it.
+
+        Handles captures, en passant, castling (king moving two files) and
+        promotion when ``promotion`` is given as the new piece instance.
+        Returns the Undo record, which is also kept on ``undo_stack``.
+        """
+        from_index, to_index = SQUARE_INDEX[from_square], SQUARE_INDEX[to_square]
+        undo = Undo(self, from_index, to_index)
+        self.undo_stack.append(undo)
+        self.zobrist ^= self._en_passant_key() ^ ZOBRIST_CASTLING[self.castling_rights]
+
+        piece = self.squares[from_index]
+        kind = piece_kind(piece)
+        undo.captured = self.squares[to_index]
+        changed = 0
+
+        if kind == PAWN and to_square == self.en_passant_target and undo.captured is None:
+            # The captured pawn sits beside the moving pawn, on the rank it left
+            captured_index = (from_index // 8) * 8 + to_index % 8
+            undo.captured = self.squares[captured_index]
+            self._record(undo, captured_index, None)
+            self.moved &= ~bit(captured_index)
+            changed |= bit(captured_index)
+
+        changed |= self._move_piece(undo, from_index, to_index)
+
+        if kind == KING and abs(to_index - from_index) == 2:
+            if to_index > from_index:
+                changed |= self._move_piece(undo, from_index + 3, from_index + 1)
+            else:
+                changed |= self._move_piece(undo, from_index - 4, from_index - 1)
+
+        if promotion is not None:
+            self._record(undo, to_index, promotion)
+
+        self._update_attacks(changed)
+
+        self.castling_rights &= ~(CASTLING_MASKS[from_index] | CASTLING_MASKS[to_index])
+        self.en_passant_target = None
+        if kind == PAWN and abs(to_index - from_index) == 16:
+            self.en_passant_target = SQUARES[(from_index + to_index) // 2]
+        if kind == PAWN or undo.captured is not None:
+            self.half_move_clock = 0
+        else:
+            self.half_move_clock += 1
+        self.turn ^= 1
+        self.zobrist ^= ZOBRIST_BLACK_TO_MOVE ^ ZOBRIST_CASTLING[self.castling_rights] ^ self._en_passant_key()
+        return undo
+
+    def commit(self):
+        """
+        Drops the undo records of the moves played so far, once they are part
+        of the game and will not be taken back. Each record copies the attack
+        tables, so a live game would otherwise keep one per ply.
+        """
+        self.undo_stack.clear()
+
+    def pop(self):
+        """Takes back the last pushed move"""
+        undo = self.undo_stack.pop()
+        for index, piece in reversed(undo.changes):
+            self._clear(index)
+            if piece is not None:
+                self._place(index, piece)
+        self.moved = undo.moved
+        self.piece_attacks = undo.piece_attacks
+        self.attack_maps = undo.attack_maps
+        self.castling_rights = undo.castling_rights
+        self.en_passant_target = undo.en_passant_target
+        self.half_move_clock = undo.half_move_clock
+        self.turn ^= 1
+        self.zobrist = undo.zobrist
+        return undo
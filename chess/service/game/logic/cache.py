@@ -0,0 +1,110 @@
+"""
+Process-wide LRU cache of legal moves and mate/stalemate status per position.
+
+Every game in the worker shares it, so opening positions seen by many
+games are generated once. Entries are keyed by game mode and
+movegen.move_cache_key. Both limits are configurable from the
+environment: the entry count, and an approximate memory budget
+estimated from the size of each move map.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from .bitboard import COLORS
+from .movegen import legal_move_map, move_cache_key
+from .utils import is_in_check
+
+MAX_ENTRIES = int(os.getenv("CHESS_POSITION_CACHE_ENTRIES", 50000))
+MAX_BYTES = int(os.getenv("CHESS_POSITION_CACHE_BYTES", 64 * 1024 * 1024))
+
+# Rough CPython sizes: entry and key overhead, a dict slot plus list per
+# source square, a list slot plus interned square name per target
+_ENTRY_BYTES = 400
+_SOURCE_BYTES = 120
+_TARGET_BYTES = 8
+
+
+class CachedPosition:
+    __slots__ = ("moves", "status", "size")
+
+    def __init__(self, moves, status, size):
+        self.moves = moves
+        self.status = status
+        self.size = size
+
+
+class PositionCache:
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, game_mode, board, color):
+        """
+        Cached legal moves of ``color`` (a colour index) in this position.
+
+        Returns:
+            CachedPosition whose ``moves`` is the {from: [to, ...]} map
+            (shared, must not be modified) and ``status`` the mate/stalemate
+            result as (status, winner), (None, None) while moves remain.
+        """
+        key = (type(game_mode).__name__, move_cache_key(board, color))
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        entry = self._build(board, color)
+        with self._lock:
+            if key not in self.entries:
+                self.entries[key] = entry
+                self.bytes += entry.size
+                self._evict()
+        return entry
+
+    def _build(self, board, color):
+        moves = legal_move_map(board, color)
+        status = (None, None)
+        if not moves:
+            if is_in_check(board, COLORS[color]):
+                status = ("checkmate", COLORS[color ^ 1])
+            else:
+                status = ("stalemate", None)
+        size = _ENTRY_BYTES + sum(_SOURCE_BYTES + _TARGET_BYTES * len(targets) for targets in moves.values())
+        return CachedPosition(moves, status, size)
+
+    def _evict(self):
+        while self.entries and (len(self.entries) > self.max_entries or self.bytes > self.max_bytes):
+            _, entry = self.entries.popitem(last=False)
+            self.bytes -= entry.size
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "approx_bytes": self.bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+position_cache = PositionCache()
@@ -0,0 +1,70 @@
+"""
+Chess clock for base time plus increment (Fischer) time controls.
+
+Times are integer milliseconds; ``now`` is a time.monotonic() reading in
+seconds. Only the side to move is running: its remaining time is the stored
+value minus the time since its clock was started.
+"""
+import time
+
+
+class ChessClock:
+    __slots__ = ("increment", "remaining", "running", "started_at")
+
+    def __init__(self, base_ms, increment_ms=0, white_ms=None, black_ms=None):
+        self.increment = increment_ms
+        self.remaining = {
+            "white": base_ms if white_ms is None else white_ms,
+            "black": base_ms if black_ms is None else black_ms,
+        }
+        self.running = None
+        self.started_at = None
+
+    def start(self, color, now=None):
+        self.running = color
+        self.started_at = time.monotonic() if now is None else now
+
+    def stop(self, now=None):
+        if self.running is not None:
+            self.remaining[self.running] = self.left(self.running, now)
+        self.running = None
+
+    def left(self, color, now=None):
+        """Milliseconds ``color`` has left, never below zero"""
+        if color != self.running:
+            return self.remaining[color]
+        if now is None:
+            now = time.monotonic()
+        return max(0, self.remaining[color] - int((now - self.started_at) * 1000))
+
+    def flagged(self, now=None):
+        """Colour whose time has run out, or None"""
+        if self.running is not None and self.left(self.running, now) <= 0:
+            return self.running
+        return None
+
+    def press(self, color, now=None):
+        """
+        Ends ``color``'s turn: charges the time used, adds the increment
+        and starts the opponent's clock.
+
+        Returns:
+            False (leaving the clock untouched) if ``color`` had already
+            run out of time, True otherwise
+        """
+        if now is None:
+            now = time.monotonic()
+        left = self.left(color, now)
+        if color == self.running and left <= 0:
+            return False
+        self.remaining[color] = left + self.increment
+        self.start("black" if color == "white" else "white", now)
+        return True
+
+    def to_dict(self, now=None):
+        return {
+            "white": self.left("white", now),
+            "black": self.left("black", now),
+            "running": self.running,
+            "increment": self.increment,
+        }
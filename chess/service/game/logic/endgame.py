@@ -0,0 +1,312 @@
+"""
+Endgame tables for a lone king against a few pieces (KQK, KRK, KBNK).
+
+Tables are built offline by retrograde analysis, from the service directory:
+
+    python -m game.logic.endgame build              # every table
+    python -m game.logic.endgame build KQK KRK --dir /srv/endgames
+
+and memory-mapped from CHESS_ENDGAME_DIR when this module is imported, so
+every worker process shares the same pages. Missing tables are skipped.
+The image builds KQK and KRK in a cached layer; KBNK takes minutes, so it
+is built offline and mounted, or requested with the ENDGAME_TABLES build
+argument.
+
+Each table holds one byte per position: 0 for a draw, otherwise the number
+of plies to mate plus one. The lone king's side can never win, so the side
+to move tells whether that is a win or a loss. Positions are stored with
+the strong side as white, its king folded into the a1-d1-d4 triangle by the
+board's 8 symmetries (none of these endings has pawns or castling), so a
+lookup is a few table reads and one byte read: KQK and KRK take 80 KB,
+KBNK 5 MB.
+"""
+import argparse
+import mmap
+import os
+import sys
+import time
+
+from .bitboard import (
+    WHITE, BLACK, KNIGHT, BISHOP, ROOK, QUEEN, KING,
+    KNIGHT_ATTACKS, KING_ATTACKS, bit, lsb, iter_bits, rook_attacks, bishop_attacks, queen_attacks,
+)
+
+TABLE_DIR = os.getenv("CHESS_ENDGAME_DIR", os.path.join(os.path.dirname(__file__), "endgames"))
+
+# Table name -> pieces of the strong side besides its king, in index order
+TABLES = {
+    "KQK": (QUEEN,),
+    "KRK": (ROOK,),
+    "KBNK": (BISHOP, KNIGHT),
+}
+
+
+def _transform(index, symmetry):
+    file, rank = index % 8, index // 8
+    if symmetry & 1:
+        file = 7 - file
+    if symmetry & 2:
+        rank = 7 - rank
+    if symmetry & 4:
+        file, rank = rank, file
+    return rank * 8 + file
+
+
+TRANSFORMS = [[_transform(index, symmetry) for index in range(64)] for symmetry in range(8)]
+TRIANGLE = [index for index in range(64) if index % 8 <= 3 and index // 8 <= index % 8]
+TRIANGLE_INDEX = {index: position for position, index in enumerate(TRIANGLE)}
+# Symmetries taking each king square into the triangle: two for the a1-d4 diagonal
+KING_SYMMETRIES = [
+    [symmetry for symmetry in range(8) if TRANSFORMS[symmetry][index] in TRIANGLE_INDEX]
+    for index in range(64)
+]
+
+
+def table_size(pieces):
+    return 2 * len(TRIANGLE) * 64 ** (len(pieces) + 1)
+
+
+def position_index(weak_to_move, king, weak_king, squares):
+    """
+    Table index of a position with the strong side as white. Symmetric
+    positions share one index: the smallest over the symmetries that put
+    the strong king in the triangle.
+    """
+    best = None
+    for symmetry in KING_SYMMETRIES[king]:
+        transform = TRANSFORMS[symmetry]
+        index = (weak_to_move * len(TRIANGLE) + TRIANGLE_INDEX[transform[king]]) * 64 + transform[weak_king]
+        for square in squares:
+            index = index * 64 + transform[square]
+        if best is None or index < best:
+            best = index
+    return best
+
+
+def _decode(index, count):
+    squares = []
+    for _ in range(count):
+        index, square = divmod(index, 64)
+        squares.append(square)
+    squares.reverse()
+    index, weak_king = divmod(index, 64)
+    weak_to_move, king = divmod(index, len(TRIANGLE))
+    return weak_to_move, TRIANGLE[king], weak_king, squares
+
+
+def _attacks(kind, square, occupied):
+    if kind == KNIGHT:
+        return KNIGHT_ATTACKS[square]
+    if kind == BISHOP:
+        return bishop_attacks(square, occupied)
+    if kind == ROOK:
+        return rook_attacks(square, occupied)
+    if kind == QUEEN:
+        return queen_attacks(square, occupied)
+    return KING_ATTACKS[square]
+
+
+def _attacked(target, pieces, squares, occupied, skip=None):
+    """Whether the strong pieces (``skip`` excepted) attack ``target``"""
+    for position, (kind, square) in enumerate(zip(pieces, squares)):
+        if position != skip and _attacks(kind, square, occupied) & bit(target):
+            return True
+    return False
+
+
+def _weak_moves(pieces, king, weak_king, squares):
+    """
+    Legal moves of the lone king as (target, captures). A capture always
+    leaves a drawn ending, so it is all a caller needs to know about it.
+    """
+    occupied = bit(king) | bit(weak_king)
+    for square in squares:
+        occupied |= bit(square)
+    # Sliders see through the king's current square
+    through = occupied & ~bit(weak_king)
+    moves = []
+    for target in iter_bits(KING_ATTACKS[weak_king] & ~KING_ATTACKS[king] & ~bit(king)):
+        captured = squares.index(target) if target in squares else None
+        if not _attacked(target, pieces, squares, through, captured):
+            moves.append((target, captured is not None))
+    return moves
+
+
+def generate(pieces, progress=None):
+    """
+    Builds the table of KxK for the strong ``pieces`` by retrograde analysis.
+
+    Every lone-king-to-move position first gets a count of its distinct
+    (canonical) replies. Starting from the mates, positions are then
+    resolved one ply at a time: a strong-side position that can move into a
+    lost one is won, and a lone-king position is lost once all of its
+    replies are known to be won. Whatever is left unresolved is a draw.
+    """
+    count = len(pieces)
+    half = table_size(pieces) // 2
+    values = bytearray(2 * half)
+    replies = bytearray(half)
+    escape = 255
+    frontier = []
+
+    for index in range(half, 2 * half):
+        _, king, weak_king, squares = _decode(index, count)
+        if (KING_ATTACKS[king] & bit(weak_king) or king == weak_king
+                or len({king, weak_king, *squares}) != count + 2
+                or position_index(1, king, weak_king, squares) != index):
+            continue
+        moves = _weak_moves(pieces, king, weak_king, squares)
+        if any(captures for _, captures in moves):
+            replies[index - half] = escape
+        elif moves:
+            replies[index - half] = len({position_index(0, king, target, squares) for target, _ in moves})
+        else:
+            occupied = bit(king) | bit(weak_king)
+            for square in squares:
+                occupied |= bit(square)
+            if _attacked(weak_king, pieces, squares, occupied):
+                values[index] = 1
+                frontier.append(index)
+
+    all_pieces = (KING,) + tuple(pieces)
+    plies = 0
+    while frontier:
+        plies += 1
+        if progress:
+            progress(plies, len(frontier))
+        found = []
+        for index in frontier:
+            _, king, weak_king, squares = _decode(index, count)
+            placed = [king] + squares
+            occupied = bit(weak_king)
+            for square in placed:
+                occupied |= bit(square)
+
+            if plies % 2:
+                # Strong side moves back into a position where it is to move
+                for position, (kind, source) in enumerate(zip(all_pieces, placed)):
+                    targets = _attacks(kind, source, occupied) & ~occupied
+                    if kind == KING:
+                        targets &= ~KING_ATTACKS[weak_king]
+                    for target in iter_bits(targets):
+                        before = placed[:]
+                        before[position] = target
+                        before_occupied = occupied ^ bit(source) ^ bit(target)
+                        if _attacked(weak_king, all_pieces, before, before_occupied):
+                            continue
+                        previous = position_index(0, before[0], weak_king, before[1:])
+                        if not values[previous]:
+                            values[previous] = plies + 1
+                            found.append(previous)
+            else:
+                # Lone king moves back; lost once every reply is a strong win
+                targets = KING_ATTACKS[weak_king] & ~occupied & ~KING_ATTACKS[king]
+                previous_positions = {position_index(1, king, target, squares) for target in iter_bits(targets)}
+                for previous in previous_positions:
+                    left = replies[previous - half]
+                    if left == escape or values[previous] or not left:
+                        continue
+                    replies[previous - half] = left - 1
+                    if left == 1:
+                        values[previous] = plies + 1
+                        found.append(previous)
+        frontier = found
+    return values
+
+
+class EndgameTable:
+    def __init__(self, name, pieces, data):
+        self.name = name
+        self.pieces = pieces
+        self.data = data
+
+
+class EndgameTables:
+    def __init__(self):
+        self.tables = {}
+
+    def load(self, directory=TABLE_DIR):
+        """Memory-maps every table found in ``directory``"""
+        for name, pieces in TABLES.items():
+            path = os.path.join(directory, f"{name}.bin")
+            try:
+                with open(path, "rb") as f:
+                    if os.fstat(f.fileno()).st_size != table_size(pieces):
+                        continue
+                    data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except OSError:
+                continue
+            counts = [0] * 6
+            counts[KING] = 1
+            for kind in pieces:
+                counts[kind] += 1
+            self.tables[tuple(counts)] = EndgameTable(name, pieces, data)
+        return self
+
+    def probe(self, board):
+        """
+        Result of perfect play from this position, if a table covers it.
+
+        Returns:
+            None if no table applies, else (winner, plies): the winning
+            colour index and the plies to mate, or (None, None) for a draw
+        """
+        if not self.tables or board.castling_rights:
+            return None
+        for strong in (WHITE, BLACK):
+            weak = strong ^ 1
+            if board.occupancy[weak] != board.bitboards[weak][KING] or not board.occupancy[weak]:
+                continue
+            table = self.tables.get(tuple(board.piece_counts[strong]))
+            if table is None:
+                return None
+            # Tables are stored with the strong side as white
+            flip = 56 if strong == BLACK else 0
+            index = position_index(
+                0 if board.turn == strong else 1,
+                lsb(board.bitboards[strong][KING]) ^ flip,
+                lsb(board.bitboards[weak][KING]) ^ flip,
+                [lsb(board.bitboards[strong][kind]) ^ flip for kind in table.pieces]
+            )
+            value = table.data[index]
+            if not value:
+                return None, None
+            return strong, value - 1
+        return None
+
+
+endgame_tables = EndgameTables().load()
+
+
+def build(names, directory):
+    os.makedirs(directory, exist_ok=True)
+    for name in names:
+        pieces = TABLES[name]
+        start = time.perf_counter()
+        values = generate(pieces, lambda plies, size: print(f"{name}: ply {plies}, {size} positions", end="\r"))
+        path = os.path.join(directory, f"{name}.bin")
+        with open(path + ".tmp", "wb") as f:
+            f.write(values)
+        os.replace(path + ".tmp", path)
+        decided = sum(1 for value in values if value)
+        print(f"{name}: {decided} decided positions, longest mate {max(values) - 1} plies, "
+              f"{time.perf_counter() - start:.1f}s -> {path}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Endgame tables for the chess engine")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build_parser = subparsers.add_parser('build', help="Generate tables by retrograde analysis")
+    build_parser.add_argument('names', nargs='*', metavar='NAME',
+                              help=f"Tables to build: {', '.join(TABLES)} (default: all)")
+    build_parser.add_argument('--dir', default=TABLE_DIR, help="Output directory (default: CHESS_ENDGAME_DIR)")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.names if name not in TABLES]
+    if unknown:
+        parser.error(f"unknown tables: {', '.join(unknown)}")
+    build(args.names or list(TABLES), args.dir)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
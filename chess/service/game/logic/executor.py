@@ -0,0 +1,83 @@
+"""
+Bounded worker pools that run engine work off the ASGI event loop.
+
+Game state lives in this process (the consumer's chess_games dict), so move
+validation uses threads rather than processes. At most MAX_PENDING jobs may
+be queued or running; a caller that cannot get a slot within ACQUIRE_TIMEOUT
+seconds gets EngineBusy instead of piling more work onto the queue.
+
+Searches (search.analyse) only need a position string and hold the CPU for
+their whole time budget, so they run in a separate process pool where they
+cannot starve validation or the event loop. PGN imports replay their games
+in the same pool. At most MAX_PENDING_SEARCHES jobs may be in flight;
+further requests get EngineBusy right away.
+"""
+import asyncio
+import functools
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+VALIDATION_WORKERS = int(os.getenv("CHESS_VALIDATION_WORKERS", 4))
+MAX_PENDING = int(os.getenv("CHESS_VALIDATION_MAX_PENDING", 64))
+ACQUIRE_TIMEOUT = float(os.getenv("CHESS_VALIDATION_TIMEOUT", 2))
+
+SEARCH_WORKERS = int(os.getenv("CHESS_SEARCH_WORKERS", 2))
+MAX_PENDING_SEARCHES = int(os.getenv("CHESS_SEARCH_MAX_PENDING", 8))
+
+_executor = ThreadPoolExecutor(max_workers=VALIDATION_WORKERS, thread_name_prefix="chess-validation")
+_slots = asyncio.Semaphore(MAX_PENDING)
+
+# Created on first use; spawned rather than forked since this process runs threads
+_search_executor = None
+_search_lock = threading.Lock()
+_search_slots = threading.BoundedSemaphore(MAX_PENDING_SEARCHES)
+
+
+class EngineBusy(Exception):
+    """Raised when a pool stays saturated for longer than its caller may wait"""
+
+
+async def run_in_pool(func, *args, **kwargs):
+    try:
+        await asyncio.wait_for(_slots.acquire(), ACQUIRE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise EngineBusy("The server is busy, please try again")
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+    finally:
+        _slots.release()
+
+
+def _search_pool():
+    global _search_executor
+    with _search_lock:
+        if _search_executor is None:
+            _search_executor = ProcessPoolExecutor(
+                max_workers=SEARCH_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _search_executor
+
+
+def submit_search(func, *args, **kwargs):
+    """
+    Submits a search to the process pool.
+
+    Returns:
+        concurrent.futures.Future; await it with asyncio.wrap_future from
+        async code, or call result() from a view
+
+    Raises:
+        EngineBusy: if MAX_PENDING_SEARCHES searches are already in flight
+    """
+    if not _search_slots.acquire(blocking=False):
+        raise EngineBusy("The analysis engine is busy, please try again")
+    try:
+        future = _search_pool().submit(func, *args, **kwargs)
+    except BaseException:
+        _search_slots.release()
+        raise
+    future.add_done_callback(lambda _: _search_slots.release())
+    return future
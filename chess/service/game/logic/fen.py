@@ -0,0 +1,151 @@
+"""
+Compact text encoding of a position, stored in ChessGame.board_states.
+
+The format is FEN with one extra field:
+
+    rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1 10000000
+
+The first six fields are standard FEN. The seventh is the hex bitboard of
+pieces that have moved (Board.moved), because pawn double steps (Horde's
+rank 1 pawns included) and castling depend on it.
+A position takes about 70 bytes instead of the ~5 KB of the
+square-by-square dict.
+"""
+from .bitboard import (
+    Board, SQUARES, SQUARE_INDEX, COLORS, COLOR_INDEX, WHITE, PIECE_TYPES,
+    CASTLING_HOMES, piece_kind, bit,
+)
+
+PIECE_LETTERS = "pnbrqk"
+CASTLING_LETTERS = [(right, letter) for (_, _, right), letter in zip(CASTLING_HOMES, "KQkq")]
+
+
+def encode_position(board, full_move_number=1):
+    """Encodes ``board`` (side to move taken from ``board.turn``) as a string"""
+    ranks = []
+    for rank in range(7, -1, -1):
+        row, empty = "", 0
+        for file in range(8):
+            piece = board.squares[rank * 8 + file]
+            if piece is None:
+                empty += 1
+                continue
+            if empty:
+                row += str(empty)
+                empty = 0
+            letter = PIECE_LETTERS[piece_kind(piece)]
+            row += letter.upper() if piece.color == "white" else letter
+        ranks.append(row + (str(empty) if empty else ""))
+
+    castling = "".join(letter for right, letter in CASTLING_LETTERS if board.castling_rights & right) or "-"
+    moved = board.moved & board.occupied
+
+    return " ".join([
+        "/".join(ranks),
+        "w" if board.turn == WHITE else "b",
+        castling,
+        board.en_passant_target or "-",
+        str(board.half_move_clock),
+        str(full_move_number),
+        format(moved, "x"),
+    ])
+
+
+def full_move_number(plies):
+    """FEN full-move number of the position reached after ``plies`` half-moves"""
+    return plies // 2 + 1
+
+
+def decode_position(text, create_piece):
+    """
+    Rebuilds a Board from ``encode_position`` output, or from plain FEN
+    (pieces off their home squares then count as moved).
+
+    Args:
+        text: The encoded position
+        create_piece: The game mode's factory, called as create_piece(type, color)
+
+    Raises:
+        ValueError: if the string is not a valid position
+    """
+    fields = text.split()
+    if len(fields) < 4:
+        raise ValueError(f"Invalid position: {text!r}")
+    placement, side, castling, en_passant = fields[:4]
+    try:
+        half_move_clock = int(fields[4]) if len(fields) > 4 else 0
+        moved = int(fields[6], 16) if len(fields) > 6 else None
+    except ValueError:
+        raise ValueError(f"Invalid position: {text!r}") from None
+
+    rows = placement.split("/")
+    if len(rows) != 8 or side not in ("w", "b"):
+        raise ValueError(f"Invalid position: {text!r}")
+
+    board = Board()
+    for rank, row in zip(range(7, -1, -1), rows):
+        file = 0
+        for column, char in enumerate(row):
+            if char.isdigit():
+                # Runs of empty squares are one digit and may not overflow the rank
+                if file + int(char) > 8 or (column and row[column - 1].isdigit()):
+                    raise ValueError(f"Invalid position: {text!r}: bad FEN row {row!r}")
+                for _ in range(int(char)):
+                    board[SQUARES[rank * 8 + file]] = None
+                    file += 1
+                continue
+            if char.lower() not in PIECE_LETTERS or file > 7:
+                raise ValueError(f"Invalid position: {text!r}")
+            color = "white" if char.isupper() else "black"
+            piece = create_piece(PIECE_TYPES[PIECE_LETTERS.index(char.lower())], color)
+            board[SQUARES[rank * 8 + file]] = piece
+            file += 1
+        if file != 8:
+            raise ValueError(f"Invalid position: {text!r}")
+
+    if moved is None:
+        moved = _moved_from_fen(board, castling)
+    board.moved = moved & board.occupied
+
+    board.update_castling_rights()
+    board.en_passant_target = en_passant if en_passant in SQUARE_INDEX else None
+    board.half_move_clock = half_move_clock
+    board.turn = COLOR_INDEX["white" if side == "w" else "black"]
+    board.zobrist = board.compute_zobrist()
+    return board
+
+
+def _moved_from_fen(board, castling):
+    # Plain FEN has no moved flags: pawns off their start rank have moved,
+    # and kings and rooks have unless a castling right keeps them home
+    unmoved = 0
+    for (king_index, rook_index, right), letter in zip(CASTLING_HOMES, "KQkq"):
+        if letter in castling:
+            unmoved |= bit(king_index) | bit(rook_index)
+    moved = 0
+    for index, piece in enumerate(board.squares):
+        if piece is None:
+            continue
+        kind = PIECE_TYPES[piece_kind(piece)]
+        if kind == "pawn":
+            start_rank = 1 if piece.color == COLORS[WHITE] else 6
+            if index // 8 != start_rank:
+                moved |= bit(index)
+        elif kind in ("king", "rook") and not unmoved & bit(index):
+            moved |= bit(index)
+    return moved
+
+
+
+PROMOTION_LETTERS = {'queen': 'q', 'rook': 'r', 'bishop': 'b', 'knight': 'n'}
+PROMOTION_NAMES = {letter: name for name, letter in PROMOTION_LETTERS.items()}
+
+
+def move_to_uci(from_pos, to_pos, promotion=None):
+    """A move as a UCI string ("e2e4", "e7e8q"), the compact form stored per move"""
+    return f"{from_pos}{to_pos}{PROMOTION_LETTERS.get(promotion, '')}"
+
+
+def parse_uci(text):
+    """Inverse of move_to_uci: (from_pos, to_pos, promotion piece type or None)"""
+    return text[:2], text[2:4], PROMOTION_NAMES.get(text[4:5])
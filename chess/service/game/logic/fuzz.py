@@ -0,0 +1,205 @@
+"""
+Differential fuzzer: plays seeded random games through ChessLogic and the
+slow reference implementation in reference.py side by side.
+
+Run from the service directory:
+
+    python -m game.logic.fuzz --games 1000 --workers 8
+    python -m game.logic.fuzz --mode bomb --seed 42 --games 1
+
+Every ply compares the legal move sets, the position after the move
+(placement, side to move, castling rights, en passant target, halfmove
+clock) and the game-over verdict. The first divergence of a game is
+shrunk to a minimal move sequence that still diverges the same way and
+printed as UCI moves, with the seed that reproduces it. Endgame tables are
+off, as the reference has none.
+"""
+import argparse
+import logging
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .ChessLogic import ChessLogic
+from .bitboard import SQUARES, SQUARE_INDEX
+from .fen import encode_position, move_to_uci, parse_uci
+from .reference import ReferenceGame, PROMOTIONS
+
+MODES = ['classic', '960', 'horde', 'kirby', 'bomb']
+PROMOTION_CHOICES = list(PROMOTIONS)
+
+
+def _start(mode, start_position):
+    logic = ChessLogic(mode, start_position)
+    logic.initialize_game()
+    logic.game_mode.use_endgame_tables = False
+    return logic, ReferenceGame(mode, logic.get_start_position())
+
+
+def _legal_moves(logic, reference):
+    """Legal moves of both engines as UCI strings without promotion suffixes"""
+    engine = {
+        f"{from_pos}{to_pos}"
+        for from_pos, targets in logic.get_all_possible_moves(logic.current_player).items()
+        for to_pos in targets
+    }
+    return engine, {f"{SQUARES[a]}{SQUARES[b]}" for a, b in reference.legal_moves()}
+
+
+def _promotes(reference, from_index, to_index):
+    # A Kirby capture of a pawn turns the capturer into one
+    last_rank = 7 if reference.turn == 'white' else 0
+    captured = reference.squares.get(to_index)
+    return to_index // 8 == last_rank and (
+        reference.squares[from_index][0] == "p"
+        or (reference.game_mode == 'kirby' and captured is not None and captured[0] == "p"
+            and reference.squares[from_index][0] != "k")
+    )
+
+
+def _run(mode, start_position, choose, max_plies):
+    """
+    Plays the game both ways with moves from ``choose(ply, legal, reference)``,
+    which returns a UCI move or None to stop.
+
+    Returns:
+        (divergence, moves): the first divergence as a dict, None if there
+        was none, and the moves played up to it
+    """
+    logic, reference = _start(mode, start_position)
+    moves = []
+    for ply in range(max_plies):
+        engine, expected = _legal_moves(logic, reference)
+        if engine != expected:
+            return {'check': 'moves', 'ply': ply, 'missing': sorted(expected - engine),
+                    'extra': sorted(engine - expected)}, moves
+        move = choose(ply, expected, reference)
+        if move is None:
+            break
+        moves.append(move)
+        from_pos, to_pos, promotion = parse_uci(move)
+        success, message, _, _ = logic.make_move(from_pos, to_pos, logic.current_player, promotion)
+        if not success:
+            return {'check': 'rejected', 'ply': ply, 'engine': message}, moves
+        reference.play(SQUARE_INDEX[from_pos], SQUARE_INDEX[to_pos], promotion)
+
+        position = " ".join(encode_position(logic.board).split()[:5])
+        if position != reference.fen():
+            return {'check': 'board', 'ply': ply, 'engine': position, 'reference': reference.fen()}, moves
+        verdict = logic.game_mode.check_game_over(logic.board, logic.current_player)
+        if verdict != reference.verdict():
+            return {'check': 'verdict', 'ply': ply, 'engine': verdict, 'reference': reference.verdict()}, moves
+        if verdict[0] is not None:
+            break
+    return None, moves
+
+
+def play_random(mode, seed, max_plies):
+    """One seeded random game; returns (divergence, moves, start_position)"""
+    rng = random.Random(seed)
+    start_position = rng.randrange(960) if mode == '960' else None
+
+    def choose(ply, legal, reference):
+        if not legal:
+            return None
+        move = rng.choice(sorted(legal))
+        from_index, to_index = SQUARE_INDEX[move[:2]], SQUARE_INDEX[move[2:]]
+        promotion = rng.choice(PROMOTION_CHOICES) if _promotes(reference, from_index, to_index) else None
+        return move_to_uci(move[:2], move[2:], promotion)
+
+    divergence, moves = _run(mode, start_position, choose, max_plies)
+    return divergence, moves, start_position
+
+
+def replay(mode, start_position, moves):
+    """
+    Plays a fixed move list. Stops without a divergence at the first move
+    that is illegal, so shrinking can try any subsequence.
+    """
+    def choose(ply, legal, reference):
+        if ply < len(moves) and moves[ply][:4] in legal:
+            return moves[ply]
+        return None
+
+    return _run(mode, start_position, choose, len(moves) + 1)
+
+
+def shrink(mode, start_position, moves, divergence):
+    """
+    Delta debugging: drops ever smaller chunks of ``moves`` while the rest
+    still plays legally and diverges with the same check. Moves are dropped
+    a white and black pair at a time, so the side to move stays the same.
+
+    Returns:
+        (divergence, moves) for the smallest sequence found
+    """
+    pairs = [moves[index:index + 2] for index in range(0, len(moves), 2)]
+    chunks = 2
+    while len(pairs) > 1:
+        size = max(1, len(pairs) // chunks)
+        for start in range(0, len(pairs), size):
+            candidate = [move for pair in pairs[:start] + pairs[start + size:] for move in pair]
+            found, played = replay(mode, start_position, candidate)
+            if found is not None and found['check'] == divergence['check']:
+                divergence = found
+                pairs = [played[index:index + 2] for index in range(0, len(played), 2)]
+                chunks = max(chunks - 1, 2)
+                break
+        else:
+            if size == 1:
+                break
+            chunks = min(chunks * 2, len(pairs))
+    return divergence, [move for pair in pairs for move in pair]
+
+
+def fuzz_game(mode, seed, max_plies):
+    """Runs one game and shrinks its divergence, if any; picklable for the worker pool"""
+    logging.disable(logging.CRITICAL)
+    divergence, moves, start_position = play_random(mode, seed, max_plies)
+    result = {'mode': mode, 'seed': seed, 'plies': len(moves), 'start_position': start_position}
+    if divergence is not None:
+        divergence, moves = shrink(mode, start_position, moves, divergence)
+        result.update(divergence=divergence, moves=moves)
+    return result
+
+
+def _report(result):
+    divergence = result['divergence']
+    details = ", ".join(f"{key} {value}" for key, value in divergence.items() if key not in ('check', 'ply'))
+    setup = f" start position {result['start_position']}" if result['start_position'] is not None else ""
+    print(f"{result['mode']:8} seed {result['seed']}{setup}: {divergence['check']} differs at ply {divergence['ply']}: {details}")
+    print(f"         moves: {' '.join(result['moves']) or '(start position)'}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Differential fuzzer between the engine and the reference rules")
+    parser.add_argument('--mode', choices=MODES, action='append', help="Repeat to select several (default: all)")
+    parser.add_argument('--games', type=int, default=100, help="Games per mode")
+    parser.add_argument('--plies', type=int, default=300, help="Longest game")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the first game, the rest follow on")
+    parser.add_argument('--workers', type=int, default=1)
+    args = parser.parse_args(argv)
+    logging.disable(logging.CRITICAL)
+    modes = args.mode or MODES
+
+    jobs = [(mode, args.seed + game, args.plies) for mode in modes for game in range(args.games)]
+    start = time.perf_counter()
+    if args.workers > 1:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            results = list(pool.map(fuzz_game, *zip(*jobs), chunksize=8))
+    else:
+        results = [fuzz_game(*job) for job in jobs]
+    elapsed = time.perf_counter() - start
+
+    failures = [result for result in results if 'divergence' in result]
+    for result in failures:
+        _report(result)
+    plies = sum(result['plies'] for result in results)
+    print(f"{len(results)} games, {plies} plies in {elapsed:.1f}s ({plies / elapsed if elapsed else 0:.0f} plies/s), "
+          f"{len(failures)} divergences")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
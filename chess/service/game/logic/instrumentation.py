@@ -0,0 +1,205 @@
+"""
+Opt-in timing and sampling profiler for the chess engine.
+
+Timings are recorded per (game mode, phase) into histograms with
+power-of-two microsecond buckets, so recording costs one bit_length and
+one list increment. While disabled, ``timed`` hands out a shared no-op
+context manager. Enable with CHESS_INSTRUMENTATION=1 or ``enable()``.
+
+The sampling profiler is a daemon thread that looks at the engine threads'
+stacks every few milliseconds and counts the chess logic frames it finds.
+"""
+import math
+import os
+import sys
+import threading
+import time
+from contextlib import nullcontext
+
+PHASES = ("validation", "game_over", "serialization")
+BUCKETS = 32  # bucket i holds durations below 2**i microseconds
+MIN_INTERVAL = 0.001  # shortest profiler interval, so the sampler never spins
+
+_enabled = os.getenv("CHESS_INSTRUMENTATION", "0") == "1"
+_histograms = {}
+_lock = threading.Lock()
+_noop = nullcontext()
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "count", "max")
+
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.total = 0
+        self.count = 0
+        self.max = 0
+
+    def record(self, microseconds):
+        self.counts[min(microseconds.bit_length(), BUCKETS - 1)] += 1
+        self.total += microseconds
+        self.count += 1
+        if microseconds > self.max:
+            self.max = microseconds
+
+    def percentile(self, fraction):
+        """Upper bound (µs) of the bucket holding the given fraction of samples"""
+        if not self.count:
+            return 0
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= fraction * self.count:
+                return 1 << bucket
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "mean_us": self.total / self.count if self.count else 0,
+            "p50_us": self.percentile(0.5),
+            "p95_us": self.percentile(0.95),
+            "p99_us": self.percentile(0.99),
+            "max_us": self.max,
+            "buckets": {f"<{1 << bucket}us": count for bucket, count in enumerate(self.counts) if count},
+        }
+
+
+class _Timer:
+    __slots__ = ("key", "start")
+
+    def __init__(self, key):
+        self.key = key
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.key, (time.perf_counter_ns() - self.start) // 1000)
+        return False
+
+
+def enable(value=True):
+    global _enabled
+    _enabled = value
+
+
+def is_enabled():
+    return _enabled
+
+
+def record(key, microseconds):
+    histogram = _histograms.get(key)
+    if histogram is None:
+        with _lock:
+            histogram = _histograms.setdefault(key, Histogram())
+    histogram.record(microseconds)
+
+
+def timed(mode, phase):
+    """Context manager timing one phase of a game mode; a no-op while disabled"""
+    if not _enabled:
+        return _noop
+    return _Timer((mode, phase))
+
+
+def dump():
+    """Histograms as {mode: {phase: summary}}"""
+    result = {}
+    for (mode, phase), histogram in list(_histograms.items()):
+        result.setdefault(mode, {})[phase] = histogram.to_dict()
+    return result
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+
+
+class SamplingProfiler:
+    """Counts the chess logic call stacks seen in other threads every ``interval`` seconds"""
+
+    def __init__(self, interval=0.005, max_depth=12):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = {}
+        self.sample_count = 0
+        # Guards samples between the sampler thread and dump
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="chess-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def _run(self):
+        own = threading.get_ident()
+        logic_dir = os.path.dirname(__file__)
+        while not self._stop.wait(self.interval):
+            seen = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    if code.co_filename.startswith(logic_dir):
+                        stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                if stack:
+                    seen.append(";".join(reversed(stack)))
+            with self._lock:
+                for key in seen:
+                    self.samples[key] = self.samples.get(key, 0) + 1
+                self.sample_count += 1
+
+    def dump(self, limit=50):
+        """Most frequent stacks, root first, in collapsed-stack format"""
+        with self._lock:
+            samples = list(self.samples.items())
+            rounds = self.sample_count
+        top = sorted(samples, key=lambda item: item[1], reverse=True)[:limit]
+        return {
+            "running": self.running,
+            "interval": self.interval,
+            "rounds": rounds,
+            "stacks": [{"stack": stack, "samples": count} for stack, count in top],
+        }
+
+
+profiler = SamplingProfiler()
+
+
+def set_profiling(active, interval=None):
+    """
+    Starts or stops the profiler. ``interval`` is in seconds and is raised
+    to MIN_INTERVAL if shorter.
+
+    Raises:
+        ValueError: if interval is not a finite number
+    """
+    if active:
+        if interval is not None:
+            interval = float(interval)
+            if not math.isfinite(interval):
+                raise ValueError(f"interval must be a finite number, not {interval}")
+            profiler.interval = max(interval, MIN_INTERVAL)
+        profiler.start()
+    else:
+        profiler.stop()
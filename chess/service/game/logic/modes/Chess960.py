@@ -2,64 +2,68 @@ import random
 import logging
 from .ClassicChess import ClassicChess
 from ..pieces import Rook, Knight, Bishop, Queen, King, Pawn
-from ..utils import is_checkmate, is_stalemate, is_insufficient_material
+from ..bitboard import Board
+from ..utils import is_insufficient_material
 
 logger = logging.getLogger('chess_game')
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Knight pairs over the five squares left after bishops and queen, in SP-ID order
+KNIGHT_PLACEMENTS = [(0, 1), (0, 2), (0, 3), (0, 4), (1, 2), (1, 3), (1, 4), (2, 3), (2, 4), (3, 4)]
+PIECE_LETTERS = {'R': Rook, 'N': Knight, 'B': Bishop, 'Q': Queen, 'K': King}
+
+
+def _back_rank_for(sp_id):
+    # Scharnagl numbering: light bishop, dark bishop, queen, knights, then R K R
+    rank = [None] * 8
+    sp_id, light = divmod(sp_id, 4)
+    rank[2 * light + 1] = 'B'
+    sp_id, dark = divmod(sp_id, 4)
+    rank[2 * dark] = 'B'
+    sp_id, queen = divmod(sp_id, 6)
+    empty = [i for i in range(8) if rank[i] is None]
+    rank[empty[queen]] = 'Q'
+    empty = [i for i in range(8) if rank[i] is None]
+    for knight in KNIGHT_PLACEMENTS[sp_id]:
+        rank[empty[knight]] = 'N'
+    for square, letter in zip([i for i in range(8) if rank[i] is None], "RKR"):
+        rank[square] = letter
+    return "".join(rank)
+
+
+# White back rank (files a-h) of every start position, indexed by SP-ID; 518 is the classic setup
+START_POSITIONS = tuple(_back_rank_for(sp_id) for sp_id in range(960))
+CLASSIC_START_POSITION = 518
+
 
 class Chess960(ClassicChess):
+    def __init__(self, start_position=None):
+        super().__init__()
+        # SP-ID (0-959) of the setup; picked at random on first initialization if not given
+        self.start_position = start_position
+
     def initialize_board(self):
-        logger.debug("Initializing Chess960 board")
-        board = {}
-        white_back_rank = self._generate_back_rank()
-        black_back_rank = white_back_rank[::-1]
+        if self.start_position is None:
+            self.start_position = random.randrange(len(START_POSITIONS))
+        logger.debug("Initializing Chess960 board, start position %s", self.start_position)
+        board = Board()
+        back_rank = [PIECE_LETTERS[letter] for letter in START_POSITIONS[self.start_position]]
 
-        # Place white pieces
-        for idx, piece in enumerate(white_back_rank):
-            position = chr(ord('a') + idx) + '1'
-            board[position] = piece('white', position, str(idx + 1))
-        
-        # Place black pieces
-        for idx, piece in enumerate(black_back_rank):
-            position = chr(ord('a') + idx) + '8'
-            board[position] = piece('black', position, str(idx + 1))
+        # Place the back ranks, black mirroring white file by file
+        for idx, piece in enumerate(back_rank):
+            file = chr(ord('a') + idx)
+            board[file + '1'] = piece('white')
+            board[file + '8'] = piece('black')
         
         # Place pawns
         for file in "abcdefgh":
-            board[f"{file}2"] = Pawn("white", f"{file}2", str(ord(file) - ord('a') + 1))
-            board[f"{file}7"] = Pawn("black", f"{file}7", str(ord(file) - ord('a') + 1))
+            board[f"{file}2"] = Pawn("white")
+            board[f"{file}7"] = Pawn("black")
         
         # Initialize empty squares
         for rank in range(3, 7):
             for file in "abcdefgh":
                 board[f"{file}{rank}"] = None
 
-        self.position_history.append(self.get_position_key(board))
+        board.update_castling_rights()
+        self.start_position_history(board)
         return board
-
-    def _generate_back_rank(self):
-        back_rank = [None] * 8
-
-        # Place bishops on different color squares
-        bishop_pos1 = random.choice([0, 2, 4, 6])
-        bishop_pos2 = random.choice([1, 3, 5, 7])
-        back_rank[bishop_pos1] = Bishop
-        back_rank[bishop_pos2] = Bishop
-
-        # Place the king between the rooks
-        remaining_positions = [i for i in range(8) if back_rank[i] is None]
-        rook_pos1, rook_pos2 = sorted(random.sample(remaining_positions, 2))
-        king_pos = random.choice([i for i in range(rook_pos1 + 1, rook_pos2)])
-
-        back_rank[rook_pos1] = Rook
-        back_rank[rook_pos2] = Rook
-        back_rank[king_pos] = King
-
-        # Place the remaining pieces (queen and knights)
-        remaining_positions = [i for i in range(8) if back_rank[i] is None]
-        remaining_pieces = [Queen, Knight, Knight]
-        for pos, piece in zip(remaining_positions, remaining_pieces):
-            back_rank[pos] = piece
-
-        logger.debug(f"Generated valid back rank: {back_rank}")
-        return back_rank
\ No newline at end of file
@@ -1,76 +1,99 @@
 from abc import ABC, abstractmethod
-import copy
+from array import array
 from .ChessGameMode import ChessGameMode
 from ..pieces import Rook, Knight, Bishop, Queen, King, Pawn
-from ..utils import is_in_check, is_checkmate, is_stalemate, is_insufficient_material
+from ..bitboard import Board, SQUARE_INDEX, COLOR_INDEX, COLORS
+from ..movegen import legal_targets
+from ..cache import position_cache
+from ..endgame import endgame_tables
+from ..utils import is_in_check, is_position_under_attack, is_insufficient_material
 
 import logging
 logger = logging.getLogger('chess_game')
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 
 class ClassicChess(ChessGameMode):
+    # Whether endgame table results hold under this mode's rules
+    use_endgame_tables = True
+
     def __init__(self):
-        self.half_move_clock = 0
-        self.position_history = []
-        self.en_passant_target = None
+        # Zobrist hash per ply (8 bytes each) and how often each position was seen
+        self.position_history = array('Q')
+        self.repetitions = {}
 
     def initialize_board(self):
-        board = {}
+        board = Board()
         # White pieces
-        board["a1"] = Rook("white", "a1", "1")
-        board["b1"] = Knight("white", "b1", "1")
-        board["c1"] = Bishop("white", "c1", "1")
-        board["d1"] = Queen("white", "d1", "")
-        board["e1"] = King("white", "e1", "")
-        board["f1"] = Bishop("white", "f1", "2")
-        board["g1"] = Knight("white", "g1", "2")
-        board["h1"] = Rook("white", "h1", "2")
+        board["a1"] = Rook("white")
+        board["b1"] = Knight("white")
+        board["c1"] = Bishop("white")
+        board["d1"] = Queen("white")
+        board["e1"] = King("white")
+        board["f1"] = Bishop("white")
+        board["g1"] = Knight("white")
+        board["h1"] = Rook("white")
         for file_idx, file in enumerate("abcdefgh"):
-            board[f"{file}2"] = Pawn("white", f"{file}2", str(file_idx + 1))
+            board[f"{file}2"] = Pawn("white")
         # Black pieces
-        board["a8"] = Rook("black", "a8", "1")
-        board["b8"] = Knight("black", "b8", "1")
-        board["c8"] = Bishop("black", "c8", "1")
-        board["d8"] = Queen("black", "d8", "")
-        board["e8"] = King("black", "e8", "")
-        board["f8"] = Bishop("black", "f8", "2")
-        board["g8"] = Knight("black", "g8", "2")
-        board["h8"] = Rook("black", "h8", "2")
+        board["a8"] = Rook("black")
+        board["b8"] = Knight("black")
+        board["c8"] = Bishop("black")
+        board["d8"] = Queen("black")
+        board["e8"] = King("black")
+        board["f8"] = Bishop("black")
+        board["g8"] = Knight("black")
+        board["h8"] = Rook("black")
         for file_idx, file in enumerate("abcdefgh"):
-            board[f"{file}7"] = Pawn("black", f"{file}7", str(file_idx + 1))
+            board[f"{file}7"] = Pawn("black")
         # Empty squares
         for rank in range(3, 7):
             for file in "abcdefgh":
                 board[f"{file}{rank}"] = None
 
-        self.position_history.append(self.get_position_key(board))
+        board.update_castling_rights()
+        self.start_position_history(board)
         return board
 
     def get_position_key(self, board):
-        key = []
-        for rank in range(8, 0, -1):
-            for file in "abcdefgh":
-                piece = board.get(f"{file}{rank}")
-                if piece is None:
-                    key.append(".")
-                else:
-                    key.append(str(piece))
-        return "".join(key)
+        return board.zobrist
+
+    def start_position_history(self, board):
+        self.position_history = array('Q')
+        self.repetitions = {}
+        self.record_position(board)
+
+    def record_position(self, board):
+        position_key = self.get_position_key(board)
+        self.position_history.append(position_key)
+        self.repetitions[position_key] = self.repetitions.get(position_key, 0) + 1
+
+    def forget_last_position(self):
+        position_key = self.position_history.pop()
+        self.repetitions[position_key] -= 1
 
     def check_game_over(self, board, current_player):
-        if is_checkmate(board, current_player):
-            return "checkmate", "black" if current_player == "white" else "white"
-        if is_stalemate(board, current_player):
-            return "stalemate", None
-        if self.half_move_clock >= 100:
+        status, winner = self.check_no_legal_moves(board, current_player)
+        if status:
+            return status, winner
+        if board.half_move_clock >= 100:
             return "fifty_moves", None
-        position_key = self.get_position_key(board)
-        if self.position_history.count(position_key) >= 3:
+        if self.repetitions.get(self.get_position_key(board), 0) >= 3:
             return "repetition", None
         if is_insufficient_material(board):
             return "insufficient_material", None
+        if self.use_endgame_tables:
+            # A known result ends the game at once: a win if mate comes before the fifty-move rule
+            result = endgame_tables.probe(board)
+            if result is not None:
+                winner, plies = result
+                if winner is not None and board.half_move_clock + plies <= 100:
+                    return "endgame_table", COLORS[winner]
+                return "endgame_table", None
         return None, None
 
+    def check_no_legal_moves(self, board, current_player):
+        # Checkmate or stalemate, from the shared cache that also serves the move lists
+        return position_cache.lookup(self, board, COLOR_INDEX[current_player]).status
+
     # Implementing the interface; only piece_type and color are considered.
     def create_piece(self, piece_type, color):
         piece_classes = {
@@ -82,15 +105,14 @@ class ClassicChess(ChessGameMode):
             'king': King
         }
         if piece_type.lower() in piece_classes:
-            # Create the piece with default empty position and id.
-            return piece_classes[piece_type.lower()](color, "", "")
+            # Pieces are shared flyweights, one per type and colour
+            return piece_classes[piece_type.lower()](color)
         return None
 
     def validate_move(self, board, from_pos, to_pos, player_color, promotion_choice=None):
         # Detect castling via king movement
         if from_pos in board and isinstance(board[from_pos], King):
-            king = board[from_pos]
-            if not king.has_moved:
+            if not board.has_moved(SQUARE_INDEX[from_pos]):
                 file_from = from_pos[0]
                 file_to = to_pos[0]
                 # Castling short (king side): king moves from e to g
@@ -105,108 +127,91 @@ class ClassicChess(ChessGameMode):
         piece = board[from_pos]
         if piece.color != player_color:
             return False, "You cannot move your opponent's pieces", board, {}
-        possible_moves = piece.get_possible_moves(board, self.en_passant_target) if isinstance(piece, Pawn) else piece.get_possible_moves(board)
-
-        if to_pos not in possible_moves:
-            logger.debug(f"on validate_move, to_pos: {to_pos} is not in {possible_moves}")
+        if to_pos not in SQUARE_INDEX or SQUARE_INDEX[to_pos] not in legal_targets(board, SQUARE_INDEX[from_pos]):
+            possible_moves = piece.get_possible_moves(board, from_pos, board.en_passant_target) if isinstance(piece, Pawn) else piece.get_possible_moves(board, from_pos)
+            logger.debug("on validate_move, to_pos: %s is not a legal move from %s", to_pos, from_pos)
+            if to_pos in possible_moves:
+                return False, "You cannot make a move that leaves your king in check", board, {}
             return False, "Invalid move for this piece", board, {}
 
-        new_board = copy.deepcopy(board)
-        captured_piece = new_board[to_pos]
-        en_passant_capture = False
-
-        if isinstance(piece, Pawn) and to_pos == self.en_passant_target:
-            file_to = to_pos[0]
-            rank_from = from_pos[1]
-            en_passant_capture = True
-            captured_position = f"{file_to}{rank_from}"
-            captured_piece = new_board[captured_position]
-            new_board[captured_position] = None
-
+        old_en_passant = board.en_passant_target
+        undo = board.push(from_pos, to_pos)
+        captured_piece = undo.captured
+        en_passant_capture = isinstance(piece, Pawn) and to_pos == old_en_passant
 
-        new_board[to_pos] = piece
-        new_board[from_pos] = None
-        piece.position = to_pos
-        piece.has_moved = True
-
-        # Verify if move leaves king in check.
-        # if is_in_check(new_board, player_color):
-        #     return False, "You cannot make a move that leaves your king in check", board, {}
-
-        if isinstance(piece, Pawn) or captured_piece is not None:
-            self.half_move_clock = 0
-        else:
-            self.half_move_clock += 1
-
-        position_key = self.get_position_key(new_board)
-        self.position_history.append(position_key)
-        old_en_passant = self.en_passant_target
-        self.en_passant_target = None
-
-        if isinstance(piece, Pawn):
-            file_from, rank_from = from_pos[0], int(from_pos[1])
-            file_to, rank_to = to_pos[0], int(to_pos[1])
-            
-            if abs(rank_to - rank_from) == 2:
-                intermediate_rank = (rank_from + rank_to) // 2
-                self.en_passant_target = f"{file_to}{intermediate_rank}"
+        error, effects = self.apply_move_effects(board, undo, player_color)
+        if error:
+            board.pop()
+            return False, error, board, {}
 
         promotion = None
         promotion_pending = False
-        # Pawn promotion logic
-        if isinstance(piece, Pawn):
+        # Pawn promotion logic, unless a variant effect already turned the pawn into something else
+        if isinstance(board.squares[undo.to_index], Pawn):
             if (piece.color == "white" and to_pos[1] == "8") or (piece.color == "black" and to_pos[1] == "1"):
                 if promotion_choice:
                     new_piece = self.create_piece(promotion_choice, piece.color)
                     if new_piece:
-                        new_piece.position = to_pos
-                        new_board[to_pos] = new_piece
+                        board.replace(undo.to_index, new_piece)
                         promotion = promotion_choice
                 else:
                     promotion_pending = True
 
+        # The position counts once the promoted piece is on the board; complete_promotion records it when chosen later
+        if not promotion_pending:
+            self.record_position(board)
+
         info = {
-            "captured": captured_piece.piece_id if captured_piece else None,
+            "captured": captured_piece.__class__.__name__.lower() if captured_piece else None,
             "en_passant": {
                 "capture": en_passant_capture,
-                "target": self.en_passant_target,
+                "target": board.en_passant_target,
                 "prev_target": old_en_passant
             },
             "promotion": promotion,
             "promotion_pending": promotion_pending,
-            "half_move_clock": self.half_move_clock
+            "half_move_clock": board.half_move_clock,
+            **effects
         }
 
         if promotion_pending:
-            logger.debug(f"Promotion pending info: {info}")
-            return True, "Valid move, promotion required", new_board, info
+            logger.debug("Promotion pending info: %s", info)
+            return True, "Valid move, promotion required", board, info
 
         opponent_color = "black" if player_color == "white" else "white"
-        game_over_status, winner = self.check_game_over(new_board, opponent_color)
+        game_over_status, winner = self.check_game_over(board, opponent_color)
         if game_over_status:
             info["game_over"] = {
                 "status": game_over_status,
                 "winner": winner
             }
             
-        return True, "Valid move", new_board, info
+        return True, "Valid move", board, info
+
+    def apply_move_effects(self, board, undo, player_color):
+        """
+        Hook for variants whose moves change the board beyond the move itself.
+        Changes must go through board.replace so they are undone with the move.
+
+        Returns:
+            (error, info): an error message to reject the move, and extra info
+        """
+        return None, {}
 
     def process_castling(self, board, player_color, side):
         rank = "1" if player_color == "white" else "8"
         king_pos = f"e{rank}"
-        if king_pos not in board or not isinstance(board[king_pos], King) or board[king_pos].has_moved:
+        if king_pos not in board or not isinstance(board[king_pos], King) or board.has_moved(SQUARE_INDEX[king_pos]):
             return False, "Invalid castling: the king has already moved", board, {}
 
         if side == "king_side":
             rook_pos = f"h{rank}"
             king_target = f"g{rank}"
-            rook_target = f"f{rank}"
         else:
             rook_pos = f"a{rank}"
             king_target = f"c{rank}"
-            rook_target = f"d{rank}"
 
-        if rook_pos not in board or not isinstance(board[rook_pos], Rook) or board[rook_pos].has_moved:
+        if rook_pos not in board or not isinstance(board[rook_pos], Rook) or board.has_moved(SQUARE_INDEX[rook_pos]):
             return False, "Invalid castling: the rook has already moved", board, {}
 
         if side == "king_side":
@@ -221,48 +226,28 @@ class ClassicChess(ChessGameMode):
         if is_in_check(board, player_color):
             return False, "Invalid castling: the king is in check", board, {}
 
-        if side == "king_side":
-            for file in ["f", "g"]:
-                test_board = copy.deepcopy(board)
-                test_board[f"{file}{rank}"] = test_board[king_pos]
-                test_board[king_pos] = None
-                if is_in_check(test_board, player_color):
-                    return False, "Invalid castling: the king would pass through an attacked square", board, {}
-        else:
-            for file in ["c", "d"]:
-                test_board = copy.deepcopy(board)
-                test_board[f"{file}{rank}"] = test_board[king_pos]
-                test_board[king_pos] = None
-                if is_in_check(test_board, player_color):
-                    return False, "Invalid castling: the king would pass through an attacked square", board, {}
-
-        new_board = copy.deepcopy(board)
-        new_board[king_target] = new_board[king_pos]
-        new_board[king_pos] = None
-        new_board[king_target].position = king_target
-        new_board[king_target].has_moved = True
-        new_board[rook_target] = new_board[rook_pos]
-        new_board[rook_pos] = None
-        new_board[rook_target].position = rook_target
-        new_board[rook_target].has_moved = True
-
-        self.half_move_clock += 1
-        position_key = self.get_position_key(new_board)
-        self.position_history.append(position_key)
+        passed_files = ["f", "g"] if side == "king_side" else ["c", "d"]
+        for file in passed_files:
+            if is_position_under_attack(board, f"{file}{rank}", player_color):
+                return False, "Invalid castling: the king would pass through an attacked square", board, {}
+
+        board.push(king_pos, king_target)
+
+        self.record_position(board)
 
         info = {
             "castling": side,
-            "half_move_clock": self.half_move_clock
+            "half_move_clock": board.half_move_clock
         }
         opponent_color = "black" if player_color == "white" else "white"
-        game_over_status, winner = self.check_game_over(new_board, opponent_color)
+        game_over_status, winner = self.check_game_over(board, opponent_color)
         if game_over_status:
             info["game_over"] = {
                 "status": game_over_status,
                 "winner": winner
             }
 
-        return True, "Castling completed", new_board, info
+        return True, "Castling completed", board, info
 
     def complete_promotion(self, board, position, promotion_choice):
         """
@@ -274,7 +259,7 @@ class ClassicChess(ChessGameMode):
         Returns:
             (success, message, new_board, info)
         """
-        logger.debug(f"on complete_promotion: postition: {position} / promotion: {promotion_choice} / board: {board[position]}")
+        logger.debug("on complete_promotion: position: %s / promotion: %s / board: %s", position, promotion_choice, board[position])
         if position not in board or board[position] is None or board[position].__class__.__name__.lower() != "pawn":
             return False, "No pawn at position for promotion", board, {}
         piece = board[position]
@@ -285,19 +270,18 @@ class ClassicChess(ChessGameMode):
         new_piece = self.create_piece(promotion_choice, piece.color)
         if not new_piece:
             return False, "Invalid promotion piece type", board, {}
-        new_piece.position = position
-
-        new_board = copy.deepcopy(board)
-        new_board[position] = new_piece
+        # Part of the pawn move still on top of the undo stack
+        board.replace(SQUARE_INDEX[position], new_piece)
+        self.record_position(board)
 
         info = {
             "promotion": promotion_choice
         }
         opponent_color = "black" if piece.color == "white" else "white"
-        game_over_status, winner = self.check_game_over(new_board, opponent_color)
+        game_over_status, winner = self.check_game_over(board, opponent_color)
         if game_over_status:
             info["game_over"] = {
                 "status": game_over_status,
                 "winner": winner
             }
-        return True, "Promotion completed", new_board, info
+        return True, "Promotion completed", board, info
@@ -1,23 +1,22 @@
 from .ClassicChess import ClassicChess
 from ..pieces import Rook, Knight, Bishop, Queen, King, Pawn
-from ..utils import is_in_check, is_checkmate, is_stalemate, is_insufficient_material
-import logging
+from ..bitboard import Board, WHITE
+from ..utils import is_insufficient_material
 
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 class HordeChess(ClassicChess):
     def initialize_board(self):
-        board = {}
+        board = Board()
         # Black pieces
-        board["a8"] = Rook("black", "a8", "1")
-        board["b8"] = Knight("black", "b8", "1")
-        board["c8"] = Bishop("black", "c8", "1")
-        board["d8"] = Queen("black", "d8", "")
-        board["e8"] = King("black", "e8", "")
-        board["f8"] = Bishop("black", "f8", "2")
-        board["g8"] = Knight("black", "g8", "2")
-        board["h8"] = Rook("black", "h8", "2")
+        board["a8"] = Rook("black")
+        board["b8"] = Knight("black")
+        board["c8"] = Bishop("black")
+        board["d8"] = Queen("black")
+        board["e8"] = King("black")
+        board["f8"] = Bishop("black")
+        board["g8"] = Knight("black")
+        board["h8"] = Rook("black")
         for file_idx, file in enumerate("abcdefgh"):
-            board[f"{file}7"] = Pawn("black", f"{file}7", str(file_idx + 1))
+            board[f"{file}7"] = Pawn("black")
         
         # Empty squares
         for rank in range(5, 7):
@@ -27,23 +26,23 @@ class HordeChess(ClassicChess):
         # White pieces (horde of pawns)
         for rank in range(1, 5):
             for file in "abcdefgh":
-                board[f"{file}{rank}"] = Pawn("white", f"{file}{rank}", str(rank))
-        board["b5"] = Pawn("white", "b5", "5")
-        board["c5"] = Pawn("white", "c5", "5")
-        board["f5"] = Pawn("white", "f5", "5")
-        board["g5"] = Pawn("white", "g5", "5")
+                board[f"{file}{rank}"] = Pawn("white")
+        board["b5"] = Pawn("white")
+        board["c5"] = Pawn("white")
+        board["f5"] = Pawn("white")
+        board["g5"] = Pawn("white")
         
     
-        self.position_history.append(self.get_position_key(board))
+        board.update_castling_rights()
+        self.start_position_history(board)
         return board
 
     def check_game_over(self, board, current_player):
-        if current_player == "white" and all(piece.color == "black" for piece in board.values() if piece):
+        if current_player == "white" and not any(board.piece_counts[WHITE]):
             return "horde_win", "black"
-        if is_checkmate(board, current_player):
-            return "checkmate", "black" if current_player == "white" else "white"
-        if is_stalemate(board, current_player):
-            return "stalemate", None
+        status, winner = self.check_no_legal_moves(board, current_player)
+        if status:
+            return status, winner
         if is_insufficient_material(board):
             return "insufficient_material", None
         return None, None
@@ -1,39 +1,32 @@
 from .ClassicChess import ClassicChess
+from ..bitboard import SQUARES
 # from ..pieces import Rook, Knight, Bishop, Queen, King, Pawn
 import logging
 
 logger = logging.getLogger('chess_game')
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 
 class KirbyChess(ClassicChess):
 
-    def validate_move(self, board, from_pos, to_pos, player_color, promotion_choice=None):
-        logger.debug(f"Validating kirby move from {from_pos} to {to_pos} for {player_color}")
-        
-        # Call the validate_move method from ClassicChess
-        success, message, new_board, info = super().validate_move(board, from_pos, to_pos, player_color, promotion_choice)
-        
-        if not success:
-            logger.debug(f"Move validation failed: {message}")
-            return success, message, new_board, info
-
-        piece = new_board[to_pos]
-        captured_piece = board[to_pos] #what was before the capture?
+    def apply_move_effects(self, board, undo, player_color):
+        piece = board.squares[undo.to_index]
+        captured_piece = undo.captured #what was before the capture?
 
         # Special rule for Kirby Chess: convert capturing piece into captured piece
         if captured_piece and not piece.__class__.__name__.lower() == 'king':
-            logger.debug(f"Kirby captured piece: {captured_piece.__class__.__name__} at {to_pos}")
+            logger.debug("Kirby captured piece: %s at %s", captured_piece.__class__.__name__, SQUARES[undo.to_index])
             new_piece = self.create_piece(captured_piece.__class__.__name__.lower(), player_color)
             if new_piece:
-                new_piece.position = to_pos
-                new_board[to_pos] = new_piece
-                info["converted"] = {
-                    "from": piece.__class__.__name__,
-                    "to": new_piece.__class__.__name__
+                # The converted piece keeps the capturer's moved flag
+                board.replace(undo.to_index, new_piece)
+                logger.debug("Converted %s to %s at %s", piece.__class__.__name__, new_piece.__class__.__name__, SQUARES[undo.to_index])
+                return None, {
+                    "converted": {
+                        "from": piece.__class__.__name__,
+                        "to": new_piece.__class__.__name__
+                    }
                 }
-                logger.debug(f"Converted {piece.__class__.__name__} to {new_piece.__class__.__name__} at {to_pos}")
 
-        return success, message, new_board, info
+        return None, {}
 
     # def create_piece(self, piece_type, color):
     #     piece_classes = {
@@ -46,4 +39,4 @@ class KirbyChess(ClassicChess):
     #     }
     #     if piece_type.lower() in piece_classes:
     #         return piece_classes[piece_type.lower()](color, "", "")
-    #     return None
\ No newline at end of file
+    #     return None
@@ -0,0 +1,173 @@
+from .bitboard import (
+    SQUARES, SQUARE_INDEX, COLOR_INDEX, WHITE, BLACK, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING,
+    KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, BETWEEN, CASTLING_HOMES,
+    bit, iter_bits, rook_attacks, bishop_attacks,
+)
+
+ALL_SQUARES = (1 << 64) - 1
+
+
+def _pins(board, king, us, them):
+    """
+    Maps each pinned piece of ``us`` to the squares it may still move to:
+    the line between the king and the pinning slider, slider included.
+    """
+    pins = {}
+    theirs = board.bitboards[them]
+    occupied = board.occupied
+    snipers = (
+        (rook_attacks(king, board.occupancy[them]) & (theirs[ROOK] | theirs[QUEEN]))
+        | (bishop_attacks(king, board.occupancy[them]) & (theirs[BISHOP] | theirs[QUEEN]))
+    )
+    for sniper in iter_bits(snipers):
+        between = BETWEEN[king][sniper]
+        blockers = between & occupied
+        if blockers and blockers & (blockers - 1) == 0 and blockers & board.occupancy[us]:
+            pins[blockers.bit_length() - 1] = between | bit(sniper)
+    return pins
+
+
+def _en_passant_is_safe(board, king, us, them, from_index, to_index, captured_index):
+    # Both pawns leave the rank at once, which may uncover a slider on the king
+    occupied = (board.occupied ^ bit(from_index) ^ bit(captured_index)) | bit(to_index)
+    theirs = board.bitboards[them]
+    return not (
+        (rook_attacks(king, occupied) & (theirs[ROOK] | theirs[QUEEN]))
+        | (bishop_attacks(king, occupied) & (theirs[BISHOP] | theirs[QUEEN]))
+    )
+
+
+def _castling_moves(board, king, us, them):
+    moves = []
+    occupied = board.occupied
+    attacked = board.attack_map(them)
+    for king_index, rook_index, right in CASTLING_HOMES:
+        if king_index != king or not board.castling_rights & right:
+            continue
+        if not board.bitboards[us][ROOK] & bit(rook_index):
+            continue
+        if BETWEEN[king_index][rook_index] & occupied:
+            continue
+        # The king crosses two squares towards the rook
+        step = 1 if rook_index > king_index else -1
+        passed = bit(king_index + step) | bit(king_index + 2 * step)
+        if passed & attacked:
+            continue
+        moves.append((king_index, king_index + 2 * step))
+    return moves
+
+
+def generate_legal_moves(board, color, sources=ALL_SQUARES):
+    """
+    Legal moves of ``color`` as (from_index, to_index) pairs.
+
+    Checkers and pinned pieces are worked out once per position, so every
+    emitted move is legal without playing it out. Castling is the king
+    moving two files. Promotions are a single pawn move; the piece is
+    chosen separately. A side without a king (Horde's white) cannot be
+    checked, so its pseudo-legal moves are all legal.
+
+    Args:
+        board: The current board state
+        color: Colour index (bitboard.WHITE or bitboard.BLACK)
+        sources: Optional bitboard restricting the squares moves start from
+    """
+    us, them = color, color ^ 1
+    ours = board.bitboards[us]
+    own = board.occupancy[us]
+    enemy = board.occupancy[them]
+    occupied = own | enemy
+    king = board.king_square(us)
+    moves = []
+
+    target_mask = ALL_SQUARES
+    pins = {}
+    if king is not None:
+        checkers = board.attackers_to(king, them)
+        if sources & bit(king):
+            lifted = occupied ^ bit(king)
+            attacked = board.attack_map(them)
+            for to_index in iter_bits(KING_ATTACKS[king] & ~own & ~attacked):
+                if checkers and board.is_attacked(to_index, them, lifted):
+                    continue
+                moves.append((king, to_index))
+            if not checkers:
+                moves.extend(_castling_moves(board, king, us, them))
+        if checkers & (checkers - 1):
+            # Double check: only the king may move
+            return moves
+        if checkers:
+            checker = checkers.bit_length() - 1
+            target_mask = checkers | BETWEEN[king][checker]
+        pins = _pins(board, king, us, them)
+
+    def add(from_index, targets):
+        targets &= target_mask & pins.get(from_index, ALL_SQUARES)
+        for to_index in iter_bits(targets):
+            moves.append((from_index, to_index))
+
+    for from_index in iter_bits(ours[KNIGHT] & sources):
+        add(from_index, KNIGHT_ATTACKS[from_index] & ~own)
+    for from_index in iter_bits((ours[BISHOP] | ours[QUEEN]) & sources):
+        add(from_index, bishop_attacks(from_index, occupied) & ~own)
+    for from_index in iter_bits((ours[ROOK] | ours[QUEEN]) & sources):
+        add(from_index, rook_attacks(from_index, occupied) & ~own)
+
+    step = 8 if us == WHITE else -8
+    en_passant = board.en_passant_target
+    en_passant_index = SQUARE_INDEX[en_passant] if en_passant is not None else None
+    for from_index in iter_bits(ours[PAWN] & sources):
+        targets = PAWN_ATTACKS[us][from_index] & enemy
+        front = from_index + step
+        if 0 <= front < 64 and not occupied & bit(front):
+            targets |= bit(front)
+            double = front + step
+            if (not board.moved & bit(from_index) and 0 <= double < 64
+                    and not occupied & bit(double)):
+                targets |= bit(double)
+        add(from_index, targets)
+
+        if en_passant_index is not None and PAWN_ATTACKS[us][from_index] & bit(en_passant_index):
+            captured_index = en_passant_index - step
+            if not board.bitboards[them][PAWN] & bit(captured_index):
+                continue
+            # En passant answers a check only by removing the checking pawn
+            allowed = target_mask | (bit(en_passant_index) if target_mask & bit(captured_index) else 0)
+            allowed &= pins.get(from_index, ALL_SQUARES)
+            if allowed & bit(en_passant_index) and (
+                    king is None
+                    or _en_passant_is_safe(board, king, us, them, from_index, en_passant_index, captured_index)):
+                moves.append((from_index, en_passant_index))
+
+    return moves
+
+
+def legal_targets(board, index):
+    """Legal destination squares (indices) of the piece on ``index``"""
+    piece = board.squares[index]
+    if piece is None:
+        return []
+    moves = generate_legal_moves(board, COLOR_INDEX[piece.color], bit(index))
+    return [to_index for _, to_index in moves]
+
+
+def has_legal_move(board, color):
+    return bool(generate_legal_moves(board, color))
+
+
+def legal_move_map(board, color):
+    """Legal moves of ``color`` as {from_square: [to_square, ...]}, squares without moves left out"""
+    moves = {}
+    for from_index, to_index in generate_legal_moves(board, color):
+        moves.setdefault(SQUARES[from_index], []).append(SQUARES[to_index])
+    return moves
+
+
+def move_cache_key(board, color):
+    """
+    Key under which the legal moves of ``color`` can be cached. The Zobrist
+    hash leaves out whether pawns have moved, which decides double steps
+    (Horde's rank 1 pawns, Kirby's converted pawns), so moved pawns are added.
+    """
+    pawns = board.bitboards[WHITE][PAWN] | board.bitboards[BLACK][PAWN]
+    return board.zobrist, color, board.moved & pawns
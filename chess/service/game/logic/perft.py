@@ -0,0 +1,221 @@
+"""
+Perft and move-generation benchmarks for every game mode.
+
+Run from the service directory:
+
+    python -m game.logic.perft perft --depth 4
+    python -m game.logic.perft bench --plies 80 --save bench.json
+    python -m game.logic.perft bench --compare bench.json
+    python -m game.logic.perft search --time 5
+
+perft counts the leaf nodes of the legal move tree from each mode's start
+position and reports nodes/sec. bench plays seeded random games through
+ChessLogic and reports the latency of make_move, check_game_over and
+get_all_possible_moves, optionally against a previously saved run. search
+runs the analysis search from each start position for a fixed time and
+reports the depth reached and nodes/sec.
+"""
+import argparse
+import json
+import logging
+import random
+import statistics
+import sys
+import time
+
+from .ChessLogic import ChessLogic
+from .bitboard import SQUARES, COLOR_INDEX, KING
+from .fen import encode_position
+from .search import analyse
+from .movegen import generate_legal_moves
+from .pieces import Pawn
+
+MODES = ['classic', '960', 'horde', 'kirby', 'bomb']
+PROMOTION_CHOICES = ['queen', 'rook', 'bishop', 'knight']
+
+# Node counts from the classic start position, for a quick sanity check
+CLASSIC_PERFT = {1: 20, 2: 400, 3: 8902, 4: 197281, 5: 4865609}
+
+
+def _children(board, game_mode, color):
+    """
+    Plays each legal move of ``color`` in turn, yielding its name while it
+    is on the board. Moves go through the mode's apply_move_effects first,
+    like validate_move, so Kirby conversions and Bomb explosions shape the
+    tree. A pawn still on the last rank afterwards promotes, and every
+    promotion piece is a separate child.
+    """
+    player_color = 'white' if color == COLOR_INDEX['white'] else 'black'
+    for from_index, to_index in generate_legal_moves(board, color):
+        name = f"{SQUARES[from_index]}{SQUARES[to_index]}"
+        undo = board.push(SQUARES[from_index], SQUARES[to_index])
+        error, _ = game_mode.apply_move_effects(board, undo, player_color)
+        if not error:
+            if isinstance(board.squares[to_index], Pawn) and to_index // 8 in (0, 7):
+                for choice in PROMOTION_CHOICES:
+                    board.replace(to_index, game_mode.create_piece(choice, player_color))
+                    yield name + ('n' if choice == 'knight' else choice[0])
+            else:
+                yield name
+        board.pop()
+
+
+def _kings(board):
+    return tuple(bool(board.bitboards[color][KING]) for color in (0, 1))
+
+
+def perft(board, game_mode, color, depth, kings=None):
+    """
+    Counts the leaf nodes ``depth`` plies below the current position.
+    A position where a king has exploded is terminal.
+    """
+    if depth == 0:
+        return 1
+    if kings is None:
+        kings = _kings(board)
+    elif _kings(board) != kings:
+        return 0
+    return sum(perft(board, game_mode, color ^ 1, depth - 1, kings) for _ in _children(board, game_mode, color))
+
+
+def divide(board, game_mode, color, depth):
+    """Node counts below each root move, for tracking down perft mismatches"""
+    kings = _kings(board)
+    return {move: perft(board, game_mode, color ^ 1, depth - 1, kings) for move in _children(board, game_mode, color)}
+
+
+def run_perft(modes, depth, seed):
+    results = {}
+    for mode in modes:
+        random.seed(seed)
+        logic = ChessLogic(mode)
+        board = logic.initialize_game()
+        for current in range(1, depth + 1):
+            start = time.perf_counter()
+            nodes = perft(board, logic.game_mode, COLOR_INDEX['white'], current)
+            elapsed = time.perf_counter() - start
+            results.setdefault(mode, []).append({
+                'depth': current,
+                'nodes': nodes,
+                'seconds': elapsed,
+                'nps': nodes / elapsed if elapsed else 0.0
+            })
+            expected = CLASSIC_PERFT.get(current) if mode == 'classic' else None
+            status = "" if expected is None else (" ok" if expected == nodes else f" MISMATCH (expected {expected})")
+            print(f"{mode:8} depth {current}: {nodes:>10} nodes {elapsed:8.3f}s {nodes / elapsed if elapsed else 0:>10.0f} nps{status}")
+    return results
+
+
+def _timed(samples, name, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    samples.setdefault(name, []).append(time.perf_counter() - start)
+    return result
+
+
+def _summary(samples):
+    ordered = sorted(samples)
+    return {
+        'count': len(ordered),
+        'mean_us': statistics.fmean(ordered) * 1e6,
+        'p50_us': ordered[len(ordered) // 2] * 1e6,
+        'p95_us': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1e6,
+    }
+
+
+def run_bench(modes, games, plies, seed):
+    results = {}
+    for mode in modes:
+        samples = {}
+        for game in range(games):
+            rng = random.Random(seed + game)
+            random.seed(seed)
+            logic = ChessLogic(mode)
+            logic.initialize_game()
+            for _ in range(plies):
+                player = logic.current_player
+                moves = _timed(samples, 'get_all_possible_moves', logic.get_all_possible_moves, player)
+                if logic.state != 'PLAYING' or not moves:
+                    break
+                from_pos = rng.choice(sorted(moves))
+                to_pos = rng.choice(sorted(moves[from_pos]))
+                success, message, _, _ = _timed(samples, 'make_move', logic.make_move, from_pos, to_pos, player)
+                if not success:
+                    raise RuntimeError(f"{mode}: generated move {from_pos}{to_pos} rejected: {message}")
+                if logic.state == 'PROMOTION_PENDING':
+                    logic.handle_promotion(rng.choice(PROMOTION_CHOICES))
+                _timed(samples, 'check_game_over', logic.game_mode.check_game_over, logic.board, logic.current_player)
+                if logic.state == 'GAME_OVER':
+                    break
+        results[mode] = {name: _summary(values) for name, values in samples.items()}
+    return results
+
+
+def run_search(modes, time_limit, seed):
+    results = {}
+    for mode in modes:
+        random.seed(seed)
+        logic = ChessLogic(mode)
+        board = logic.initialize_game()
+        result = analyse(encode_position(board), mode, time_limit, start_position=logic.get_start_position())
+        result['nps'] = result['nodes'] / result['seconds'] if result['seconds'] else 0.0
+        results[mode] = result
+        print(f"{mode:8} depth {result['depth']:>3} {result['nodes']:>10} nodes {result['seconds']:8.3f}s "
+              f"{result['nps']:>10.0f} nps  best {result['best_move']} score {result['score']}")
+    return results
+
+
+def print_bench(results, baseline=None):
+    for mode, operations in results.items():
+        for name, summary in sorted(operations.items()):
+            line = f"{mode:8} {name:24} n={summary['count']:<6} mean {summary['mean_us']:9.1f}us p50 {summary['p50_us']:9.1f}us p95 {summary['p95_us']:9.1f}us"
+            previous = (baseline or {}).get(mode, {}).get(name)
+            if previous and previous['mean_us']:
+                line += f"  x{summary['mean_us'] / previous['mean_us']:.2f} vs baseline"
+            print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Perft and benchmarks for the chess engine")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    perft_parser = subparsers.add_parser('perft', help="Count move tree nodes from the start positions")
+    perft_parser.add_argument('--depth', type=int, default=3)
+
+    bench_parser = subparsers.add_parser('bench', help="Time make_move, check_game_over and get_all_possible_moves")
+    bench_parser.add_argument('--games', type=int, default=5)
+    bench_parser.add_argument('--plies', type=int, default=80)
+    bench_parser.add_argument('--compare', help="JSON file of a previous run to compare against")
+
+    search_parser = subparsers.add_parser('search', help="Run the analysis search from the start positions")
+    search_parser.add_argument('--time', type=float, default=2.0, help="Seconds per position")
+
+    for sub in (perft_parser, bench_parser, search_parser):
+        sub.add_argument('--mode', choices=MODES, action='append', help="Repeat to select several (default: all)")
+        sub.add_argument('--seed', type=int, default=0, help="Seeds random games and the 960 start position")
+        sub.add_argument('--save', help="Write the results as JSON to this file")
+
+    args = parser.parse_args(argv)
+    logging.disable(logging.CRITICAL)
+    modes = args.mode or MODES
+
+    if args.command == 'perft':
+        results = run_perft(modes, args.depth, args.seed)
+    elif args.command == 'search':
+        results = run_search(modes, args.time, args.seed)
+    else:
+        baseline = None
+        if args.compare:
+            with open(args.compare) as f:
+                baseline = json.load(f)
+        results = run_bench(modes, args.games, args.plies, args.seed)
+        print_bench(results, baseline)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,361 @@
+"""
+PGN export and import.
+
+Export works on plain dicts, like replay.py, so a streamed queryset can be
+written out without building model instances:
+
+    {
+        "game_key": ..., "game_mode": "classic", "start_position": None,
+        "move_history": [...], "white": "alice", "black": "bob",
+        "winner": "white" | "black" | None, "status": "finished",
+        "date": datetime | None, "time_base": 600, "time_increment": 0
+    }
+
+Import splits PGN text into games and replays each one through the full
+validation path. It returns what is needed to store the game. The import
+functions only take strings, so they can run in a worker process
+(executor.submit_search).
+"""
+import re
+
+from .ChessLogic import ChessLogic
+from .bitboard import SQUARES, SQUARE_INDEX, COLOR_INDEX, PAWN, KING, piece_kind
+from .fen import encode_position, move_to_uci
+from .modes.Chess960 import START_POSITIONS
+from .movegen import generate_legal_moves
+from .utils import is_in_check
+
+VARIANTS = {
+    'classic': 'Standard',
+    '960': 'Chess960',
+    'horde': 'Horde',
+    'kirby': 'Kirby',
+    'bomb': 'Bomb',
+}
+VARIANT_MODES = {name.lower(): mode for mode, name in VARIANTS.items()}
+# Modes whose games do not start from the standard position
+SETUP_MODES = ('960', 'horde')
+
+RESULTS = {'white': '1-0', 'black': '0-1', None: '1/2-1/2'}
+RESULT_WINNERS = {'1-0': 'white', '0-1': 'black', '1/2-1/2': None}
+PIECE_SYMBOLS = "PNBRQK"
+PROMOTION_SYMBOLS = {'queen': 'Q', 'rook': 'R', 'bishop': 'B', 'knight': 'N'}
+
+_HEADER = re.compile(r'^\[(\w+)\s+"((?:[^"\\]|\\.)*)"\]\s*$')
+# Comments, line comments, variations and NAGs, none of which are replayed
+_NOISE = re.compile(r'\{[^}]*\}|;[^\n]*|\$\d+')
+_MOVE_NUMBER = re.compile(r'^\d+\.+')
+_SAN_ANNOTATIONS = re.compile(r'[+#!?]+$')
+
+
+# SAN
+
+def move_san(board, from_index, to_index, promotion=None, legal_moves=None):
+    """
+    SAN of a legal move on ``board``, without the check suffix.
+
+    Args:
+        legal_moves: The side to move's (from, to) pairs, when the caller
+            already has them
+    """
+    piece = board.squares[from_index]
+    kind = piece_kind(piece)
+    target = SQUARES[to_index]
+    if kind == KING and abs(from_index % 8 - to_index % 8) == 2:
+        return "O-O" if to_index > from_index else "O-O-O"
+
+    capture = board.squares[to_index] is not None
+    if kind == PAWN:
+        capture = capture or from_index % 8 != to_index % 8
+        san = f"{SQUARES[from_index][0]}x{target}" if capture else target
+        if promotion:
+            san += f"={PROMOTION_SYMBOLS[promotion]}"
+        return san
+
+    if legal_moves is None:
+        legal_moves = generate_legal_moves(board, COLOR_INDEX[piece.color])
+    # Other pieces of the same type that can reach the target
+    rivals = [
+        other for other, to in legal_moves
+        if to == to_index and other != from_index and board.squares[other] is piece
+    ]
+    qualifier = ""
+    if rivals:
+        if all(other % 8 != from_index % 8 for other in rivals):
+            qualifier = SQUARES[from_index][0]
+        elif all(other // 8 != from_index // 8 for other in rivals):
+            qualifier = SQUARES[from_index][1]
+        else:
+            qualifier = SQUARES[from_index]
+    return f"{PIECE_SYMBOLS[kind]}{qualifier}{'x' if capture else ''}{target}"
+
+
+def _play(logic, from_pos, to_pos, promotion):
+    """
+    Plays a move through the engine, completing a promotion the record
+    left open with a queen like replay.py does.
+
+    Returns:
+        (message, suffix): an error message or None, and the SAN check suffix
+    """
+    player = logic.current_player
+    success, message, _, result = logic.make_move(from_pos, to_pos, player, promotion)
+    if not success:
+        return message, ""
+    if logic.state == 'PROMOTION_PENDING':
+        success, message, _, result = logic.handle_promotion(promotion or 'queen')
+        if not success:
+            return message, ""
+    if result.get('game_over') and result.get('winner') == player:
+        return None, "#"
+    opponent = "black" if player == "white" else "white"
+    return None, "+" if is_in_check(logic.board, opponent) else ""
+
+
+def _fen(board):
+    # The stored encoding minus its moved-pieces field
+    return " ".join(encode_position(board).split()[:6])
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+# Export
+
+def game_to_pgn(record):
+    """
+    PGN text of a stored game, its moves replayed to get their SAN. A move
+    the engine rejects ends the movetext with a comment saying so.
+    """
+    game_mode = record.get("game_mode") or 'classic'
+    logic = ChessLogic(game_mode, record.get("start_position"))
+    logic.initialize_game()
+
+    status = record.get("status")
+    result = RESULTS[record.get("winner")] if status == 'finished' else "*"
+    date = record.get("date")
+    headers = [
+        ("Event", "ft_transcendence chess"),
+        ("Site", record.get("game_key") or "?"),
+        ("Date", date.strftime("%Y.%m.%d") if date else "????.??.??"),
+        ("Round", "-"),
+        ("White", record.get("white") or "?"),
+        ("Black", record.get("black") or "?"),
+        ("Result", result),
+        ("Variant", VARIANTS.get(game_mode, game_mode)),
+        ("TimeControl", f"{record['time_base']}+{record.get('time_increment') or 0}" if record.get("time_base") else "-"),
+    ]
+    if game_mode in SETUP_MODES:
+        headers += [("SetUp", "1"), ("FEN", _fen(logic.board))]
+
+    tokens = []
+    for ply, move in enumerate(record.get("move_history") or []):
+        from_pos, to_pos, promotion = move.get("from"), move.get("to"), move.get("promotion")
+        board = logic.board
+        if from_pos not in SQUARE_INDEX or to_pos not in SQUARE_INDEX or board[from_pos] is None:
+            tokens.append(f"{{Unreadable move {from_pos}-{to_pos}}}")
+            break
+        san = move_san(board, SQUARE_INDEX[from_pos], SQUARE_INDEX[to_pos], promotion or (
+            'queen' if piece_kind(board[from_pos]) == PAWN and to_pos[1] in "18" else None
+        ))
+        error, suffix = _play(logic, from_pos, to_pos, promotion)
+        if error:
+            tokens.append(f"{{Illegal move {from_pos}-{to_pos}: {error}}}")
+            break
+        # Move numbers stay on the line of their move
+        tokens.append(f"{ply // 2 + 1}. {san}{suffix}" if ply % 2 == 0 else san + suffix)
+    tokens.append(result)
+
+    lines = [f'[{name} "{_escape(value)}"]' for name, value in headers]
+    lines.append("")
+    line = ""
+    # Movetext wrapped at 80 columns, as export format asks
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > 80:
+            lines.append(line)
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    lines.append(line)
+    return "\n".join(lines) + "\n"
+
+
+# Import
+
+def split_games(text):
+    """Splits PGN text holding any number of games into one string per game"""
+    games, current, in_moves = [], [], False
+    for line in text.replace("\r\n", "\n").split("\n"):
+        stripped = line.strip()
+        if stripped.startswith("[") and in_moves:
+            games.append("\n".join(current))
+            current, in_moves = [], False
+        elif stripped and not stripped.startswith("[") and not stripped.startswith("%"):
+            in_moves = True
+        current.append(line)
+    if any(line.strip() for line in current):
+        games.append("\n".join(current))
+    return games
+
+
+def parse_game(text):
+    """
+    Headers and movetext tokens of a single PGN game.
+
+    Returns:
+        (headers, moves, result): moves are SAN strings; comments,
+        variations, NAGs and move numbers are dropped
+
+    Raises:
+        ValueError: if a header line is malformed
+    """
+    headers, movetext = {}, []
+    for line in text.split("\n"):
+        stripped = line.strip()
+        if stripped.startswith("%"):
+            continue
+        if stripped.startswith("[") and not movetext:
+            match = _HEADER.match(stripped)
+            if not match:
+                raise ValueError(f"Malformed header: {stripped}")
+            headers[match.group(1)] = re.sub(r'\\(.)', r'\1', match.group(2))
+        elif stripped:
+            movetext.append(stripped)
+
+    body = _NOISE.sub(" ", "\n".join(movetext))
+    # Variations may nest, so they are removed innermost first
+    while True:
+        body, count = re.subn(r'\([^()]*\)', " ", body)
+        if not count:
+            break
+
+    moves, result = [], None
+    for token in body.split():
+        if token in RESULT_WINNERS or token == "*":
+            result = token
+            continue
+        token = _MOVE_NUMBER.sub("", token)
+        if token:
+            moves.append(token)
+    return headers, moves, result or headers.get("Result", "*")
+
+
+def _normalize_san(san):
+    san = _SAN_ANNOTATIONS.sub("", san).replace("0-0-0", "O-O-O").replace("0-0", "O-O")
+    # "e8Q" and "e8=Q" are both seen in the wild
+    match = re.match(r'^(.*[1-8])=?([QRBN])$', san)
+    if match and match.group(1)[0] in "abcdefgh":
+        san = f"{match.group(1)}={match.group(2)}"
+    return san
+
+
+def _find_move(board, color, san):
+    """(from_index, to_index, promotion) of the legal move written ``san``"""
+    wanted = _normalize_san(san)
+    legal_moves = generate_legal_moves(board, color)
+    for from_index, to_index in legal_moves:
+        promotes = piece_kind(board.squares[from_index]) == PAWN and to_index // 8 in (0, 7)
+        for promotion in (PROMOTION_SYMBOLS if promotes else (None,)):
+            if move_san(board, from_index, to_index, promotion, legal_moves) == wanted:
+                return from_index, to_index, promotion
+    raise ValueError(f"Illegal or ambiguous move: {san}")
+
+
+def _start_position(game_mode, headers, logic):
+    """SP-ID of a Chess960 game from its FEN header; checks other modes start where they should"""
+    fen = headers.get("FEN")
+    if game_mode == '960':
+        if not fen:
+            raise ValueError("Chess960 games need a FEN header")
+        back_rank = fen.split("/")[-1].split()[0]
+        back_rank = re.sub(r'\d', lambda match: "." * int(match.group()), back_rank)
+        if back_rank not in START_POSITIONS:
+            raise ValueError(f"Not a Chess960 start position: {fen}")
+        return START_POSITIONS.index(back_rank)
+    if fen and fen.split()[:4] != _fen(logic.board).split()[:4]:
+        raise ValueError("Only games from the start position can be imported")
+    return None
+
+
+def import_game(text):
+    """
+    Replays one PGN game through the engine.
+
+    Returns:
+        dict with game_mode, start_position, white, black, winner,
+        move_history (from/to/player/promotion per ply), uci_moves, the
+        final encoded position and the number of plies
+
+    Raises:
+        ValueError: if the game cannot be read, has an illegal move or a
+        result that contradicts the final position
+    """
+    headers, sans, result = parse_game(text)
+    variant = headers.get("Variant", "Standard").lower()
+    if variant not in VARIANT_MODES:
+        raise ValueError(f"Unsupported variant: {headers.get('Variant')}")
+    if result not in RESULT_WINNERS:
+        raise ValueError("Only finished games can be imported")
+    game_mode = VARIANT_MODES[variant]
+
+    logic = ChessLogic(game_mode)
+    logic.initialize_game()
+    start_position = _start_position(game_mode, headers, logic)
+    if start_position is not None:
+        logic = ChessLogic(game_mode, start_position)
+        logic.initialize_game()
+
+    move_history, uci_moves = [], []
+    for ply, san in enumerate(sans):
+        if logic.state == 'GAME_OVER':
+            raise ValueError(f"Move {san} after the end of the game")
+        player = logic.current_player
+        try:
+            from_index, to_index, promotion = _find_move(logic.board, COLOR_INDEX[player], san)
+        except ValueError as e:
+            raise ValueError(f"ply {ply + 1}: {e}")
+        from_pos, to_pos = SQUARES[from_index], SQUARES[to_index]
+        error, _ = _play(logic, from_pos, to_pos, promotion)
+        if error:
+            raise ValueError(f"ply {ply + 1}: {san}: {error}")
+        move = {"from": from_pos, "to": to_pos, "player": player}
+        if promotion:
+            move["promotion"] = promotion
+        move_history.append(move)
+        uci_moves.append(move_to_uci(from_pos, to_pos, promotion))
+
+    winner = RESULT_WINNERS[result]
+    if logic.state == 'GAME_OVER':
+        status, engine_winner = logic.game_mode.check_game_over(logic.board, logic.current_player)
+        if engine_winner != winner:
+            raise ValueError(f"Result {result} contradicts the final position ({status})")
+
+    return {
+        "game_mode": game_mode,
+        "start_position": start_position,
+        "white": headers.get("White"),
+        "black": headers.get("Black"),
+        "winner": winner,
+        "move_history": move_history,
+        "uci_moves": uci_moves,
+        "position": encode_position(logic.board, len(move_history) // 2 + 1),
+        "current_player": logic.current_player,
+        "plies": len(move_history),
+    }
+
+
+def import_games(texts):
+    """
+    import_game over a batch, for a worker process.
+
+    Returns:
+        One dict per game, in order: {"game": ...} or {"error": message}
+    """
+    results = []
+    for text in texts:
+        try:
+            results.append({"game": import_game(text)})
+        except (ValueError, KeyError, IndexError) as e:
+            results.append({"error": str(e)})
+    return results
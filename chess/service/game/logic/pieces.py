@@ -1,213 +1,156 @@
-import copy
 from abc import ABC, abstractmethod
 from .utils import is_position_under_attack, is_in_check
+from .movegen import legal_targets
+from .bitboard import (
+    SQUARES, SQUARE_INDEX, COLOR_INDEX, WHITE, KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS,
+    bit, squares_of, rook_attacks, bishop_attacks, queen_attacks
+)
 
-import logging
 
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
-# Constant for board files
-FILES = "abcdefgh"
+class ChessPiece(ABC):
+    """
+    Immutable flyweight: there is one instance per piece class and colour,
+    shared by every board. Where a piece stands and whether it has moved
+    are kept by the Board, so copying a board never copies its pieces.
+    """
 
+    __slots__ = ('color',)
+    _instances = {}
 
-class ChessPiece(ABC):
-    def __init__(self, color, position, piece_id):
-        self.color = color
-        self.position = position
-        self.piece_id = piece_id
-        self.has_moved = False
+    def __new__(cls, color):
+        piece = ChessPiece._instances.get((cls, color))
+        if piece is None:
+            piece = super().__new__(cls)
+            object.__setattr__(piece, 'color', color)
+            ChessPiece._instances[(cls, color)] = piece
+        return piece
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{self.__class__.__name__} pieces are immutable")
+
+    def __reduce__(self):
+        return self.__class__, (self.color,)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
 
     def __str__(self):
-        return f"{self.color}_{self.__class__.__name__.lower()}_{self.piece_id}"
+        return f"{self.color}_{self.__class__.__name__.lower()}"
 
     def __repr__(self):
         return self.__str__()
 
-    def to_dict(self):
+    def to_dict(self, position, has_moved=False):
         return {
             'type': self.__class__.__name__,
             'color': self.color,
-            'position': self.position,
-            'piece_id': self.piece_id,
-            'has_moved': self.has_moved
+            'position': position,
+            'piece_id': "",
+            'has_moved': has_moved
         }
 
     @abstractmethod
-    def get_possible_moves(self, board):
+    def get_possible_moves(self, board, position):
         pass
     # new method to return only the movements that doesnt leave you on check
-    def get_legal_moves(self, board):
-
-        legal_moves = []
-        for move in self.get_possible_moves(board):
-            logging.debug(f"Testing move {self.position} -> {move}")
-            test_board = copy.deepcopy(board)
-    
-            test_board[move] = self
-            test_board[self.position] = None
-            old_position = self.position
-            self.position = move
-    
-            king_position = None
-            for pos, piece in test_board.items():
-                if piece and piece.color == self.color and isinstance(piece, King):
-                    king_position = pos
-                    break
-    
-            if king_position:
-                logging.debug(f"King position after move: {king_position}")
-            else:
-                logging.warning(f"King not found for color {self.color} after move {move}")
-    
-            if king_position and not is_in_check(test_board, self.color):
-                legal_moves.append(move)
-            else:
-                logging.debug(f"Move {self.position} -> {move} leaves king in check or is invalid")
-    
-            self.position = old_position  
-    
-        logging.debug(f"Legal moves for {self}: {legal_moves}")
-        return legal_moves
-
-
-
-    
-
-    # Utility method for sliding pieces (Rook, Bishop, Queen)
-    def sliding_moves(self, board, directions):
-        moves = []
-        file_idx = FILES.index(self.position[0])
-        rank = int(self.position[1])
-        for dx, dy in directions:
-            new_file_idx = file_idx + dx
-            new_rank = rank + dy
-            while 0 <= new_file_idx < 8 and 1 <= new_rank <= 8:
-                target_pos = f"{FILES[new_file_idx]}{new_rank}"
-                if target_pos not in board:
-                    # Not a valid square
-                    break
-                if board[target_pos] is None:
-                    moves.append(target_pos)
-                else:
-                    if board[target_pos].color != self.color:
-                        moves.append(target_pos)
-                    break
-                new_file_idx += dx
-                new_rank += dy
-        return moves
+    def get_legal_moves(self, board, position):
+        return [SQUARES[index] for index in legal_targets(board, SQUARE_INDEX[position])]
+
+    # Utility method: converts a bitboard of target squares into square names,
+    # skipping squares held by our own pieces.
+    def target_squares(self, board, targets):
+        own = board.occupancy[COLOR_INDEX[self.color]]
+        return squares_of(targets & ~own)
 
 
 class Pawn(ChessPiece):
-    def get_possible_moves(self, board, en_passant_target=None):
+    __slots__ = ()
+
+    def get_possible_moves(self, board, position, en_passant_target=None):
         moves = []
-        file, rank = self.position[0], int(self.position[1])
-        direction = 1 if self.color == 'white' else -1
-        
-        front_pos = f"{file}{rank + direction}"
-        if front_pos in board and board[front_pos] is None:
-            moves.append(front_pos)
-
-            
-            if not self.has_moved:
-                double_pos = f"{file}{rank + 2*direction}"
-                if double_pos in board and board[double_pos] is None:
-                    moves.append(double_pos)
-
-        file_idx = FILES.index(file)
-        for offset in [-1, 1]:
-            if 0 <= file_idx + offset < 8:
-                capture_file = FILES[file_idx + offset]
-                capture_pos = f"{capture_file}{rank + direction}"
-                
-                if capture_pos in board and board[capture_pos] is not None:
-                    piece = board[capture_pos]
-                    if piece.color != self.color:
-                        moves.append(capture_pos)
-                if en_passant_target == capture_pos:
-                        moves.append(capture_pos)
+        index = SQUARE_INDEX[position]
+        color = COLOR_INDEX[self.color]
+        step = 8 if color == WHITE else -8
+        occupied = board.occupied
+
+        front = index + step
+        if 0 <= front < 64 and not occupied & bit(front):
+            moves.append(SQUARES[front])
+
+            if not board.has_moved(index):
+                double = front + step
+                if 0 <= double < 64 and not occupied & bit(double):
+                    moves.append(SQUARES[double])
+
+        targets = PAWN_ATTACKS[color][index]
+        moves.extend(squares_of(targets & board.occupancy[color ^ 1]))
+        if en_passant_target in SQUARE_INDEX and targets & bit(SQUARE_INDEX[en_passant_target]):
+            moves.append(en_passant_target)
         return moves
-      
+
 
 class Rook(ChessPiece):
-    def get_possible_moves(self, board):
-        directions = [(1, 0), (-1, 0), (0, 1), (0, -1)]
-        return self.sliding_moves(board, directions)
+    __slots__ = ()
+
+    def get_possible_moves(self, board, position):
+        return self.target_squares(board, rook_attacks(SQUARE_INDEX[position], board.occupied))
 
 
 class Knight(ChessPiece):
-    def get_possible_moves(self, board):
-        moves = []
-        file = self.position[0]
-        rank = int(self.position[1])
-        file_idx = FILES.index(file)
-        knight_moves = [
-            (2, 1), (2, -1), (-2, 1), (-2, -1),
-            (1, 2), (1, -2), (-1, 2), (-1, -2)
-        ]
-        for dx, dy in knight_moves:
-            new_idx = file_idx + dx
-            new_rank = rank + dy
-            if 0 <= new_idx < 8 and 1 <= new_rank <= 8:
-                target_pos = f"{FILES[new_idx]}{new_rank}"
-                if target_pos in board:
-                    target = board[target_pos]
-                    if target is None or target.color != self.color:
-                        moves.append(target_pos)
-        return moves
+    __slots__ = ()
+
+    def get_possible_moves(self, board, position):
+        return self.target_squares(board, KNIGHT_ATTACKS[SQUARE_INDEX[position]])
 
 
 class Bishop(ChessPiece):
-    def get_possible_moves(self, board):
-        directions = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
-        return self.sliding_moves(board, directions)
+    __slots__ = ()
+
+    def get_possible_moves(self, board, position):
+        return self.target_squares(board, bishop_attacks(SQUARE_INDEX[position], board.occupied))
 
 
 class Queen(ChessPiece):
-    def get_possible_moves(self, board):
+    __slots__ = ()
+
+    def get_possible_moves(self, board, position):
         # Combining sliding moves from rook (orthogonal) and bishop (diagonal)
-        directions = [(1, 0), (-1, 0), (0, 1), (0, -1),
-                      (1, 1), (1, -1), (-1, 1), (-1, -1)]
-        return self.sliding_moves(board, directions)
+        return self.target_squares(board, queen_attacks(SQUARE_INDEX[position], board.occupied))
 
 
 class King(ChessPiece):
-    def get_possible_moves(self, board):
+    __slots__ = ()
+
+    def get_possible_moves(self, board, position):
         moves = []
-        file = self.position[0]
-        rank = int(self.position[1])
-        file_idx = FILES.index(file)
-        directions = [
-            (0, 1), (1, 1), (1, 0), (1, -1),
-            (0, -1), (-1, -1), (-1, 0), (-1, 1)
-        ]
+        index = SQUARE_INDEX[position]
+        opponent = COLOR_INDEX[self.color] ^ 1
         # Regular moves: one square in any direction, provided the target isn't under attack.
-        for dx, dy in directions:
-            new_idx = file_idx + dx
-            new_rank = rank + dy
-            if 0 <= new_idx < 8 and 1 <= new_rank <= 8:
-                target_pos = f"{FILES[new_idx]}{new_rank}"
-                if target_pos in board:
-                    target = board[target_pos]
-                    if (target is None or target.color != self.color):
-                        # Simulate move for safety check
-                        test_board = copy.deepcopy(board)
-                        test_board[target_pos] = self
-                        test_board[self.position] = None
-                        if not is_position_under_attack(test_board, target_pos, self.color, memo={}):
-                            moves.append(target_pos)
+        # When in check the king is lifted off the board so sliders see through its square.
+        attacked = board.attack_map(opponent)
+        in_check = (attacked >> index) & 1
+        occupied = board.occupied & ~bit(index)
+        for target in self.target_squares(board, KING_ATTACKS[index] & ~attacked):
+            if in_check and board.is_attacked(SQUARE_INDEX[target], opponent, occupied):
+                continue
+            moves.append(target)
 
         # Castling moves: only if king not in check and hasn't moved.
-        if not self.has_moved and not is_in_check(board, self.color, memo={}):
+        if not board.has_moved(index) and not is_in_check(board, self.color):
             rank_suffix = "1" if self.color == 'white' else "8"
 
             def check_castling(files_to_check, rook_pos):
                 # Check all squares between king and rook for occupancy and attacks.
                 for f in files_to_check:
                     square = f"{f}{rank_suffix}"
-                    if board.get(square) is not None or is_position_under_attack(board, square, self.color, memo={}):
+                    if board.get(square) is not None or is_position_under_attack(board, square, self.color):
                         return False
                 # Verify rook existence and its unmoved status.
                 rook = board.get(rook_pos)
-                if not rook or not isinstance(rook, Rook) or rook.has_moved:
+                if not rook or not isinstance(rook, Rook) or board.has_moved(SQUARE_INDEX[rook_pos]):
                     return False
                 return True
 
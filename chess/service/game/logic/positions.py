@@ -0,0 +1,60 @@
+"""
+Stateless position queries for the batch positions endpoint.
+
+Each position is decoded and read through the process-wide position cache,
+the same one that serves live games, so positions the games have already
+reached cost a dict lookup. There is no game history behind a query: a
+position counts as seen once, so repetition never ends it, while the
+fifty-move rule still reads the halfmove clock of the FEN.
+"""
+from .ChessLogic import ChessLogic
+from .bitboard import COLORS
+from .cache import position_cache
+from .fen import decode_position
+from .utils import is_in_check
+
+
+def describe_position(game_mode, position):
+    """
+    Legal moves, check and game-over status of ``position`` for the side to move.
+
+    Args:
+        game_mode: A ChessLogic's mode handler; its position history is reset
+        position: Encoded position (fen.encode_position) or plain FEN
+
+    Returns:
+        dict with turn, legal_moves as {from: [to, ...]}, check, and
+        game_over as {status, winner}, or None while play goes on
+
+    Raises:
+        ValueError: if the position cannot be read
+    """
+    board = decode_position(position, game_mode.create_piece)
+    color = COLORS[board.turn]
+    game_mode.start_position_history(board)
+    status, winner = game_mode.check_game_over(board, color)
+    return {
+        "turn": color,
+        "legal_moves": position_cache.lookup(game_mode, board, board.turn).moves,
+        "check": is_in_check(board, color),
+        "game_over": {"status": status, "winner": winner} if status is not None else None,
+    }
+
+
+def describe_positions(queries):
+    """
+    Runs describe_position over ``queries``, a list of (position, game_mode)
+    pairs with valid mode names. A position that cannot be read gets an
+    error entry instead of failing the batch.
+    """
+    handlers = {}
+    results = []
+    for position, game_mode in queries:
+        if game_mode not in handlers:
+            handlers[game_mode] = ChessLogic(game_mode).game_mode
+        try:
+            result = describe_position(handlers[game_mode], position)
+        except ValueError as e:
+            result = {"error": str(e)}
+        results.append({"position": position, "game_mode": game_mode, **result})
+    return results
@@ -0,0 +1,308 @@
+"""
+Slow, independent implementation of the game rules, for fuzz.py to check
+the engine against.
+
+Nothing is shared with the bitboard engine beyond the start positions:
+the board is a dict of square index -> (kind, colour), moves are tried on
+a copy of it and kept if the king is not left attacked, and every rule
+(castling, en passant, Kirby conversions, Bomb explosions, Horde wipeouts,
+draws) is written out directly from its definition. It is meant to be
+obviously right, not fast.
+"""
+from .modes.Chess960 import START_POSITIONS
+
+WHITE, BLACK = "white", "black"
+KINDS = "pnbrqk"
+KNIGHT_STEPS = [(1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2)]
+KING_STEPS = [(1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1)]
+ROOK_DIRECTIONS = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+BISHOP_DIRECTIONS = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
+PROMOTIONS = {"queen": "q", "rook": "r", "bishop": "b", "knight": "n"}
+
+STANDARD_START = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR"
+HORDE_START = "rnbqkbnr/pppppppp/8/1PP2PP1/PPPPPPPP/PPPPPPPP/PPPPPPPP/PPPPPPPP"
+
+
+def other(color):
+    return BLACK if color == WHITE else WHITE
+
+
+def _square(file, rank):
+    if 0 <= file < 8 and 0 <= rank < 8:
+        return rank * 8 + file
+    return None
+
+
+def start_placement(game_mode, start_position=None):
+    if game_mode == 'horde':
+        return HORDE_START
+    if game_mode == '960':
+        back_rank = START_POSITIONS[start_position]
+        return f"{back_rank.lower()}/pppppppp/8/8/8/8/PPPPPPPP/{back_rank}"
+    return STANDARD_START
+
+
+class ReferenceGame:
+    def __init__(self, game_mode='classic', start_position=None):
+        self.game_mode = game_mode
+        self.squares = {}
+        rows = start_placement(game_mode, start_position).split("/")
+        for rank, row in zip(range(7, -1, -1), rows):
+            file = 0
+            for char in row:
+                if char.isdigit():
+                    file += int(char)
+                    continue
+                self.squares[rank * 8 + file] = (char.lower(), WHITE if char.isupper() else BLACK)
+                file += 1
+        self.moved = set()
+        self.turn = WHITE
+        self.en_passant = None
+        self.half_move_clock = 0
+        self.seen = {}
+        self._remember()
+
+    # Attacks
+
+    def attacks(self, index, color, squares=None):
+        """Whether a piece of ``color`` attacks ``index``"""
+        squares = self.squares if squares is None else squares
+        file, rank = index % 8, index // 8
+        for kinds, steps in (("n", KNIGHT_STEPS), ("k", KING_STEPS)):
+            for df, dr in steps:
+                square = _square(file + df, rank + dr)
+                if square is not None and squares.get(square) in [(kind, color) for kind in kinds]:
+                    return True
+        # A pawn attacks diagonally forwards, so it sits diagonally behind
+        back = -1 if color == WHITE else 1
+        for df in (-1, 1):
+            square = _square(file + df, rank + back)
+            if square is not None and squares.get(square) == ("p", color):
+                return True
+        for kinds, directions in (("rq", ROOK_DIRECTIONS), ("bq", BISHOP_DIRECTIONS)):
+            for df, dr in directions:
+                f, r = file + df, rank + dr
+                while _square(f, r) is not None:
+                    piece = squares.get(_square(f, r))
+                    if piece is not None:
+                        if piece[1] == color and piece[0] in kinds:
+                            return True
+                        break
+                    f, r = f + df, r + dr
+        return False
+
+    def king(self, color, squares=None):
+        squares = self.squares if squares is None else squares
+        for index, piece in squares.items():
+            if piece == ("k", color):
+                return index
+        return None
+
+    def in_check(self, color, squares=None):
+        king = self.king(color, squares)
+        return king is not None and self.attacks(king, other(color), squares)
+
+    # Moves
+
+    def can_castle(self, color, side):
+        """Whether the king and rook of that side are unmoved on their home squares"""
+        rank = 0 if color == WHITE else 7
+        king, rook = rank * 8 + 4, rank * 8 + (7 if side == "king" else 0)
+        return (self.squares.get(king) == ("k", color) and king not in self.moved
+                and self.squares.get(rook) == ("r", color) and rook not in self.moved)
+
+    def pseudo_moves(self, color):
+        moves = []
+        for index, (kind, owner) in list(self.squares.items()):
+            if owner != color:
+                continue
+            file, rank = index % 8, index // 8
+
+            def add(square):
+                target = self.squares.get(square)
+                if target is None or target[1] != color:
+                    moves.append((index, square))
+
+            if kind in "nk":
+                for df, dr in (KNIGHT_STEPS if kind == "n" else KING_STEPS):
+                    square = _square(file + df, rank + dr)
+                    if square is not None:
+                        add(square)
+            if kind in "brq":
+                directions = {"b": BISHOP_DIRECTIONS, "r": ROOK_DIRECTIONS, "q": BISHOP_DIRECTIONS + ROOK_DIRECTIONS}[kind]
+                for df, dr in directions:
+                    f, r = file + df, rank + dr
+                    while _square(f, r) is not None:
+                        add(_square(f, r))
+                        if _square(f, r) in self.squares:
+                            break
+                        f, r = f + df, r + dr
+            if kind == "p":
+                forward = 1 if color == WHITE else -1
+                front = _square(file, rank + forward)
+                if front is not None and front not in self.squares:
+                    moves.append((index, front))
+                    double = _square(file, rank + 2 * forward)
+                    if index not in self.moved and double is not None and double not in self.squares:
+                        moves.append((index, double))
+                for df in (-1, 1):
+                    square = _square(file + df, rank + forward)
+                    if square is None:
+                        continue
+                    target = self.squares.get(square)
+                    if target is not None and target[1] != color:
+                        moves.append((index, square))
+                    elif square == self.en_passant and self.squares.get(square - 8 * forward) == ("p", other(color)):
+                        moves.append((index, square))
+        return moves
+
+    def legal_moves(self):
+        """Legal moves of the side to move as a set of (from, to) indices"""
+        color = self.turn
+        legal = set()
+        for from_index, to_index in self.pseudo_moves(color):
+            squares = self._moved_squares(from_index, to_index)
+            if not self.in_check(color, squares):
+                legal.add((from_index, to_index))
+        rank = 0 if color == WHITE else 7
+        for side, between, passed, target in (("king", (5, 6), (5, 6), 6), ("queen", (1, 2, 3), (2, 3), 2)):
+            if not self.can_castle(color, side) or self.in_check(color):
+                continue
+            if any(rank * 8 + file in self.squares for file in between):
+                continue
+            if any(self.attacks(rank * 8 + file, other(color)) for file in passed):
+                continue
+            legal.add((rank * 8 + 4, rank * 8 + target))
+        return legal
+
+    def _moved_squares(self, from_index, to_index):
+        """The squares after moving a piece, with en passant, before any mode effect"""
+        squares = dict(self.squares)
+        kind, color = squares.pop(from_index)
+        if kind == "p" and to_index == self.en_passant and to_index not in squares:
+            squares.pop((from_index // 8) * 8 + to_index % 8, None)
+        squares[to_index] = (kind, color)
+        return squares
+
+    def play(self, from_index, to_index, promotion=None):
+        """Plays a move from legal_moves; ``promotion`` names the piece a pawn becomes on the last rank"""
+        kind, color = self.squares[from_index]
+        captured = self.squares.get(to_index)
+        if kind == "p" and to_index == self.en_passant and captured is None:
+            captured_index = (from_index // 8) * 8 + to_index % 8
+            captured = self.squares.pop(captured_index)
+            self.moved.discard(captured_index)
+
+        self.squares[to_index] = self.squares.pop(from_index)
+        self.moved.discard(from_index)
+        self.moved.add(to_index)
+        if kind == "k" and abs(to_index - from_index) == 2:
+            rook_from, rook_to = (from_index + 3, from_index + 1) if to_index > from_index else (from_index - 4, from_index - 1)
+            self.squares[rook_to] = self.squares.pop(rook_from)
+            self.moved.discard(rook_from)
+            self.moved.add(rook_to)
+
+        if captured is not None:
+            if self.game_mode == 'kirby' and kind != "k":
+                # The capturer becomes what it captured
+                self.squares[to_index] = (captured[0], color)
+            if self.game_mode == 'bomb':
+                # Every piece but pawns around the capture square explodes
+                file, rank = to_index % 8, to_index // 8
+                for df, dr in KING_STEPS:
+                    square = _square(file + df, rank + dr)
+                    if square is not None and square in self.squares and self.squares[square][0] != "p":
+                        del self.squares[square]
+                        self.moved.discard(square)
+
+        last_rank = 7 if color == WHITE else 0
+        if self.squares[to_index][0] == "p" and to_index // 8 == last_rank and promotion:
+            self.squares[to_index] = (PROMOTIONS[promotion], color)
+
+        self.en_passant = (from_index + to_index) // 2 if kind == "p" and abs(to_index - from_index) == 16 else None
+        self.half_move_clock = 0 if kind == "p" or captured is not None else self.half_move_clock + 1
+        self.turn = other(color)
+        self._remember()
+
+    # Results
+
+    def castling(self):
+        rights = ""
+        for color, letters in ((WHITE, "KQ"), (BLACK, "kq")):
+            for side, letter in zip(("king", "queen"), letters):
+                if self.can_castle(color, side):
+                    rights += letter
+        return rights or "-"
+
+    def placement(self):
+        rows = []
+        for rank in range(7, -1, -1):
+            row, empty = "", 0
+            for file in range(8):
+                piece = self.squares.get(rank * 8 + file)
+                if piece is None:
+                    empty += 1
+                    continue
+                if empty:
+                    row, empty = row + str(empty), 0
+                row += piece[0].upper() if piece[1] == WHITE else piece[0]
+            rows.append(row + (str(empty) if empty else ""))
+        return "/".join(rows)
+
+    def fen(self):
+        """Placement, side to move, castling, en passant target and halfmove clock"""
+        en_passant = "-"
+        if self.en_passant is not None:
+            en_passant = "abcdefgh"[self.en_passant % 8] + str(self.en_passant // 8 + 1)
+        return " ".join([self.placement(), self.turn[0], self.castling(), en_passant, str(self.half_move_clock)])
+
+    def _remember(self):
+        # Positions repeat only if the same captures en passant are possible
+        en_passant = None
+        if self.en_passant is not None:
+            back = -1 if self.turn == WHITE else 1
+            for df in (-1, 1):
+                square = _square(self.en_passant % 8 + df, self.en_passant // 8 + back)
+                if square is not None and self.squares.get(square) == ("p", self.turn):
+                    en_passant = self.en_passant
+        key = (self.placement(), self.turn, self.castling(), en_passant)
+        self.seen[key] = self.seen.get(key, 0) + 1
+        self.key = key
+
+    def count(self, color, kinds):
+        return sum(1 for kind, owner in self.squares.values() if owner == color and kind in kinds)
+
+    def insufficient_material(self):
+        pieces = list(self.squares.items())
+        if any(kind in "prq" for _, (kind, _) in pieces):
+            return False
+        kings = sum(1 for _, (kind, _) in pieces if kind == "k")
+        knights = sum(1 for _, (kind, _) in pieces if kind == "n")
+        bishops = [(index % 8 + index // 8) % 2 for index, (kind, _) in pieces if kind == "b"]
+        if kings != 2:
+            return False
+        if knights + len(bishops) <= 1:
+            return True
+        # Bishops only, all on one colour of square
+        return knights == 0 and len(set(bishops)) == 1
+
+    def verdict(self):
+        """(status, winner) of the position for the side to move, (None, None) while play goes on"""
+        color = self.turn
+        if self.game_mode == 'bomb':
+            if self.king(WHITE) is None or self.king(BLACK) is None:
+                return "king exploded", BLACK if self.king(WHITE) is None else WHITE
+        if self.game_mode == 'horde' and color == WHITE and not self.count(WHITE, KINDS):
+            return "horde_win", BLACK
+        if not self.legal_moves():
+            if self.in_check(color):
+                return "checkmate", other(color)
+            return "stalemate", None
+        if self.game_mode != 'horde':
+            if self.half_move_clock >= 100:
+                return "fifty_moves", None
+            if self.seen[self.key] >= 3:
+                return "repetition", None
+        if self.insufficient_material():
+            return "insufficient_material", None
+        return None, None
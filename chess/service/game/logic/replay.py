@@ -0,0 +1,87 @@
+"""
+Replays stored games through the engine and reports where they disagree.
+
+Works on plain dicts so games can be shipped to worker processes:
+
+    {
+        "id": 1, "game_mode": "classic", "start_position": None,
+        "move_history": [...], "board_states": [...], "winner": "white" | "black" | None
+    }
+"""
+from .ChessLogic import ChessLogic
+from .fen import encode_position
+
+
+def _placement(logic, state):
+    if isinstance(state, str):
+        return state.split()[0]
+    # Legacy square dicts are rebuilt on a scratch game of the same mode
+    scratch = ChessLogic(logic.mode_name, logic.get_start_position())
+    return encode_position(scratch.load_board_from_serialized(state)).split()[0]
+
+
+def replay_game(record):
+    """
+    Replays one game record move by move through the full validation path.
+
+    Returns:
+        dict with the game id, the number of moves replayed and a list of
+        problems, each {"kind": ..., "detail": ...}. kind is one of
+        illegal_move, board_mismatch or result_mismatch. A recorded winner
+        the engine cannot confirm (resignations) only sets engine_result
+        to None.
+    """
+    logic = ChessLogic(record["game_mode"], record.get("start_position"))
+    logic.initialize_game()
+    placements = [encode_position(logic.board).split()[0]]
+    problems = []
+    moves = 0
+
+    for ply, move in enumerate(record.get("move_history") or []):
+        success, message, _, _ = logic.make_move(
+            move.get("from"), move.get("to"), move.get("player"), move.get("promotion")
+        )
+        if not success:
+            problems.append({
+                "kind": "illegal_move",
+                "detail": f"ply {ply + 1}: {move.get('from')}-{move.get('to')} by {move.get('player')}: {message}"
+            })
+            break
+        if logic.state == 'PROMOTION_PENDING':
+            # Promotion piece missing from the record: assume a queen
+            logic.handle_promotion('queen')
+        moves += 1
+        placements.append(encode_position(logic.board).split()[0])
+
+    # Stored states must appear in the replayed sequence, in order; the
+    # consumer may store the same position twice when a game ends
+    position = 0
+    for index, state in enumerate(record.get("board_states") or []):
+        try:
+            stored = _placement(logic, state)
+        except (ValueError, KeyError, TypeError) as e:
+            problems.append({"kind": "board_mismatch", "detail": f"state {index} unreadable: {e}"})
+            break
+        while position < len(placements) and placements[position] != stored:
+            position += 1
+        if position == len(placements):
+            problems.append({"kind": "board_mismatch", "detail": f"state {index} ({stored}) never reached"})
+            break
+
+    engine_result = None
+    if logic.state == 'GAME_OVER':
+        status, winner = logic.game_mode.check_game_over(logic.board, logic.current_player)
+        engine_result = {"status": status, "winner": winner}
+        if winner != record.get("winner"):
+            problems.append({
+                "kind": "result_mismatch",
+                "detail": f"recorded winner {record.get('winner')}, engine {engine_result}"
+            })
+
+    return {
+        "id": record["id"],
+        "game_mode": record["game_mode"],
+        "moves": moves,
+        "engine_result": engine_result,
+        "problems": problems,
+    }
@@ -0,0 +1,320 @@
+"""
+Iterative-deepening alpha-beta search for analysis, hints and bots.
+
+``analyse`` takes a position as a string (an encoded position or plain FEN)
+and returns the best move found within a hard time budget. Everything it
+needs is in its arguments, so it can run in a worker process
+(executor.submit_search) without touching the live games.
+
+Moves go through the mode's apply_move_effects like in perft, so Kirby
+conversions and Bomb explosions are searched as played. A side that loses
+its king (Bomb) or every piece (Horde) has lost. Positions covered by the
+endgame tables are scored from them instead of searched, so those endings
+are played perfectly.
+"""
+import math
+import os
+import time
+
+from .ChessLogic import ChessLogic
+from .bitboard import (
+    SQUARES, WHITE, BLACK, COLORS, PAWN, KNIGHT, BISHOP, QUEEN, KING, PIECE_VALUES,
+    piece_kind, bit, iter_bits,
+)
+from .endgame import endgame_tables
+from .fen import decode_position, move_to_uci
+from .movegen import generate_legal_moves, move_cache_key
+
+MAX_TIME = float(os.getenv("CHESS_SEARCH_MAX_TIME", 5))
+MIN_TIME = 0.01
+MAX_DEPTH = int(os.getenv("CHESS_SEARCH_MAX_DEPTH", 32))
+TABLE_ENTRIES = int(os.getenv("CHESS_SEARCH_TABLE_ENTRIES", 200000))
+
+MATE = 100000
+MATE_BOUND = MATE - 1000  # scores beyond this are forced wins or losses
+INFINITY = MATE + 1
+EXACT, LOWER, UPPER = range(3)
+PROMOTION_CHOICES = ('queen', 'knight', 'rook', 'bishop')
+
+# Centipawn values, and small bonuses for advanced pawns and central minors
+_VALUES = [value * 100 for value in PIECE_VALUES]
+_CENTER = [
+    (3 - int(abs(3.5 - index % 8))) + (3 - int(abs(3.5 - index // 8)))
+    for index in range(64)
+]
+_PAWN_ADVANCE = [[5 * (index // 8 - 1) for index in range(64)],
+                 [5 * (6 - index // 8) for index in range(64)]]
+
+
+class _Timeout(Exception):
+    pass
+
+
+def _to_table(score, ply):
+    # Mate scores are stored relative to the node so they stay valid at any ply
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def _from_table(score, ply):
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
+
+
+def evaluate(board, color):
+    """Static evaluation in centipawns from the point of view of ``color``"""
+    score = 0
+    for side, sign in ((WHITE, 1), (BLACK, -1)):
+        pieces = board.bitboards[side]
+        total = board.material[side] * 100
+        for index in iter_bits(pieces[PAWN]):
+            total += _PAWN_ADVANCE[side][index]
+        for index in iter_bits(pieces[KNIGHT] | pieces[BISHOP]):
+            total += 4 * _CENTER[index]
+        score += sign * total
+    return score if color == WHITE else -score
+
+
+class Search:
+    def __init__(self, game_mode, board, deadline, max_depth=MAX_DEPTH):
+        self.game_mode = game_mode
+        self.board = board
+        self.deadline = deadline
+        self.max_depth = max_depth
+        self.kings = tuple(bool(board.bitboards[color][KING]) for color in (WHITE, BLACK))
+        self.use_tables = getattr(game_mode, 'use_endgame_tables', False)
+        self.table = {}
+        self.nodes = 0
+        self.path = []
+        self.completed = 0
+        self.root_moves = len(board.undo_stack)
+
+    # Moves
+    def _moves(self, color, captures_only=False):
+        """Legal (from, to, promotion) of ``color``, captures and promotions first"""
+        board = self.board
+        enemy = board.occupancy[color ^ 1]
+        scored = []
+        for from_index, to_index in generate_legal_moves(board, color):
+            piece = board.squares[from_index]
+            kind = piece_kind(piece)
+            victim = board.squares[to_index]
+            promotes = kind == PAWN and to_index // 8 in (0, 7)
+            capture = victim is not None or (kind == PAWN and from_index % 8 != to_index % 8)
+            if captures_only and not (capture or promotes):
+                continue
+            order = 0
+            if enemy & bit(to_index):
+                order = 10 * _VALUES[piece_kind(victim)] - _VALUES[kind]
+            elif capture:
+                order = 10 * _VALUES[PAWN] - _VALUES[PAWN]
+            for choice in (PROMOTION_CHOICES if promotes else (None,)):
+                bonus = _VALUES[QUEEN] if choice == 'queen' else 0
+                scored.append((order + bonus, from_index, to_index, choice))
+        scored.sort(key=lambda move: move[0], reverse=True)
+        return [move[1:] for move in scored]
+
+    def _play(self, move, color):
+        """Pushes ``move`` with the mode's effects; False (and nothing pushed) if the mode rejects it"""
+        from_index, to_index, choice = move
+        player_color = COLORS[color]
+        undo = self.board.push(SQUARES[from_index], SQUARES[to_index])
+        if choice:
+            self.board.replace(to_index, self.game_mode.create_piece(choice, player_color))
+        error, _ = self.game_mode.apply_move_effects(self.board, undo, player_color)
+        if error:
+            self.board.pop()
+            return False
+        return True
+
+    # Search
+    def _lost(self, color):
+        """Whether ``color`` has lost its king (Bomb) or every piece (Horde)"""
+        if self.kings[color] and not self.board.bitboards[color][KING]:
+            return True
+        return not self.board.occupancy[color]
+
+    def _check_time(self):
+        self.nodes += 1
+        if self.nodes & 1023 == 0 and self.completed and time.monotonic() > self.deadline:
+            raise _Timeout()
+
+    def _quiesce(self, color, alpha, beta, ply):
+        self._check_time()
+        if self._lost(color):
+            return -MATE + ply
+        if self._lost(color ^ 1):
+            return MATE - ply
+        stand_pat = evaluate(self.board, color)
+        if stand_pat >= beta:
+            return stand_pat
+        alpha = max(alpha, stand_pat)
+        for move in self._moves(color, captures_only=True):
+            if not self._play(move, color):
+                continue
+            score = -self._quiesce(color ^ 1, -beta, -alpha, ply + 1)
+            self.board.pop()
+            if score >= beta:
+                return score
+            alpha = max(alpha, score)
+        return alpha
+
+    def _negamax(self, color, depth, alpha, beta, ply):
+        self._check_time()
+        board = self.board
+        if self._lost(color):
+            return -MATE + ply
+        if self._lost(color ^ 1):
+            return MATE - ply
+        if ply and (board.half_move_clock >= 100 or board.zobrist in self.path):
+            return 0
+        if ply and self.use_tables:
+            result = endgame_tables.probe(board)
+            if result is not None:
+                winner, plies = result
+                if winner is None or board.half_move_clock + plies > 100:
+                    return 0
+                return MATE - ply - plies if winner == color else -MATE + ply + plies
+        if depth <= 0:
+            return self._quiesce(color, alpha, beta, ply)
+
+        key = move_cache_key(board, color)
+        entry = self.table.get(key)
+        best_move = None
+        if entry is not None:
+            entry_depth, entry_score, flag, best_move = entry
+            entry_score = _from_table(entry_score, ply)
+            if ply and entry_depth >= depth:
+                if (flag == EXACT or (flag == LOWER and entry_score >= beta)
+                        or (flag == UPPER and entry_score <= alpha)):
+                    return entry_score
+
+        moves = self._moves(color)
+        if best_move in moves:
+            moves.remove(best_move)
+            moves.insert(0, best_move)
+
+        original_alpha = alpha
+        best_score = -INFINITY
+        self.path.append(board.zobrist)
+        for move in moves:
+            if not self._play(move, color):
+                continue
+            score = -self._negamax(color ^ 1, depth - 1, -beta, -alpha, ply + 1)
+            board.pop()
+            if score > best_score:
+                best_score, best_move = score, move
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+        self.path.pop()
+
+        if best_score == -INFINITY:
+            # No playable move: checkmate, or stalemate when not attacked
+            king = board.king_square(color)
+            if king is not None and board.is_attacked(king, color ^ 1):
+                return -MATE + ply
+            return 0
+
+        flag = EXACT
+        if best_score <= original_alpha:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        if len(self.table) >= TABLE_ENTRIES:
+            self.table.clear()
+        self.table[key] = (depth, _to_table(best_score, ply), flag, best_move)
+        return best_score
+
+    def _principal_variation(self, color, limit):
+        """Best moves from the transposition table, replayed from the root"""
+        line = []
+        played = 0
+        seen = set()
+        while len(line) < limit:
+            entry = self.table.get(move_cache_key(self.board, color))
+            if entry is None or entry[3] is None or self.board.zobrist in seen:
+                break
+            seen.add(self.board.zobrist)
+            move = entry[3]
+            if move not in self._moves(color) or not self._play(move, color):
+                break
+            played += 1
+            line.append(move)
+            color ^= 1
+        for _ in range(played):
+            self.board.pop()
+        return line
+
+    def run(self, color):
+        """Deepens one ply at a time until the budget runs out; returns (score, pv, depth)"""
+        score, line = 0, []
+        for depth in range(1, self.max_depth + 1):
+            try:
+                current = self._negamax(color, depth, -INFINITY, INFINITY, 0)
+            except _Timeout:
+                # Unwind whatever the interrupted iteration left pushed
+                while len(self.board.undo_stack) > self.root_moves:
+                    self.board.pop()
+                self.path.clear()
+                break
+            score, line = current, self._principal_variation(color, depth)
+            self.completed = depth
+            if not line or abs(score) >= MATE_BOUND or time.monotonic() > self.deadline:
+                break
+        return score, line, self.completed
+
+
+def analyse(position, game_mode='classic', time_limit=1.0, max_depth=None, start_position=None):
+    """
+    Best move and evaluation of ``position`` for the side to move.
+
+    Args:
+        position: Encoded position (fen.encode_position) or plain FEN
+        game_mode: 'classic', '960', 'horde', 'kirby' or 'bomb'
+        time_limit: Seconds to search, clamped to [MIN_TIME, MAX_TIME]. The
+            last completed depth is reported, and depth 1 always completes.
+        max_depth: Optional depth limit, capped at MAX_DEPTH
+
+    Returns:
+        dict with best_move (UCI, None without legal moves), score in
+        centipawns from white's side, mate (moves to mate, negative when
+        black mates, else None), pv (UCI moves), depth, nodes and seconds.
+
+    Raises:
+        ValueError: if the position cannot be read or time_limit is not a
+            finite number
+    """
+    started = time.monotonic()
+    time_limit = float(time_limit)
+    if not math.isfinite(time_limit):
+        raise ValueError(f"time_limit must be a finite number, not {time_limit}")
+    time_limit = min(max(time_limit, MIN_TIME), MAX_TIME)
+    logic = ChessLogic(game_mode, start_position)
+    board = decode_position(position, logic.game_mode.create_piece)
+    color = board.turn
+    depth_limit = max(1, min(int(max_depth or MAX_DEPTH), MAX_DEPTH))
+    search = Search(logic.game_mode, board, started + time_limit, depth_limit)
+    score, line, depth = search.run(color)
+
+    white_score = score if color == WHITE else -score
+    mate = None
+    if abs(score) >= MATE_BOUND:
+        plies = MATE - abs(score)
+        mate = (plies + 1) // 2 if white_score > 0 else -((plies + 1) // 2)
+    pv = [move_to_uci(SQUARES[from_index], SQUARES[to_index], choice) for from_index, to_index, choice in line]
+    return {
+        "best_move": pv[0] if pv else None,
+        "score": white_score,
+        "mate": mate,
+        "pv": pv,
+        "depth": depth,
+        "nodes": search.nodes,
+        "seconds": round(time.monotonic() - started, 3),
+    }
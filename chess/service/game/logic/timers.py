@@ -0,0 +1,131 @@
+"""
+Hierarchical timer wheel shared by every game in the worker.
+
+Clock flag-falls, abandonment timeouts and clock sync frames are all timers
+on one wheel, driven by a single asyncio task, instead of one task or
+call_later handle per game. Scheduling and cancelling are O(1); each tick
+only looks at one slot, plus a cascade from the coarser levels once every
+SLOTS ticks.
+
+Level 0 has one slot per tick, level 1 one slot per SLOTS ticks and so on,
+so with the defaults (100 ms ticks, 64 slots, 4 levels) the wheel spans
+about 19 days; anything further out waits on an overflow list.
+"""
+import asyncio
+import logging
+import os
+import time
+
+logger = logging.getLogger('chess_game')
+
+TICK = float(os.getenv("CHESS_TIMER_TICK", 0.1))
+SLOTS = 64
+LEVELS = 4
+
+
+class Timer:
+    __slots__ = ("tick", "callback", "args", "cancelled")
+
+    def __init__(self, tick, callback, args):
+        self.tick = tick
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        # Lazily dropped when its slot comes up
+        self.cancelled = True
+
+
+class TimerWheel:
+    def __init__(self, tick=TICK, slots=SLOTS, levels=LEVELS, now=None):
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self.spans = [slots ** level for level in range(levels + 1)]
+        self.wheels = [[[] for _ in range(slots)] for _ in range(levels)]
+        self.overflow = []
+        self.origin = time.monotonic() if now is None else now
+        self.current = 0
+        self._task = None
+
+    def schedule(self, delay, callback, *args, now=None):
+        """
+        Calls ``callback(*args)`` after ``delay`` seconds, rounded up to the
+        next tick. A callback returning a coroutine has it run as a task.
+
+        Returns:
+            Timer, whose cancel() drops the call
+        """
+        if now is None:
+            now = time.monotonic()
+        tick = max(self.current + 1, int(-(-(now - self.origin + delay) // self.tick)))
+        timer = Timer(tick, callback, args)
+        self._insert(timer)
+        return timer
+
+    def _insert(self, timer):
+        delta = timer.tick - self.current
+        for level in range(self.levels):
+            if delta < self.spans[level + 1]:
+                self.wheels[level][(timer.tick // self.spans[level]) % self.slots].append(timer)
+                return
+        self.overflow.append(timer)
+
+    def _cascade(self):
+        """Moves the timers of the coarser slots that start at the current tick down a level"""
+        for level in range(1, self.levels):
+            if self.current % self.spans[level]:
+                break
+            index = (self.current // self.spans[level]) % self.slots
+            bucket, self.wheels[level][index] = self.wheels[level][index], []
+            for timer in bucket:
+                if not timer.cancelled:
+                    self._insert(timer)
+        if self.overflow and self.current % self.spans[self.levels - 1] == 0:
+            waiting, self.overflow = self.overflow, []
+            for timer in waiting:
+                if not timer.cancelled:
+                    self._insert(timer)
+
+    def advance(self, now=None):
+        """
+        Fires every timer due by ``now``.
+
+        Returns:
+            The coroutines returned by the callbacks, for the caller to run
+        """
+        if now is None:
+            now = time.monotonic()
+        target = int((now - self.origin) // self.tick)
+        pending = []
+        while self.current < target:
+            self.current += 1
+            self._cascade()
+            index = self.current % self.slots
+            bucket, self.wheels[0][index] = self.wheels[0][index], []
+            for timer in bucket:
+                if timer.cancelled:
+                    continue
+                try:
+                    result = timer.callback(*timer.args)
+                except Exception:
+                    logger.exception("Timer callback %r failed", timer.callback)
+                    continue
+                if asyncio.iscoroutine(result):
+                    pending.append(result)
+        return pending
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.tick)
+            for coroutine in self.advance():
+                asyncio.ensure_future(coroutine)
+
+    def ensure_running(self):
+        """Starts the driving task on the running loop if it is not running yet"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+
+wheel = TimerWheel()
@@ -0,0 +1,61 @@
+import logging
+
+import pytest
+
+from game.logic.ChessLogic import ChessLogic
+from game.logic.fen import decode_position, encode_position, full_move_number
+
+logging.disable(logging.CRITICAL)
+
+
+def _play(moves, game_mode='classic'):
+    logic = ChessLogic(game_mode)
+    logic.initialize_game()
+    for from_pos, to_pos in moves:
+        success, message, _, _ = logic.make_move(from_pos, to_pos, logic.current_player)
+        assert success, message
+    return logic
+
+
+def test_snapshot_after_e4_e5_round_trips():
+    logic = _play([("e2", "e4"), ("e7", "e5")])
+    snapshot = encode_position(logic.board, full_move_number(2))
+    assert snapshot.split()[:6] == [
+        "rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR", "w", "KQkq", "e6", "0", "2"
+    ]
+
+    resumed = ChessLogic('classic')
+    resumed.resume(snapshot, [])
+    assert resumed.current_player == "white"
+    assert encode_position(resumed.board, full_move_number(2)) == snapshot
+    assert resumed.get_all_possible_moves("white") == logic.get_all_possible_moves("white")
+
+
+@pytest.mark.parametrize("plies, number", [(0, 1), (1, 1), (2, 2), (3, 2), (40, 21)])
+def test_full_move_number(plies, number):
+    assert full_move_number(plies) == number
+
+
+def test_encoded_position_round_trips_moved_flags():
+    logic = _play([("g1", "f3"), ("g8", "f6"), ("f3", "g1"), ("f6", "g8")])
+    text = encode_position(logic.board, full_move_number(4))
+    board = decode_position(text, logic.game_mode.create_piece)
+    assert board.moved == logic.board.moved
+    assert board.zobrist == logic.board.zobrist
+    assert encode_position(board, full_move_number(4)) == text
+
+
+@pytest.mark.parametrize("text", [
+    "9/8/8/8/8/8/8/8 w - - 0 1",
+    "44/8/8/8/8/8/8/8 w - - 0 1",
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR1 w KQkq - 0 1",
+    "7k1/8/8/8/8/8/8/K7 w - - 0 1",
+    "8/8/8/8/8/8/8 w - - 0 1",
+    "8/8/8/8/8/8/8/8 x - - 0 1",
+    "7k/8/8/8/8/8/8/K7 w - - zz 1",
+    "7k/8/8/8/8/8/8/K7 w - - 0 1 nothex",
+    "garbage",
+])
+def test_decode_rejects_malformed_positions(text):
+    with pytest.raises(ValueError, match="Invalid position"):
+        decode_position(text, ChessLogic().game_mode.create_piece)
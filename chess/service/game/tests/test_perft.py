@@ -0,0 +1,49 @@
+import logging
+
+import pytest
+
+from game.logic.ChessLogic import ChessLogic
+from game.logic.fen import decode_position
+from game.logic.perft import CLASSIC_PERFT, perft
+
+logging.disable(logging.CRITICAL)
+
+# Reference positions with their published node counts at depths 1-3
+POSITIONS = {
+    "startpos": ("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1", [20, 400, 8902]),
+    "kiwipete": ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", [48, 2039, 97862]),
+    "position3": ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", [14, 191, 2812]),
+    "position4": ("r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", [6, 264, 9467]),
+    "position5": ("rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", [44, 1486, 62379]),
+    "position6": ("r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10", [46, 2079, 89890]),
+}
+
+
+@pytest.mark.parametrize("name, depth", [(name, depth) for name in POSITIONS for depth in (1, 2, 3)])
+def test_perft(name, depth):
+    fen, counts = POSITIONS[name]
+    game_mode = ChessLogic('classic').game_mode
+    board = decode_position(fen, game_mode.create_piece)
+    assert perft(board, game_mode, board.turn, depth) == counts[depth - 1]
+    # The tree is walked with push/pop, which must leave the board as it was
+    assert board.undo_stack == []
+
+
+@pytest.mark.parametrize("depth", [1, 2, 3])
+def test_perft_from_initialized_board(depth):
+    logic = ChessLogic('classic')
+    board = logic.initialize_game()
+    assert perft(board, logic.game_mode, board.turn, depth) == CLASSIC_PERFT[depth]
+
+
+# b7xa8 turns the pawn into a rook in Kirby, so only b7b8 promotes; Bomb leaves the capturing pawn to promote
+@pytest.mark.parametrize("game_mode, counts", [
+    ('classic', [13, 124]),
+    ('kirby', [10, 111]),
+    ('bomb', [13, 124]),
+])
+def test_perft_capture_promotion(game_mode, counts):
+    mode = ChessLogic(game_mode).game_mode
+    for depth, count in enumerate(counts, 1):
+        board = decode_position("r3k3/1P6/8/8/8/8/8/4K3 w - - 0 1", mode.create_piece)
+        assert perft(board, mode, board.turn, depth) == count
@@ -0,0 +1,8 @@
+from django.urls import path
+from .views import EngineMetricsView, EngineAnalysisView, PositionBatchView
+
+urlpatterns = [
+    path('engine/metrics/', EngineMetricsView.as_view(), name='engine-metrics'),
+    path('engine/analysis/', EngineAnalysisView.as_view(), name='engine-analysis'),
+    path('engine/positions/', PositionBatchView.as_view(), name='engine-positions'),
+]
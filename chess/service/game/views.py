@@ -0,0 +1,159 @@
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import csrf_exempt
+from django.conf import settings
+from django.db.models import Q
+from concurrent.futures import TimeoutError as FutureTimeout
+from core.models import ChessGame
+from .logic import instrumentation
+from .logic.cache import position_cache
+from .logic.executor import EngineBusy, submit_search
+from .logic.positions import describe_positions
+from .logic.search import MAX_TIME, analyse
+
+
+def validate_metrics_token(request):
+    token = request.headers.get("Authorization")
+    return bool(settings.ENGINE_METRICS_TOKEN) and token == settings.ENGINE_METRICS_TOKEN
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class EngineMetricsView(APIView):
+    """Engine timing histograms and profiler samples of the worker serving the request"""
+
+    def get(self, request):
+        if not validate_metrics_token(request):
+            return Response({"status": "error", "message": "Unauthorized"}, status=status.HTTP_403_FORBIDDEN)
+
+        return Response({
+            "status": "success",
+            "instrumentation": instrumentation.is_enabled(),
+            "histograms": instrumentation.dump(),
+            "profiler": instrumentation.profiler.dump(),
+            "position_cache": position_cache.stats(),
+        }, status=status.HTTP_200_OK)
+
+    def post(self, request):
+        if not validate_metrics_token(request):
+            return Response({"status": "error", "message": "Unauthorized"}, status=status.HTTP_403_FORBIDDEN)
+
+        if "instrumentation" in request.data:
+            instrumentation.enable(bool(request.data["instrumentation"]))
+        if "profiling" in request.data:
+            try:
+                instrumentation.set_profiling(bool(request.data["profiling"]), request.data.get("interval"))
+            except (TypeError, ValueError) as e:
+                return Response({"status": "error", "message": f"Invalid interval: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+        if request.data.get("reset"):
+            instrumentation.reset()
+        return Response({
+            "status": "success",
+            "instrumentation": instrumentation.is_enabled(),
+            "profiling": instrumentation.profiler.running,
+        }, status=status.HTTP_200_OK)
+
+
+class EngineAnalysisView(APIView):
+    """
+    Best move and evaluation of a position, searched in the engine's process pool.
+    Refused while the user has a game in progress, so the engine cannot be
+    consulted during a game.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        user = request.user
+        if ChessGame.objects.filter(Q(player_white=user) | Q(player_black=user), status='in_progress').exists():
+            return Response({
+                "status": "error",
+                "message": "Analysis is not available while you have a game in progress"
+            }, status=status.HTTP_403_FORBIDDEN)
+
+        position = request.data.get("position")
+        if not position or not isinstance(position, str):
+            return Response({
+                "status": "error",
+                "message": "The 'position' field is required."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        game_mode = request.data.get("game_mode", "classic")
+        valid_modes = [mode[0] for mode in ChessGame.GAME_MODES]
+        if game_mode not in valid_modes:
+            return Response({
+                "status": "error",
+                "message": f"Invalid game mode: {game_mode}. Valid modes: {valid_modes}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            time_limit = float(request.data.get("time_limit", 1))
+            depth = request.data.get("depth")
+            depth = int(depth) if depth is not None else None
+            start_position = request.data.get("start_position")
+            start_position = int(start_position) if start_position is not None else None
+        except (TypeError, ValueError):
+            return Response({
+                "status": "error",
+                "message": "time_limit, depth and start_position must be numbers"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            future = submit_search(analyse, position, game_mode, time_limit, depth, start_position)
+            result = future.result(timeout=MAX_TIME + 5)
+        except (EngineBusy, FutureTimeout):
+            return Response({
+                "status": "error",
+                "message": "The analysis engine is busy, please try again"
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        except (ValueError, IndexError) as e:
+            return Response({
+                "status": "error",
+                "message": f"Invalid position: {e}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            "status": "success",
+            "analysis": result
+        }, status=status.HTTP_200_OK)
+
+
+class PositionBatchView(APIView):
+    """Legal moves, check and game-over status of a batch of positions, without a game"""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        positions = request.data.get("positions")
+        if not isinstance(positions, list) or not positions:
+            return Response({
+                "status": "error",
+                "message": "The 'positions' field must be a non-empty list."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if len(positions) > settings.CHESS_POSITIONS_MAX_BATCH:
+            return Response({
+                "status": "error",
+                "message": f"At most {settings.CHESS_POSITIONS_MAX_BATCH} positions per request."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        valid_modes = [mode[0] for mode in ChessGame.GAME_MODES]
+        queries = []
+        for index, entry in enumerate(positions):
+            if not isinstance(entry, dict) or not entry.get("fen") or not isinstance(entry["fen"], str):
+                return Response({
+                    "status": "error",
+                    "message": f"Position {index} needs a 'fen' string."
+                }, status=status.HTTP_400_BAD_REQUEST)
+            game_mode = entry.get("game_mode", "classic")
+            if game_mode not in valid_modes:
+                return Response({
+                    "status": "error",
+                    "message": f"Invalid game mode: {game_mode}. Valid modes: {valid_modes}"
+                }, status=status.HTTP_400_BAD_REQUEST)
+            queries.append((entry["fen"], game_mode))
+
+        return Response({
+            "status": "success",
+            "positions": describe_positions(queries)
+        }, status=status.HTTP_200_OK)
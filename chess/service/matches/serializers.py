@@ -1,6 +1,6 @@
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
-from core.models import ChessGame, PendingInvitation
+from core.models import ChessGame, ArchivedChessGame, PendingInvitation
 
 User = get_user_model()
 
@@ -18,6 +18,8 @@ class ChessGameSerializer(serializers.ModelSerializer):
             'winner',
             'game_mode',
             'status',
+            'time_base',
+            'time_increment',
             'created_at',
            # 'updated_at'
         ]
@@ -41,6 +43,18 @@ class ChessGameHistorySerializer(serializers.ModelSerializer):
             'updated_at'
         ]
 
+class ArchivedChessGameSerializer(ChessGameSerializer):
+    status = serializers.CharField(read_only=True)
+
+    class Meta(ChessGameSerializer.Meta):
+        model = ArchivedChessGame
+
+class ArchivedChessGameHistorySerializer(ChessGameHistorySerializer):
+    status = serializers.CharField(read_only=True)
+
+    class Meta(ChessGameHistorySerializer.Meta):
+        model = ArchivedChessGame
+
 class PendingInvitationDetailSerializer(serializers.ModelSerializer):
     sender = serializers.CharField(source='sender.username', read_only=True)
     receiver = serializers.CharField(source='receiver.username', read_only=True)
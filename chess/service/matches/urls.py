@@ -1,6 +1,9 @@
 from django.urls import path
 from .views import (
     MatchHistoryView,
+    MatchHistoryPGNView,
+    MatchPGNView,
+    MatchPGNImportView,
     MatchDetailView,
     InProgressMatchesView,
     JoinMatchView,
@@ -14,6 +17,9 @@ from .views import (
 
 urlpatterns = [
     path('match/history/', MatchHistoryView.as_view(), name='match-history'),
+    path('match/history/pgn/', MatchHistoryPGNView.as_view(), name='match-history-pgn'),
+    path('match/pgn/<str:game_key>/', MatchPGNView.as_view(), name='match-pgn'),
+    path('match/import/', MatchPGNImportView.as_view(), name='match-import'),
     path('match/detail/<str:game_key>/', MatchDetailView.as_view(), name='match-detail'),
     path('match/join/<str:token>/', JoinMatchView.as_view(), name='join-match'),
     path('match/in-progress/', InProgressMatchesView.as_view(), name='in-progress-matches'),
@@ -2,49 +2,249 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
-from core.models import ChessGame, PendingInvitation, User, MatchmakingQueue
+from asgiref.sync import sync_to_async
+from core.models import ChessGame, ArchivedChessGame, PendingInvitation, User, MatchmakingQueue
 from core.utils.event_domain import publish_event
+from django.conf import settings
+from django.db import transaction
 from django.db.models import Q
+from django.http import HttpResponse, StreamingHttpResponse
+from concurrent.futures import TimeoutError as FutureTimeout
+from game.logic.executor import EngineBusy, SEARCH_WORKERS, submit_search
+from game.logic.pgn import game_to_pgn, import_games, split_games
 import uuid
 
 from .serializers import (
     ChessGameSerializer,
     ChessGameHistorySerializer,
+    ArchivedChessGameSerializer,
+    ArchivedChessGameHistorySerializer,
     PendingInvitationDetailSerializer,
     PendingMatchesSerializer
 )
 
+def visible_to(user):
+    # Imported games are only shown to whoever imported them, not to the opponent named in the PGN
+    return Q(imported_by__isnull=True) | Q(imported_by=user)
+
 class MatchHistoryView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         user = request.user
-        history = user.games.filter(status='finished').order_by('-created_at')
-        serializer = ChessGameHistorySerializer(history, many=True)
+        history = user.games.filter(visible_to(user), status='finished').order_by('-created_at')
+        archived = ArchivedChessGame.objects.filter(
+            Q(player_white=user) | Q(player_black=user), visible_to(user)
+        ).select_related('player_white', 'player_black', 'winner').order_by('-created_at')
+        # Archived games are older, but a game archived late can interleave; merge by date
+        matches = ChessGameHistorySerializer(history, many=True).data + ArchivedChessGameHistorySerializer(archived, many=True).data
+        matches.sort(key=lambda match: match['created_at'], reverse=True)
         return Response({
             "status": "success",
             "message": "Match history retrieved successfully",
-            "matches": serializer.data
+            "matches": matches
         })
 
-class MatchDetailView(APIView):
+# Columns needed to write a game as PGN, read without building model instances
+PGN_FIELDS = (
+    'game_key', 'game_mode', 'start_position', 'move_history', 'pending_history', 'status', 'created_at',
+    'time_base', 'time_increment', 'winner_id', 'player_white_id',
+    'player_white__username', 'player_black__username', 'imported_by_id'
+)
+ARCHIVED_PGN_FIELDS = tuple(field for field in PGN_FIELDS if field not in ('move_history', 'pending_history', 'status')) + ('moves',)
+
+
+def pgn_record(row):
+    winner = None
+    if row['winner_id'] is not None:
+        winner = 'white' if row['winner_id'] == row['player_white_id'] else 'black'
+    if 'moves' in row:
+        # Archived rows keep compressed UCI moves only
+        move_history = ArchivedChessGame(moves=row['moves']).get_move_history()
+    else:
+        # Moves since the last snapshot are not in move_history yet
+        move_history = row['move_history'] + row['pending_history']
+    return {
+        'game_key': str(row['game_key']),
+        'game_mode': row['game_mode'],
+        'start_position': row['start_position'],
+        'move_history': move_history,
+        'status': row.get('status', 'finished'),
+        'date': row['created_at'],
+        'time_base': row['time_base'],
+        'time_increment': row['time_increment'],
+        'white': row['player_white__username'],
+        'black': row['player_black__username'],
+        'winner': winner,
+    }
+
+
+async def pgn_stream(games, archived):
+    # Rows come from server-side cursors, chunk_size at a time. An async
+    # iterator is streamed by the ASGI handler; a sync one would be buffered
+    # whole. The replays behind each PGN run in worker threads.
+    to_pgn = sync_to_async(lambda row: game_to_pgn(pgn_record(row)), thread_sensitive=False)
+    for rows in (games.values(*PGN_FIELDS), archived.values(*ARCHIVED_PGN_FIELDS)):
+        async for row in rows.aiterator(chunk_size=100):
+            yield await to_pgn(row) + "\n"
+
+
+class MatchHistoryPGNView(APIView):
+    """The user's whole finished game archive as one PGN file, written while it is sent"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        user = request.user
+        history = ChessGame.objects.filter(
+            Q(player_white=user) | Q(player_black=user), visible_to(user), status='finished'
+        ).order_by('-created_at')
+        archived = ArchivedChessGame.objects.filter(
+            Q(player_white=user) | Q(player_black=user), visible_to(user)
+        ).order_by('-created_at')
+        response = StreamingHttpResponse(pgn_stream(history, archived), content_type='application/x-chess-pgn')
+        response['Content-Disposition'] = f'attachment; filename="{user.username}_games.pgn"'
+        return response
+
+class MatchPGNView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, game_key):
+        row = ChessGame.objects.filter(game_key=game_key).values(*PGN_FIELDS, 'player_black_id').first()
+        if row is None:
+            row = ArchivedChessGame.objects.filter(game_key=game_key).values(*ARCHIVED_PGN_FIELDS, 'player_black_id').first()
+        if row is None:
+            return Response({
+                "status": "error",
+                "message": "Match not found"
+            }, status=404)
+
+        if (request.user.id not in [row['player_white_id'], row['player_black_id']]
+                or row['imported_by_id'] not in (None, request.user.id)):
+            return Response({
+                "status": "error",
+                "message": "You are not authorized to view this match"
+            }, status=403)
+        response = HttpResponse(game_to_pgn(pgn_record(row)), content_type='application/x-chess-pgn')
+        response['Content-Disposition'] = f'attachment; filename="{game_key}.pgn"'
+        return response
+
+class MatchPGNImportView(APIView):
+    """
+    Imports finished games from PGN, played by the user against existing
+    players. Games are replayed through the engine in the worker processes.
+    Imported games are unranked, count in no statistics and are only shown
+    to the user who imported them.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        text = upload.read().decode('utf-8', errors='replace') if upload else request.data.get('pgn')
+        if not text or not isinstance(text, str):
+            return Response({
+                "status": "error",
+                "message": "Send the games as a 'pgn' field or a 'file' upload"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        texts = split_games(text)
+        if not texts:
+            return Response({
+                "status": "error",
+                "message": "No games found"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if len(texts) > settings.CHESS_PGN_IMPORT_MAX_GAMES:
+            return Response({
+                "status": "error",
+                "message": f"At most {settings.CHESS_PGN_IMPORT_MAX_GAMES} games can be imported at once"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # One batch per worker process
+        size = -(-len(texts) // SEARCH_WORKERS)
+        futures = []
         try:
-            match = ChessGame.objects.get(game_key=game_key)
-        except ChessGame.DoesNotExist:
+            for i in range(0, len(texts), size):
+                futures.append(submit_search(import_games, texts[i:i + size]))
+            results = [result for future in futures for result in future.result(timeout=settings.CHESS_PGN_IMPORT_TIMEOUT)]
+        except (EngineBusy, FutureTimeout):
+            # Batches still queued are dropped; a running one cannot be stopped
+            for future in futures:
+                future.cancel()
+            return Response({
+                "status": "error",
+                "message": "The engine is busy, please try again"
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        reports = []
+        with transaction.atomic():
+            for index, result in enumerate(results):
+                if 'error' in result:
+                    reports.append({"index": index, "error": result['error']})
+                    continue
+                try:
+                    game_obj = self.store(request.user, result['game'])
+                except ValueError as e:
+                    reports.append({"index": index, "error": str(e)})
+                    continue
+                reports.append({"index": index, "game_key": str(game_obj.game_key)})
+
+        imported = sum(1 for report in reports if 'game_key' in report)
+        return Response({
+            "status": "success",
+            "message": f"Imported {imported} of {len(reports)} games",
+            "imported": imported,
+            "games": reports
+        }, status=status.HTTP_201_CREATED if imported else status.HTTP_200_OK)
+
+    def store(self, user, game):
+        names = {'white': game['white'], 'black': game['black']}
+        if user.username not in names.values():
+            raise ValueError("You did not play this game")
+        players = {}
+        for color, name in names.items():
+            players[color] = user if name == user.username else User.objects.filter(username=name).first()
+            if players[color] is None:
+                raise ValueError(f"Unknown player: {name}")
+
+        game_obj = ChessGame(
+            player_white=players['white'],
+            player_black=players['black'],
+            winner=players[game['winner']] if game['winner'] else None,
+            status='finished',
+            imported_by=user,
+            game_mode=game['game_mode'],
+            start_position=game['start_position'],
+            snapshot=game['position'],
+            snapshot_ply=game['plies'],
+            board_states=[game['position']],
+        )
+        for move in game['move_history']:
+            game_obj.add_move(dict(move))
+        game_obj.flush_history()
+        game_obj.save()
+        return game_obj
+
+class MatchDetailView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, game_key):
+        match = ChessGame.objects.filter(game_key=game_key).first()
+        serializer_class = ChessGameSerializer
+        if match is None:
+            match = ArchivedChessGame.objects.filter(game_key=game_key).first()
+            serializer_class = ArchivedChessGameSerializer
+        if match is None:
             return Response({
                 "status": "error",
                 "message": "Match not found"
             }, status=404)
 
-        if request.user not in [match.player_white, match.player_black]:
+        if (request.user not in [match.player_white, match.player_black]
+                or match.imported_by_id not in (None, request.user.id)):
             return Response({
                 "status": "error",
                 "message": "You are not authorized to view this match"
             }, status=403)
-        serializer = ChessGameSerializer(match)
+        serializer = serializer_class(match)
         return Response({
             "status": "success",
             "message": "Match details retrieved successfully",
@@ -72,6 +272,19 @@ class PendingInvitationCreateView(APIView):
                 "message": f"Invalid game mode: {game_mode}. Valid modes: {valid_modes}"
             }, status=status.HTTP_400_BAD_REQUEST)
 
+        # Optional time control in seconds; no base time means an untimed game
+        try:
+            time_base = request.data.get('time_base')
+            time_base = int(time_base) if time_base else None
+            time_increment = int(request.data.get('time_increment') or 0)
+        except (TypeError, ValueError):
+            time_base = time_increment = -1
+        if (time_base is not None and time_base <= 0) or time_increment < 0:
+            return Response({
+                "status": "error",
+                "message": "time_base and time_increment must be positive numbers of seconds"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
         receiver_username = request.data.get('receiver')
         if not receiver_username:
             return Response({
@@ -100,6 +313,8 @@ class PendingInvitationCreateView(APIView):
             status='pending',
             available=True,
             game_mode=game_mode,
+            time_base=time_base,
+            time_increment=time_increment,
         )
 
         invitation = PendingInvitation.objects.create(
@@ -1,6 +1,7 @@
 # import logging
 from django.db.models import Q, F
 from django.db.models.functions import Abs
+from django.conf import settings
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
@@ -94,13 +95,16 @@ class JoinMatchmakingView(APIView):
                 
                 # logger.info(f"Creating game with is_ranked={current_ranked}")
                 
+                time_base, time_increment = settings.CHESS_DEFAULT_TIME_CONTROL
                 created_game = ChessGame.objects.create(
                     player_white=player_white,
                     player_black=player_black,
                     status='in_progress',
                     available=True,
                     game_mode=current_mode,
-                    is_ranked=current_ranked
+                    is_ranked=current_ranked,
+                    time_base=time_base or None,
+                    time_increment=time_increment
                 )
                 
                 publish_event("chess", "chess.match_accepted_random", {